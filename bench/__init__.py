@@ -0,0 +1 @@
+# Benchmarks: synthetic data (generate), timed scenarios (scenarios), runner (python -m bench)
@@ -0,0 +1,111 @@
+"""Synthetic dataset generator: fills a DB with reproducible random data."""
+
+import random
+
+from we.units import pack_unit_price
+
+# name -> (ingredients, products, recipe lines, slot lines); sub-recipe lines are products // COMPONENT_SHARE
+SIZES = {
+    "tiny": (200, 1_000, 10_000, 1_000),
+    "small": (1_000, 5_000, 50_000, 5_000),
+    "large": (10_000, 50_000, 500_000, 50_000),
+}
+
+_WORDS = (
+    "Milch Hafer Soja Zucker Vanille Karamell Kakao Espresso Sirup Sahne Zimt Minze Zitrone Orange "
+    "Erdbeer Mango Kokos Honig Ingwer Chai Matcha Tee Rum Gin Tonic Limette Basilikum Tomate Käse "
+    "Brot Brötchen Schinken Salami Ei Butter Mehl Hefe Salz Pfeffer Öl Essig Senf Gurke Zwiebel"
+).split()
+_SLOTS = ("Milch", "Sirup", "Topping", "Beilage", "Soße", "Brot")
+# unit -> pack sizes
+_PACKS = {
+    "ml": (100, 250, 500, 1000),
+    "l": (0.5, 0.7, 1, 5),
+    "g": (100, 250, 500, 1000),
+    "kg": (0.5, 1, 2.5, 10),
+    "stk": (1, 6, 10, 50),
+}
+HISTORY_MONTHS = 36  # past price changes per ingredient, one per month from 2023-01
+COMPONENT_SHARE = 20
+DATA_VERSION = 4  # bump when the generated data changes, so cached databases are rebuilt
+
+
+def _name(rng, i: int, prefix: str) -> str:
+    words = " ".join(rng.sample(_WORDS, rng.randint(1, 3)))
+    return f"{words} {prefix}{i:06d}"
+
+
+def populate(db, ingredients: int, products: int, items: int, slot_lines: int, seed: int = 1):
+    """Insert the given numbers of rows into an empty `db` in one transaction."""
+    rng = random.Random(seed)
+    conn = db.conn
+    with db.transaction():
+        packs = []  # (unit, pack_qty) per ingredient
+        for _ in range(ingredients):
+            unit = rng.choice(sorted(_PACKS))
+            packs.append((unit, float(rng.choice(_PACKS[unit]))))
+        conn.executemany(
+            "INSERT INTO ingredients(id, name, unit, pack_qty, pack_price) VALUES (?, ?, ?, ?, ?);",
+            (
+                (i, _name(rng, i, "Z"), unit, pack_qty, round(rng.uniform(0.5, 40.0), 2))
+                for i, (unit, pack_qty) in enumerate(packs, start=1)
+            ),
+        )
+
+        def _history():
+            for i, (unit, pack_qty) in enumerate(packs, start=1):
+                for m in range(HISTORY_MONTHS):
+                    price = round(rng.uniform(0.5, 40.0), 2)
+                    yield (i, f"{2023 + m // 12}-{m % 12 + 1:02d}-01", pack_qty, price,
+                           pack_unit_price(pack_qty, price, unit))
+
+        conn.executemany(
+            "INSERT INTO ingredient_prices(ingredient_id, valid_from, pack_qty, pack_price, unit_price) "
+            "VALUES (?, ?, ?, ?, ?);",
+            _history(),
+        )
+        conn.executemany(
+            "INSERT INTO products(id, name, sale_price) VALUES (?, ?, ?);",
+            (
+                (p, _name(rng, p, "P"), round(rng.uniform(2.0, 15.0), 2) if rng.random() < 0.9 else None)
+                for p in range(1, products + 1)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO product_items(product_id, ingredient_id, qty) VALUES (?, ?, ?);",
+            (
+                (rng.randint(1, products), rng.randint(1, ingredients), float(rng.randint(1, 200)))
+                for _ in range(items)
+            ),
+        )
+
+        lines = {}
+        for _ in range(slot_lines):
+            pid = rng.randint(1, products)
+            lines.setdefault(pid, set()).add(rng.choice(_SLOTS))
+        conn.executemany(
+            "INSERT INTO product_slot_lines(product_id, slot_name, qty) VALUES (?, ?, ?);",
+            ((pid, slot, float(rng.randint(5, 100))) for pid, slots in lines.items() for slot in sorted(slots)),
+        )
+        # most slots have a selection, some are left open
+        conn.executemany(
+            "INSERT INTO product_slot_selection(product_id, slot_name, ingredient_id) VALUES (?, ?, ?);",
+            (
+                (pid, slot, rng.randint(1, ingredients))
+                for pid, slots in lines.items()
+                for slot in sorted(slots)
+                if rng.random() < 0.8
+            ),
+        )
+        # sub-recipes: a product only contains products with a lower id, so the graph stays acyclic
+        conn.executemany(
+            "INSERT INTO product_components(product_id, component_id, qty) VALUES (?, ?, ?);",
+            (
+                (pid, rng.randint(1, pid - 1), rng.choice((0.1, 0.25, 0.5, 1.0, 2.0)))
+                for pid in rng.sample(range(2, products + 1), products // COMPONENT_SHARE)
+            ),
+        )
+
+
+def populate_size(db, size: str, seed: int = 1):
+    populate(db, *SIZES[size], seed=seed)
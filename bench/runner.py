@@ -0,0 +1,154 @@
+"""Benchmark runner: `python -m bench run|compare|generate`.
+
+  run       time all (or --only) scenarios on a generated dataset, optionally --save JSON
+  compare   run, then compare medians against a baseline JSON; exit 1 on regressions
+  generate  write a synthetic database to a file (e.g. to try the GUI with 50k products)
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from we.db import DB
+
+from .generate import DATA_VERSION, SIZES, populate_size
+from .scenarios import SCENARIOS
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+NOISE_FLOOR_S = 0.001  # differences below 1 ms are never reported as regressions
+
+
+def dataset(size: str, seed: int, data_dir=None) -> str:
+    """Path of the generated database for (size, seed); created on first use."""
+    data_dir = data_dir or tempfile.gettempdir()
+    path = os.path.join(data_dir, f"we-bench-{size}-{seed}-v{DATA_VERSION}.db")
+    if not os.path.exists(path):
+        tmp = path + ".tmp"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        db = DB(tmp)
+        try:
+            populate_size(db, size, seed)
+        finally:
+            db.close()
+        os.replace(tmp, path)
+    return path
+
+
+def time_scenario(factory, path: str, repeat: int) -> dict:
+    with factory(path) as run:
+        run()  # warm-up (caches, lazy imports)
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - t0)
+    return {"min": min(times), "median": statistics.median(times)}
+
+
+def run_all(args) -> dict:
+    path = dataset(args.size, args.seed, args.data_dir)
+    names = args.only or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"unknown scenario(s): {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        results[name] = time_scenario(SCENARIOS[name], path, args.repeat)
+        r = results[name]
+        print(f"{name:<32} median {r['median'] * 1000:10.2f} ms   min {r['min'] * 1000:10.2f} ms")
+    return {
+        "meta": {
+            "size": args.size,
+            "counts": dict(zip(("ingredients", "products", "recipe_lines", "slot_lines"), SIZES[args.size])),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Scenarios whose median got slower than `threshold` x baseline, as report lines."""
+    regressions = []
+    base = baseline.get("results", {})
+    for name, r in current["results"].items():
+        b = base.get(name)
+        if b is None:
+            print(f"{name:<32} (no baseline)")
+            continue
+        ratio = r["median"] / b["median"] if b["median"] else float("inf")
+        flag = ""
+        if ratio > threshold and r["median"] - b["median"] > NOISE_FLOOR_S:
+            flag = "  REGRESSION"
+            regressions.append(f"{name}: {ratio:.2f}x")
+        print(f"{name:<32} {b['median'] * 1000:10.2f} -> {r['median'] * 1000:10.2f} ms  ({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--size", choices=sorted(SIZES), default="small")
+    common.add_argument("--seed", type=int, default=1)
+    common.add_argument("--data-dir", help="where generated databases are cached (default: temp dir)")
+
+    timing = argparse.ArgumentParser(add_help=False, parents=[common])
+    timing.add_argument("--repeat", type=int, default=5)
+    timing.add_argument("--only", action="append", metavar="SCENARIO", choices=sorted(SCENARIOS))
+
+    p = sub.add_parser("run", parents=[timing], help="time the scenarios")
+    p.add_argument("--save", metavar="FILE", help="write results as JSON (e.g. a new baseline)")
+
+    p = sub.add_parser("compare", parents=[timing], help="time the scenarios and compare with a baseline")
+    p.add_argument("--baseline", default=BASELINE)
+    p.add_argument("--threshold", type=float, default=1.25, help="allowed slowdown factor (default 1.25)")
+
+    p = sub.add_parser("generate", parents=[common], help="write a synthetic database")
+    p.add_argument("-o", "--output", required=True)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.command == "generate":
+        if os.path.exists(args.output):
+            raise SystemExit(f"{args.output} exists already")
+        db = DB(args.output)
+        try:
+            populate_size(db, args.size, args.seed)
+        finally:
+            db.close()
+        return 0
+
+    if args.command == "run":
+        current = run_all(args)
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+                f.write("\n")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("size") != args.size:
+        print(f"warning: baseline was recorded with --size {baseline.get('meta', {}).get('size')}", file=sys.stderr)
+    regressions = compare(run_all(args), baseline, args.threshold)
+    if regressions:
+        print("regressions: " + ", ".join(regressions), file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,241 @@
+"""Timed scenarios. Each factory takes a database path and yields `run()`.
+
+Setup work (opening the DB, sampling ids) happens in the factory and is not
+timed; only `run()` is. The factories are context managers (see `scenario`),
+so the connections they open are closed after timing. Scenarios only read,
+so one generated database can be reused across runs.
+"""
+
+import random
+from contextlib import closing, contextmanager
+
+from we.cost_engine import CostEngine
+from we.db import DB, PRODUCT_SORT_KEYS, product_sort_key
+from we.search import PrefixIndex
+from we.whatif import parse_rules, simulate
+
+SCENARIOS = {}
+
+SAMPLE = 200  # products / ingredients touched per run
+TYPED = ("s", "sa", "sah", "sahn", "sahne", "sahn", "sah", "sa", "s", "")  # typing, then backspacing
+
+
+def scenario(name: str):
+    def deco(factory):
+        SCENARIOS[name] = contextmanager(factory)
+        return factory
+
+    return deco
+
+
+def _sample_ids(db, table: str, k: int = SAMPLE, seed: int = 7):
+    ids = [r[0] for r in db.conn.execute(f"SELECT id FROM {table};")]
+    return random.Random(seed).sample(ids, min(k, len(ids)))
+
+
+@scenario("startup")
+def startup(path):
+    """Open + migrate the DB, load the cost engine and compute every cost (worker start)."""
+
+    def run():
+        db = DB(path)
+        try:
+            CostEngine(db).costs()
+        finally:
+            db.close()
+
+    yield run
+
+
+
+@scenario("compute_product_cost.sql")
+def compute_product_cost_sql(path):
+    """DB.compute_product_cost without an engine: one recipe query per product."""
+    db = DB(path)
+    pids = _sample_ids(db, "products")
+
+    def run():
+        for pid in pids:
+            db.compute_product_cost(pid)
+
+    try:
+        yield run
+    finally:
+        db.close()
+
+
+
+@scenario("compute_product_cost.engine")
+def compute_product_cost_engine(path):
+    """Ingredient price changes reported to the CostEngine, then the dependent costs recomputed."""
+    db = DB(path)
+    engine = CostEngine(db)
+    engine.costs()
+    ing_ids = _sample_ids(db, "ingredients", k=20)
+
+    def run():
+        for ing_id in ing_ids:
+            engine.ingredient_changed(ing_id)
+        engine.costs()
+
+    try:
+        yield run
+    finally:
+        db.close()
+
+
+
+@scenario("compute_product_cost.matrix")
+def compute_product_cost_matrix(path):
+    """Price list import: every ingredient price reported changed, then all costs from the cost matrix."""
+    db = DB(path)
+    engine = CostEngine(db)
+    engine.costs()
+    ing_ids = [r[0] for r in db.conn.execute("SELECT id FROM ingredients;")]
+
+    def run():
+        for ing_id in ing_ids:
+            engine.ingredient_changed(ing_id)
+        engine.costs()
+
+    try:
+        yield run
+    finally:
+        db.close()
+
+
+
+@scenario("costs_as_of")
+def costs_as_of(path):
+    """All product costs with the ingredient prices of a past day (one set-based query)."""
+    db = DB(path)
+
+    def run():
+        db.compute_all_costs_as_of("2024-07-15")
+
+    try:
+        yield run
+    finally:
+        db.close()
+
+
+
+@scenario("cost_history.36m")
+def cost_history_36m(path):
+    """Monthly cost report over three years of price history."""
+    db = DB(path)
+    days = [f"{2023 + m // 12}-{m % 12 + 1:02d}-01" for m in range(36)]
+
+    def run():
+        for _day, _costs in db.cost_history(days):
+            pass
+
+    try:
+        yield run
+    finally:
+        db.close()
+
+
+
+@scenario("whatif")
+def whatif(path):
+    """What-if dialog: all costs and margins for a two-rule price scenario (worker with engine)."""
+    db = DB(path)
+    CostEngine(db).costs()
+    rules = parse_rules(["*a*=+8%", "*=+3%"])
+
+    def run():
+        simulate(db, rules)
+
+    try:
+        yield run
+    finally:
+        db.close()
+
+
+
+@scenario("refresh_products.page")
+def refresh_products_page(path):
+    """ProductsTab.refresh_products per sort order: count, selected row position, then 5 keyset pages."""
+    db = DB(path)
+    pid = _sample_ids(db, "products", k=1)[0]
+
+    def run():
+        for sort in PRODUCT_SORT_KEYS:
+            db.count_products()
+            db.product_position(pid, "", sort, True)
+            after = None
+            for _ in range(5):
+                rows = db.product_page("", sort, True, after, limit=100)
+                after = product_sort_key(rows[-1], sort)
+
+    try:
+        yield run
+    finally:
+        db.close()
+
+
+
+@scenario("refresh_products.sql")
+def refresh_products_sql(path):
+    """Product rows straight from the materialized product_costs table."""
+    db = DB(path)
+
+    def run():
+        db.list_product_costs()
+
+    try:
+        yield run
+    finally:
+        db.close()
+
+
+
+@scenario("ingredients_search.db")
+def ingredients_search_db(path):
+    """IngredientsTab search served by the DB's trigram index: count and first page per keystroke."""
+    db = DB(path)
+
+    def run():
+        for q in TYPED:
+            db.count_ingredients(q)
+            db.search_ingredients(q, limit=100)
+
+    try:
+        yield run
+    finally:
+        db.close()
+
+
+
+@scenario("products_search.db")
+def products_search_db(path):
+    """Product name search with count and first page from the DB."""
+    db = DB(path)
+
+    def run():
+        for q in TYPED:
+            db.count_products(q)
+            db.search_products(q, limit=50)
+
+    try:
+        yield run
+    finally:
+        db.close()
+
+
+
+@scenario("autocomplete")
+def autocomplete(path):
+    """Ingredient combobox: build the prefix index, complete each keystroke, resolve names."""
+    with closing(DB(path)) as db:
+        names = db.list_ingredient_names()
+    typed = [n[:k] for n in random.Random(3).sample(names, min(50, len(names))) for k in (1, 3, 6)]
+
+    def run():
+        index = PrefixIndex(names)
+        for t in typed:
+            index.complete(t, 100)
+            index.resolve(t)
+
+    yield run
@@ -0,0 +1,27 @@
+import pytest
+
+from we.db import DB
+
+
+@pytest.fixture
+def db(tmp_path):
+    d = DB(str(tmp_path / "test.db"))
+    yield d
+    d.close()
+
+
+@pytest.fixture
+def stored_costs(db):
+    """Callable returning {product id: cost} as stored in product_costs right now."""
+    return lambda: {pid: cost for pid, _name, cost, *_rest in db.list_product_costs()}
+
+
+@pytest.fixture
+def latte(db):
+    """Milch (1000 ml for 1.00) and a Latte with 200 ml of it; returns (ingredient id, product id)."""
+    db.upsert_ingredient("Milch", "ml", 1000, 1.0)
+    milk = db.get_ingredient_id_by_name("Milch")
+    db.upsert_product("Latte")
+    pid = db.get_product_id_by_name("Latte")
+    db.add_product_item(pid, milk, 200)
+    return milk, pid
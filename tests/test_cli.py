@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+from we.db import DB
+
+
+def test_output_into_a_closed_pipe_exits_quietly(tmp_path):
+    path = str(tmp_path / "pipe.db")
+    db = DB(path)
+    for i in range(5000):
+        db.upsert_product(f"Produkt {i:05d}")
+    db.close()
+
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "we", "costs", "--db", path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    proc.stdout.readline()
+    proc.stdout.close()  # like `| head -1`
+    rc = proc.wait(timeout=60)
+    stderr = proc.stderr.read().decode()
+    proc.stderr.close()
+
+    assert rc == 1
+    assert "Traceback" not in stderr
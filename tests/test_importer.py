@@ -0,0 +1,79 @@
+import io
+import sqlite3
+
+import pytest
+
+from we import cli
+from we.cost_engine import CostEngine
+from we.db import DB
+from we.importer import import_price_list, parse_rows, read_rows
+
+
+def _rows(text, delimiter=None):
+    return parse_rows(read_rows(io.StringIO(text), delimiter))
+
+
+def _prices(db):
+    return {name: (unit, qty, price) for _id, name, unit, qty, price in db.list_ingredients()}
+
+
+def test_header_in_any_order_and_german_numbers():
+    rows = list(_rows("EK;Artikel;Inhalt;Einheit\n2,50;Milch;1000;ML\n"))
+    assert rows == [(2, ("Milch", "ml", 1000.0, 2.5), None)]
+
+
+def test_rejected_rows_carry_line_and_reason():
+    rows = list(_rows("Milch;oz;1;1\n;ml;1;1\nSahne;ml;0;1\nZucker;g\n"))
+    assert [(line, reason is not None) for line, _record, reason in rows] == [(1, True), (2, True), (3, True), (4, True)]
+    assert "zu wenige Spalten" in rows[3][2]
+
+
+def test_repeated_name_counts_once_and_last_line_wins(db):
+    db.upsert_ingredient("Rum", "ml", 700, 14.0)
+    report = import_price_list(db, _rows("Rum;ml;700;15\nGin;ml;700;20\nRum;ml;700;16\n"))
+    assert report == {"inserted": 1, "updated": 1, "unchanged": 0, "rejected": []}
+    assert _prices(db) == {"Rum": ("ml", 700.0, 16.0), "Gin": ("ml", 700.0, 20.0)}
+
+
+def test_import_recomputes_costs_once(db, latte, stored_costs):
+    _milk, pid = latte
+    engine = CostEngine(db)
+
+    import_price_list(db, _rows("Milch;ml;1000;2\nMilch;ml;1000;3\n"))
+
+    assert stored_costs()[pid] == pytest.approx(0.6)
+    assert engine.cost(pid) == pytest.approx(0.6)
+
+
+def test_dry_run_writes_nothing(db):
+    report = import_price_list(db, _rows("Rum;ml;700;15\n"), dry_run=True)
+    assert report["inserted"] == 1
+    assert _prices(db) == {}
+
+
+def test_cli_import_reports_database_errors(tmp_path, monkeypatch, capsys):
+    def _fail(*_args, **_kwargs):
+        raise sqlite3.OperationalError("attempt to write a readonly database")
+
+    monkeypatch.setattr(cli, "import_price_list_file", _fail)
+    price_list = tmp_path / "preise.csv"
+    price_list.write_text("Rum;ml;700;15\n", encoding="utf-8")
+    path = str(tmp_path / "test.db")
+    DB(path).close()
+
+    rc = cli.main(["import", "--db", path, str(price_list)])
+
+    assert rc == 1
+    assert "readonly database" in capsys.readouterr().err
+
+
+def test_cli_import_reports_unopenable_databases(tmp_path, capsys):
+    price_list = tmp_path / "preise.csv"
+    price_list.write_text("Rum;ml;700;15\n", encoding="utf-8")
+    broken = tmp_path / "kaputt.db"
+    broken.write_bytes(b"keine Datenbank" * 100)
+
+    rc = cli.main(["import", "--db", str(broken), str(price_list)])
+
+    assert rc == 1
+    assert str(broken) in capsys.readouterr().err
@@ -0,0 +1,54 @@
+import pytest
+
+from we import migrations
+from we.db import DB
+
+NAMES = ["Öl Olive", "Kürbiskernöl", "MÖHRE", "Möhrensaft", "Hafermilch", "HAFER Drink", "100% Saft_a"]
+
+
+@pytest.fixture(params=["fts", "fallback"])
+def search_db(request, tmp_path, monkeypatch):
+    if request.param == "fallback":
+        monkeypatch.setattr(migrations, "_fts5_trigram_available", lambda _cur: False)
+    d = DB(str(tmp_path / "search.db"))
+    assert d._fts == (request.param == "fts")
+    for name in NAMES:
+        d.upsert_ingredient(name, "ml", 1000, 1.0)
+    yield d
+    d.close()
+
+
+def _names(db, query):
+    return sorted(r[1] for r in db.search_ingredients(query))
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("ö", ["Kürbiskernöl", "MÖHRE", "Möhrensaft", "Öl Olive"]),
+        ("öl", ["Kürbiskernöl", "Öl Olive"]),
+        ("möhre", ["MÖHRE", "Möhrensaft"]),
+        ("ÖHR", ["MÖHRE", "Möhrensaft"]),
+        ("hafer", ["HAFER Drink", "Hafermilch"]),
+        ("er d", ["HAFER Drink"]),
+        ("%", ["100% Saft_a"]),
+        ("t_a", ["100% Saft_a"]),
+        ("", sorted(NAMES)),
+    ],
+)
+def test_substring_search_ignores_case_including_umlauts(search_db, query, expected):
+    assert _names(search_db, query) == expected
+    assert search_db.count_ingredients(query) == len(expected)
+
+
+def test_search_follows_renames(search_db):
+    search_db.conn.execute("UPDATE ingredients SET name = 'Rapsöl' WHERE name = 'Hafermilch';")
+    assert _names(search_db, "RAPSÖL") == ["Rapsöl"]
+    assert _names(search_db, "milch") == []
+
+
+def test_ingredient_position_matches_the_paged_search(search_db):
+    rows = [r for start in range(0, 4) for r in search_db.search_ingredients("ö", 1, start)]
+    assert [search_db.ingredient_position(r[0], "ö") for r in rows] == [0, 1, 2, 3]
+    hafer = search_db.get_ingredient_id_by_name("Hafermilch")
+    assert search_db.ingredient_position(hafer, "ö") is None
@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+
+import pytest
+
+
+def _today(db):
+    return db.conn.execute("SELECT date('now', 'localtime');").fetchone()[0]
+
+
+def test_inserts_and_price_changes_are_recorded_once_per_day(db, latte):
+    ing_id, _pid = latte
+    today = _today(db)
+    assert db.list_ingredient_prices(ing_id) == [(today, 1000.0, 1.0)]
+    db.upsert_ingredient("Milch", "ml", 1000, 1.2)
+    db.upsert_ingredient("Milch", "ml", 1000, 1.3)
+    assert db.list_ingredient_prices(ing_id) == [(today, 1000.0, 1.3)]
+
+
+def test_backdated_prices_and_costs_as_of(db, latte):
+    ing_id, pid = latte
+    db.add_ingredient_price(ing_id, "2024-01-01", 1000, 0.5)
+    db.add_ingredient_price(ing_id, "2024-07-01", 1000, 0.8)
+
+    assert db.unit_prices_as_of("2023-06-01")[ing_id] == pytest.approx(0.0005)  # before the first entry
+    assert db.unit_prices_as_of("2024-03-15")[ing_id] == pytest.approx(0.0005)
+    assert db.unit_prices_as_of("2024-07-01")[ing_id] == pytest.approx(0.0008)
+    assert db.compute_all_costs_as_of("2024-03-15")[pid] == pytest.approx(0.1)
+    assert db.compute_all_costs_as_of(_today(db))[pid] == pytest.approx(0.2)
+    # older entries don't touch the current price
+    assert db.list_ingredients()[0][4] == 1.0
+
+    history = dict(db.cost_history(["2024-02-01", "2024-08-01"]))
+    assert history["2024-02-01"][pid] == pytest.approx(0.1)
+    assert history["2024-08-01"][pid] == pytest.approx(0.16)
+
+
+def test_newest_backdated_price_becomes_the_current_one(db):
+    db.upsert_ingredient("Sahne", "ml", 1000, 4.0)
+    ing_id = db.get_ingredient_id_by_name("Sahne")
+    db.conn.execute("UPDATE ingredient_prices SET valid_from = '2020-01-01' WHERE ingredient_id = ?;", (ing_id,))
+    db.conn.commit()
+    yesterday = (date.fromisoformat(_today(db)) - timedelta(days=1)).isoformat()
+
+    db.add_ingredient_price(ing_id, yesterday, 500, 3.0)
+
+    assert db.list_ingredients()[0][3:] == (500.0, 3.0)
+    assert [row[0] for row in db.list_ingredient_prices(ing_id)] == [yesterday, "2020-01-01"]  # no extra row for today
+
+
+def test_future_prices_and_bad_dates_are_refused(db, latte):
+    ing_id, _pid = latte
+    tomorrow = (date.fromisoformat(_today(db)) + timedelta(days=1)).isoformat()
+    with pytest.raises(ValueError):
+        db.add_ingredient_price(ing_id, tomorrow, 1000, 2.0)
+    with pytest.raises(ValueError):
+        db.add_ingredient_price(ing_id, "31.12.2024", 1000, 2.0)
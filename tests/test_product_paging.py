@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from we.db import PRODUCT_SORT_KEYS, product_sort_key
+
+
+@pytest.fixture
+def catalog(db):
+    rng = random.Random(5)
+    db.upsert_ingredient("Milch", "ml", 1000, 1.0)
+    milk = db.get_ingredient_id_by_name("Milch")
+    with db.transaction():
+        for i in range(60):
+            name = f"{rng.choice(['latte', 'Latte', 'Mocha', 'chai'])} {i % 7}"  # repeated keys
+            db.upsert_product(f"{name} #{i:02d}")
+            pid = db.get_product_id_by_name(f"{name} #{i:02d}")
+            if i % 3:
+                db.add_product_item(pid, milk, rng.choice((100, 200, 300)))
+            db.set_sale_price(pid, None if i % 4 == 0 else rng.choice((2.0, 3.5, 4.0)))
+    return db
+
+
+@pytest.mark.parametrize("sort", sorted(PRODUCT_SORT_KEYS))
+@pytest.mark.parametrize("desc", [False, True])
+def test_keyset_pages_match_the_full_list(catalog, sort, desc):
+    full = catalog.product_page("", sort, desc, limit=-1)
+    assert len(full) == 60
+
+    pages, after = [], None
+    while True:
+        page = catalog.product_page("", sort, desc, after, limit=7)
+        if not page:
+            break
+        pages.extend(page)
+        after = product_sort_key(page[-1], sort)
+    assert pages == full
+
+    for index, row in enumerate(full):
+        assert catalog.product_position(row[0], "", sort, desc) == index
+
+
+def test_keyset_pages_with_a_filter(catalog):
+    full = catalog.product_page("latte", "margin", True, limit=-1)
+    assert full and all("latte" in row[1].lower() for row in full)
+    first = catalog.product_page("latte", "margin", True, limit=5)
+    rest = catalog.product_page("latte", "margin", True, product_sort_key(first[-1], "margin"), limit=-1)
+    assert first + rest == full
+    assert catalog.product_position(full[3][0], "latte", "margin", True) == 3
+    outside = next(row[0] for row in catalog.product_page("chai", limit=1))
+    assert catalog.product_position(outside, "latte", "margin", True) is None
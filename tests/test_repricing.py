@@ -0,0 +1,99 @@
+import shutil
+
+import pytest
+
+from we import cli
+from we.db import DB
+from we.repricing import ROUNDINGS, plan_repricing, round_price, target_price
+
+
+def test_target_price_reaches_the_margin():
+    assert target_price(3.0, 70) == pytest.approx(10.0)
+    assert target_price(3.0, 0) == pytest.approx(3.0)
+
+
+@pytest.mark.parametrize("margin", [-1, 100, 120])
+def test_target_price_rejects_impossible_margins(margin):
+    with pytest.raises(ValueError):
+        target_price(1.0, margin)
+
+
+@pytest.mark.parametrize(
+    "price, rounding, expected",
+    [
+        (4.12, "0,01", 4.12),
+        (4.1200000001, "0,01", 4.12),
+        (4.121, "0,01", 4.13),
+        (4.12, "0,10", 4.20),
+        (4.12, "0,50", 4.50),
+        (4.12, "x,00", 5.00),
+        (4.12, "x,50", 4.50),
+        (4.62, "x,50", 5.50),
+        (4.12, "x,90", 4.90),
+        (4.95, "x,90", 5.90),
+        (4.90, "x,90", 4.90),
+        (4.12, "x,99", 4.99),
+        (0.30, "x,90", 0.90),
+    ],
+)
+def test_round_price_rounds_up_to_the_grid(price, rounding, expected):
+    assert round_price(price, rounding) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("rounding", sorted(ROUNDINGS))
+def test_round_price_never_lowers_the_price(rounding):
+    for cents in range(1, 2000, 7):
+        price = cents / 100.0
+        assert round_price(price, rounding) >= price - 1e-9
+
+
+def test_plan_repricing(db):
+    db.upsert_ingredient("Milch", "ml", 1000, 1.0)
+    milk = db.get_ingredient_id_by_name("Milch")
+    for name, qty, price in (("Latte", 300, 0.9), ("Flat White", 200, 5.0), ("Cortado", 100, None)):
+        db.upsert_product(name)
+        pid = db.get_product_id_by_name(name)
+        db.add_product_item(pid, milk, qty)
+        db.set_sale_price(pid, price)
+    db.upsert_product("Leer")  # no recipe, no cost: left out
+
+    plan = plan_repricing(db, 70, "x,90", only_below=True)
+
+    assert [(name, new_price) for _pid, name, _cost, _old, new_price, _om, _nm in plan] == [
+        ("Cortado", pytest.approx(0.90)),
+        ("Latte", pytest.approx(1.90)),
+    ]
+    assert all(new_margin >= 70 for *_rest, new_margin in plan)
+    # without only_below, prices above the target are lowered to it as well
+    assert [(row[1], row[4]) for row in plan_repricing(db, 70, "x,90", query="flat")] == [
+        ("Flat White", pytest.approx(0.90))
+    ]
+
+
+def test_cli_reprice_reports_which_databases_were_written(tmp_path, db, latte, capsys):
+    db.close()  # copied below
+    paths = [tmp_path / f"{name}.db" for name in ("a", "b", "c")]
+    for path in paths:
+        shutil.copy(tmp_path / "test.db", path)
+    locked = DB(str(paths[1]))
+    locked.conn.execute(
+        "CREATE TRIGGER locked BEFORE UPDATE OF sale_price ON products BEGIN SELECT RAISE(ABORT, 'gesperrt'); END;"
+    )
+    locked.conn.commit()
+    locked.close()
+
+    argv = ["reprice", "--margin", "70", "--apply"]
+    for path in paths:
+        argv += ["--db", str(path)]
+    rc = cli.main(argv)
+
+    assert rc == 1
+    err = capsys.readouterr().err
+    assert f"gespeichert: {paths[0]}" in err
+    assert f"nicht gespeichert: {paths[1]}, {paths[2]}" in err
+    prices = []
+    for path in paths:
+        copy = DB(str(path))
+        prices.append(copy.get_sale_price(latte[1]))
+        copy.close()
+    assert prices[0] is not None and prices[1:] == [None, None]
@@ -0,0 +1,75 @@
+import pytest
+
+from we.cost_engine import CostEngine
+from we.recipe_graph import flatten_lines, topological_order
+
+
+def _product(db, name, lines=()):
+    db.upsert_product(name)
+    pid = db.get_product_id_by_name(name)
+    for ing_id, qty in lines:
+        db.add_product_item(pid, ing_id, qty)
+    return pid
+
+
+def test_topological_order_puts_children_first_and_skips_back_edges():
+    children = {1: [2, 3], 2: [3], 3: [1]}  # 3 -> 1 closes a cycle
+    order = topological_order([1], lambda n: children.get(n, ()))
+    assert sorted(order) == [1, 2, 3]
+    assert order.index(3) < order.index(2) < order.index(1)
+
+
+def test_flatten_lines_expands_components_with_their_factor():
+    own = {1: [(10, 1.0)], 2: [(10, 2.0), (11, 5.0)], 3: []}
+    components = {1: [(2, 0.5)], 3: [(1, 2.0), (2, 1.0)]}
+    flat = flatten_lines([3], lambda pid: own[pid], components)
+    assert dict(flat[2]) == {10: 2.0, 11: 5.0}
+    assert dict(flat[1]) == {10: 2.0, 11: 2.5}
+    assert dict(flat[3]) == {10: 6.0, 11: 10.0}
+
+
+def test_component_costs_propagate_to_all_ancestors(db, stored_costs):
+    db.upsert_ingredient("Zucker", "g", 1000, 2.0)
+    db.upsert_ingredient("Wasser", "ml", 1000, 0.0)
+    sugar = db.get_ingredient_id_by_name("Zucker")
+    syrup = _product(db, "Sirup", [(sugar, 500), (db.get_ingredient_id_by_name("Wasser"), 500)])
+    base = _product(db, "Basis")
+    drink = _product(db, "Drink")
+    db.add_product_component(base, syrup, 2)
+    db.add_product_component(drink, base, 0.5)
+    engine = CostEngine(db)
+
+    assert stored_costs()[drink] == pytest.approx(1.0)
+    db.upsert_ingredient("Zucker", "g", 1000, 4.0)
+    engine.ingredient_changed(sugar)
+    assert stored_costs()[drink] == pytest.approx(2.0)
+    assert engine.cost(drink) == pytest.approx(2.0)
+    assert db.compute_all_costs()[drink] == pytest.approx(2.0)
+
+
+def test_cycles_are_refused(db):
+    a, b, c = (_product(db, name) for name in "ABC")
+    db.add_product_component(a, b, 1)
+    db.add_product_component(b, c, 1)
+    with pytest.raises(ValueError):
+        db.add_product_component(c, a, 1)
+    with pytest.raises(ValueError):
+        db.add_product_component(a, a, 1)
+
+
+def test_costs_as_of_cost_shared_components_once(db, stored_costs):
+    # 40 levels, each product containing both products of the level below:
+    # 2**40 paths through the graph, but only 80 products to cost
+    db.upsert_ingredient("Mehl", "g", 1000, 1.0)
+    flour = db.get_ingredient_id_by_name("Mehl")
+    below = [_product(db, "L0a", [(flour, 1000)]), _product(db, "L0b", [(flour, 1000)])]
+    for level in range(1, 40):
+        here = [_product(db, f"L{level}a"), _product(db, f"L{level}b")]
+        for pid in here:
+            for component in below:
+                db.add_product_component(pid, component, 0.5)
+        below = here
+
+    costs = db.compute_all_costs_as_of("2000-01-01")
+    assert costs[below[0]] == pytest.approx(1.0)
+    assert costs == pytest.approx(stored_costs())
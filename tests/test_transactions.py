@@ -0,0 +1,49 @@
+import pytest
+
+
+def test_transaction_rolls_back_everything(db, latte, stored_costs):
+    _milk, pid = latte
+    with pytest.raises(ZeroDivisionError):
+        with db.transaction():
+            db.upsert_ingredient("Milch", "ml", 1000, 2.0)
+            1 / 0
+    assert stored_costs()[pid] == pytest.approx(0.2)
+
+
+def test_deferred_costs_refreshed_at_the_end(db, latte, stored_costs):
+    _milk, pid = latte
+    with db.transaction(), db.deferred_ingredient_costs():
+        db.upsert_ingredient("Milch", "ml", 1000, 2.0)
+        assert stored_costs()[pid] == pytest.approx(0.2)  # not yet
+    assert stored_costs()[pid] == pytest.approx(0.4)
+
+
+def test_deferred_costs_reset_when_the_block_raises(db, latte, stored_costs):
+    _milk, pid = latte
+    with db.transaction():
+        try:
+            with db.deferred_ingredient_costs():
+                db.upsert_ingredient("Milch", "ml", 1000, 2.0)
+                raise ValueError
+        except ValueError:
+            pass
+    assert stored_costs()[pid] == pytest.approx(0.4)
+    assert db.conn.execute("SELECT COUNT(*) FROM cost_refresh_deferred;").fetchone()[0] == 0
+
+    db.upsert_ingredient("Milch", "ml", 1000, 3.0)  # the cost trigger works again
+    assert stored_costs()[pid] == pytest.approx(0.6)
+
+
+def test_nested_deferred_blocks_refresh_once_at_the_outer_end(db, latte, stored_costs):
+    _milk, pid = latte
+    with db.transaction(), db.deferred_ingredient_costs():
+        with db.deferred_ingredient_costs():
+            db.upsert_ingredient("Milch", "ml", 1000, 2.0)
+        assert stored_costs()[pid] == pytest.approx(0.2)
+    assert stored_costs()[pid] == pytest.approx(0.4)
+
+
+def test_deferred_costs_need_a_transaction(db):
+    with pytest.raises(RuntimeError):
+        with db.deferred_ingredient_costs():
+            pass
@@ -0,0 +1,72 @@
+import pytest
+
+from we.cli import check_db
+from we.cost_engine import CostEngine
+from we.units import base_unit, compatible_units, factor, pack_unit_price, parse_quantity, to_base
+
+
+def test_families_and_factors():
+    assert [base_unit(u) for u in ("ml", "cl", "l", "g", "kg", "stk")] == ["ml", "ml", "ml", "g", "g", "stk"]
+    assert to_base(0.7, "l") == pytest.approx(700.0)
+    assert to_base(2, "cl") == pytest.approx(20.0)
+    assert factor("kg") == 1000.0
+    assert compatible_units("cl") == ["ml", "cl", "l"]
+    assert compatible_units("stk") == ["stk"]
+
+
+def test_pack_unit_price_is_per_base_unit():
+    assert pack_unit_price(0.7, 14.0, "l") == pytest.approx(0.02)
+    assert pack_unit_price(700, 14.0, "ml") == pytest.approx(0.02)
+    assert pack_unit_price(0, 14.0, "l") == 0.0
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [("2", (2.0, None)), ("2,5 cl", (2.5, "cl")), ("0.7kg", (0.7, "kg")), (" 3 Stk ", (3.0, "stk")), (",5 l", (0.5, "l"))],
+)
+def test_parse_quantity(text, expected):
+    assert parse_quantity(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "cl", "2 oz", "2 3", "-1"])
+def test_parse_quantity_rejects(text):
+    with pytest.raises(ValueError):
+        parse_quantity(text)
+
+
+def test_recipe_lines_in_any_compatible_unit(db, latte, stored_costs):
+    milk, pid = latte
+    db.upsert_ingredient("Zucker", "kg", 1, 2.0)
+    sugar = db.get_ingredient_id_by_name("Zucker")
+    db.add_product_item(pid, milk, 5, "cl")
+    db.add_product_item(pid, sugar, 20, "g")
+    db.add_product_item(pid, sugar, 0.02)  # in the ingredient's unit (kg)
+    view = db.get_recipe_view(pid)
+    lines = sorted((name, qty, unit) for _id, name, qty, unit, _price, _cost in view["items"])
+    assert lines == [("Milch", 5.0, "cl"), ("Milch", 200.0, "ml"), ("Zucker", pytest.approx(0.02), "kg"), ("Zucker", 20.0, "g")]
+    assert view["cost"] == pytest.approx(250 * 0.001 + 40 * 0.002)
+    assert stored_costs()[pid] == pytest.approx(view["cost"])
+    assert CostEngine(db).cost(pid) == pytest.approx(view["cost"])
+    assert check_db(db) == []
+
+
+def test_incompatible_units_are_refused(db, latte):
+    milk, pid = latte
+    with pytest.raises(ValueError):
+        db.add_product_item(pid, milk, 20, "g")
+
+
+def test_unit_change_keeping_the_price_per_base_unit_keeps_costs(db, latte, stored_costs):
+    _milk, pid = latte
+    before = stored_costs()[pid]
+    db.upsert_ingredient("Milch", "l", 1, 1.0)
+    assert stored_costs()[pid] == pytest.approx(before)
+
+    db.upsert_ingredient("Milch", "l", 1, 4.0)
+    assert stored_costs()[pid] == pytest.approx(200 * 0.004)
+    assert check_db(db) == []
+
+
+def test_check_reports_a_stale_unit_price(db, latte):
+    db.conn.execute("UPDATE ingredients SET unit_price = 1.0 WHERE name = 'Milch';")
+    assert any("Einheitspreis veraltet: 'Milch'" in p for p in check_db(db))
@@ -0,0 +1,62 @@
+import pytest
+
+from we.cost_engine import CostEngine
+from we.whatif import parse_rule, parse_rules, scenario_pack_prices, simulate, summary
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("*sahne*=+8%", ("*sahne*", 8.0, True)),
+        ("  *=-2,5 %  ", ("*", -2.5, True)),
+        ("Rum = 12.90", ("Rum", 12.9, False)),
+        ("a=b=3", ("a=b", 3.0, False)),
+    ],
+)
+def test_parse_rule(text, expected):
+    assert parse_rule(text) == expected
+
+
+@pytest.mark.parametrize("text", ["Rum", "Rum=", "=5%", "Rum=abc", "Rum=-3"])
+def test_parse_rule_rejects(text):
+    with pytest.raises(ValueError):
+        parse_rule(text)
+
+
+def test_parse_rules_skips_blank_lines_and_comments():
+    assert parse_rules(["# Kommentar", "", "  ", "Rum=10"]) == [("Rum", 10.0, False)]
+
+
+def test_percent_rules_compound_and_fixed_prices_replace():
+    ingredients = [
+        (1, "Schlagsahne", "ml", 1000, 10.0),
+        (2, "Rum", "ml", 700, 20.0),
+        (3, "Zucker", "g", 1000, 2.0),
+    ]
+    changed, matched = scenario_pack_prices(ingredients, parse_rules(["*SAHNE*=+10%", "*=+10%", "rum=15"]))
+    assert changed == pytest.approx({1: 12.1, 2: 15.0, 3: 2.2})
+    assert matched == [1, 3, 1]
+
+
+def test_unchanged_prices_are_not_reported():
+    changed, matched = scenario_pack_prices([(1, "Rum", "ml", 700, 20.0)], parse_rules(["Rum=20", "Gin=+5%"]))
+    assert changed == {}
+    assert matched == [1, 0]
+
+
+@pytest.mark.parametrize("with_engine", [False, True])
+def test_simulate_writes_nothing(db, latte, with_engine):
+    _milk, pid = latte
+    db.set_sale_price(pid, 3.0)
+    if with_engine:
+        CostEngine(db)
+
+    rows, matched = simulate(db, parse_rules(["Milch=+50%"]))
+
+    (_pid, _name, sale_price, cost, new_cost, profit, new_profit, _margin, _new_margin) = rows[0]
+    assert (sale_price, matched) == (3.0, [1])
+    assert cost == pytest.approx(0.2)
+    assert new_cost == pytest.approx(0.3)
+    assert new_profit - profit == pytest.approx(-0.1)
+    assert summary(rows)["affected"] == 1
+    assert db.list_ingredients()[0][4] == 1.0
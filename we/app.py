@@ -1,11 +1,14 @@
 import tkinter as tk
 from tkinter import ttk
 
+from . import instrument
 from .config import BG
 from .theme import apply_theme
-from .db import DB
+from .db_worker import DBWorker
+from .events import EventBus
 from .tabs_ingredients import IngredientsTab
 from .tabs_products import ProductsTab
+from .watchdog import StallWatchdog
 
 
 class App(tk.Tk):
@@ -17,7 +20,15 @@ class App(tk.Tk):
 
         apply_theme(self)
 
-        self.db = DB()
+        # WE_INSTRUMENT=1: time DB calls and refresh paths (wraps before anything is created)
+        if instrument.install_from_env() is not None:
+            self.debug_window = None
+            self.bind_all("<Control-D>", lambda _e: self._toggle_debug_window())
+
+        # all SQLite work runs on a background thread; results come back via after()
+        self.db = DBWorker(self)
+        # tabs publish scoped change events; deliveries are coalesced per Tk tick
+        self.events = EventBus(self)
         self.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self._root_container = tk.Frame(self, bg=BG, bd=0, highlightthickness=0)
@@ -33,18 +44,29 @@ class App(tk.Tk):
         self.notebook.add(self.tab_ing, text="Zutaten")
 
         # Zutaten Tab fertig
-        self.ingredients_tab = IngredientsTab(self, self.tab_ing, self.db, on_any_change=self.refresh_all)
+        self.ingredients_tab = IngredientsTab(self, self.tab_ing, self.db, self.events)
 
-        self.products_tab = ProductsTab(self, self.tab_prod, self.db, on_any_change=self.refresh_all)
+        self.products_tab = ProductsTab(self, self.tab_prod, self.db, self.events)
 
         self.refresh_all()
 
+        # logs mainloop stalls (with the blocking handler's stack) to a rotating file
+        self.watchdog = StallWatchdog(self)
+        self.watchdog.start()
+
     def refresh_all(self):
         self.ingredients_tab.refresh()
         self.products_tab.refresh()
 
+    def _toggle_debug_window(self):
+        from .debug_window import toggle
+
+        toggle(self)
+
     def on_close(self):
         try:
+            self.watchdog.stop()
             self.db.close()
+            instrument.dump()
         finally:
             self.destroy()
\ No newline at end of file
@@ -0,0 +1,521 @@
+"""Headless command line: `python -m we <befehl> [--db DATEI ...]`.
+
+Works on the DB layer only and never imports tkinter, so it also runs on a
+server without a display. Without a command the GUI is started.
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+
+from .config import DB_FILE
+from .cost_engine import CostEngine
+from .db import DB
+from .exporter import DATASETS, csv_paths, export_csv, export_jsonl
+from .importer import import_price_list_file
+from .repricing import DEFAULT_ROUNDING, ROUNDINGS, plan_repricing
+from .units import pack_unit_price
+from .utils import iso_day, profit_margin
+from .whatif import is_affected, parse_rules, simulate, summary
+
+COST_EPS = 1e-6
+
+
+def _existing_db(path: str) -> str:
+    # DB() would silently create a new, empty database for a mistyped path
+    if not os.path.isfile(path):
+        raise argparse.ArgumentTypeError(f"Datenbank nicht gefunden: {path}")
+    return path
+
+
+def _day(value: str) -> str:
+    try:
+        return iso_day(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def _month(value: str) -> tuple:
+    try:
+        year, month = (int(x) for x in value.split("-"))
+        if not 1 <= month <= 12:
+            raise ValueError
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Ungültiger Monat '{value}' (erwartet JJJJ-MM).") from None
+    return year, month
+
+
+def _open_output(path):
+    if not path or path == "-":
+        return sys.stdout
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def _fmt(x, pattern="{:.2f}"):
+    return "" if x is None else pattern.format(x)
+
+
+# ---------- costs ----------
+def cmd_costs(args) -> int:
+    """Cost, profit and margin of every product, from the materialized product_costs table.
+
+    With --as-of the costs are computed from the ingredient prices valid on
+    that day (profit and margin against today's sale prices).
+    """
+    out = _open_output(args.output)
+    try:
+        if args.format == "csv":
+            w = csv.writer(out, delimiter=args.delimiter)
+            w.writerow(["db", "product_id", "product", "cost", "sale_price", "profit", "margin_pct"])
+
+        for path in args.db:
+            db = DB(path)
+            try:
+                rows = db.list_product_costs()
+                if args.as_of:
+                    costs = db.compute_all_costs_as_of(args.as_of)
+                    rows = [
+                        (pid, name, costs[pid], sale_price, *profit_margin(costs[pid], sale_price))
+                        for pid, name, _cost, sale_price, _profit, _margin in rows
+                    ]
+                rows.sort(key=lambda r: (r[1] or "").lower())
+            finally:
+                db.close()
+
+            if args.format == "csv":
+                for pid, name, cost, sale_price, profit, margin in rows:
+                    w.writerow(
+                        [path, pid, name, _fmt(cost, "{:.4f}"), _fmt(sale_price), _fmt(profit, "{:.4f}"), _fmt(margin)]
+                    )
+                continue
+
+            if len(args.db) > 1:
+                print(f"== {path}", file=out)
+            width = max([len("Produkt")] + [len(r[1] or "") for r in rows])
+            print(f"{'Produkt':<{width}}  {'Kosten':>10}  {'VK':>10}  {'Gewinn':>10}  {'Marge %':>8}", file=out)
+            for _pid, name, cost, sale_price, profit, margin in rows:
+                print(
+                    f"{name:<{width}}  {cost:>10.2f}  {_fmt(sale_price):>10}  {_fmt(profit):>10}  {_fmt(margin, '{:.1f}'):>8}",
+                    file=out,
+                )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+# ---------- cost-history ----------
+def cmd_cost_history(args) -> int:
+    """Cost of every product at the start of each month, from the ingredient price history."""
+    (y0, m0), (y1, m1) = args.start, args.end
+    days = [f"{m // 12:04d}-{m % 12 + 1:02d}-01" for m in range(y0 * 12 + m0 - 1, y1 * 12 + m1)]
+    if not days:
+        print("cost-history: --to liegt vor --from", file=sys.stderr)
+        return 2
+    months = [day[:7] for day in days]
+
+    out = _open_output(args.output)
+    try:
+        if args.format == "csv":
+            w = csv.writer(out, delimiter=args.delimiter)
+            w.writerow(["db", "product_id", "product", *months])
+
+        for path in args.db:
+            db = DB(path)
+            try:
+                products = sorted(db.list_products(), key=lambda r: (r[1] or "").lower())
+                columns = [costs for _day, costs in db.cost_history(days)]
+            finally:
+                db.close()
+
+            if args.format == "csv":
+                for pid, name, _sale_price in products:
+                    w.writerow([path, pid, name, *(_fmt(costs[pid], "{:.4f}") for costs in columns)])
+                continue
+
+            if len(args.db) > 1:
+                print(f"== {path}", file=out)
+            width = max([len("Produkt")] + [len(r[1] or "") for r in products])
+            print(f"{'Produkt':<{width}}" + "".join(f"  {month:>9}" for month in months), file=out)
+            for pid, name, _sale_price in products:
+                print(f"{name:<{width}}" + "".join(f"  {costs[pid]:>9.2f}" for costs in columns), file=out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+# ---------- check ----------
+def check_db(db: DB) -> list:
+    """Integrity problems of one database as a list of messages (empty = ok)."""
+    problems = []
+    cur = db.conn.cursor()
+
+    cur.execute("PRAGMA integrity_check;")
+    result = [r[0] for r in cur.fetchall()]
+    if result != ["ok"]:
+        problems.extend(f"integrity_check: {r}" for r in result)
+
+    cur.execute("PRAGMA foreign_key_check;")
+    for table, rowid, parent, _fkid in cur.fetchall():
+        problems.append(f"Fremdschlüssel: {table} rowid={rowid} verweist auf fehlende Zeile in {parent}")
+
+    # stored unit prices (trigger-maintained) vs. the pack prices
+    cur.execute("SELECT name, unit, pack_qty, pack_price, unit_price FROM ingredients;")
+    for name, unit, pack_qty, pack_price, unit_price in cur.fetchall():
+        expected = pack_unit_price(pack_qty, pack_price, unit)
+        if abs((unit_price or 0.0) - expected) > COST_EPS:
+            problems.append(f"Einheitspreis veraltet: '{name}' gespeichert {unit_price:.6f}, berechnet {expected:.6f}")
+
+    # materialized costs (trigger-maintained) vs. a fresh in-memory computation
+    engine_costs = CostEngine(db).costs()
+    for pid, name, cost, _sale_price, _profit, _margin in db.list_product_costs():
+        expected = engine_costs.get(pid, 0.0)
+        if abs((cost or 0.0) - expected) > COST_EPS:
+            problems.append(f"Kosten veraltet: '{name}' gespeichert {cost:.4f}, berechnet {expected:.4f}")
+    return problems
+
+
+def cmd_check(args) -> int:
+    failed = 0
+    for path in args.db:
+        db = DB(path)
+        try:
+            problems = check_db(db)
+        finally:
+            db.close()
+        if problems:
+            failed += 1
+            print(f"{path}: {len(problems)} Problem(e)")
+            for p in problems:
+                print(f"  {p}")
+        else:
+            print(f"{path}: ok")
+    return 1 if failed else 0
+
+
+# ---------- whatif ----------
+def cmd_whatif(args) -> int:
+    """Costs and margins under hypothetical ingredient prices, as deltas against the current ones."""
+    lines = list(args.rule)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            lines.extend(f.read().splitlines())
+    try:
+        rules = parse_rules(lines)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if not rules:
+        print("Keine Regeln angegeben (z.B. '*sahne*=+8%').", file=sys.stderr)
+        return 2
+
+    out = _open_output(args.output)
+    try:
+        if args.format == "csv":
+            w = csv.writer(out, delimiter=args.delimiter)
+            w.writerow(
+                ["db", "product_id", "product", "sale_price", "cost", "new_cost", "profit", "new_profit", "margin_pct", "new_margin_pct"]
+            )
+
+        for path in args.db:
+            db = DB(path)
+            try:
+                rows, matched = simulate(db, rules)
+            finally:
+                db.close()
+            for (pattern, _value, _pct), n in zip(rules, matched):
+                if not n:
+                    print(f"{path}: Regel '{pattern}' trifft keine Zutat", file=sys.stderr)
+            shown = rows if args.all else [r for r in rows if is_affected(r)]
+
+            if args.format == "csv":
+                for pid, name, sale_price, cost, new_cost, profit, new_profit, margin, new_margin in shown:
+                    w.writerow(
+                        [
+                            path,
+                            pid,
+                            name,
+                            _fmt(sale_price),
+                            _fmt(cost, "{:.4f}"),
+                            _fmt(new_cost, "{:.4f}"),
+                            _fmt(profit, "{:.4f}"),
+                            _fmt(new_profit, "{:.4f}"),
+                            _fmt(margin),
+                            _fmt(new_margin),
+                        ]
+                    )
+                continue
+
+            if len(args.db) > 1:
+                print(f"== {path}", file=out)
+            width = max([len("Produkt")] + [len(r[1] or "") for r in shown])
+            print(
+                f"{'Produkt':<{width}}  {'Kosten':>10}  {'neu':>10}  {'Δ':>8}  {'Marge %':>8}  {'neu':>8}  {'Δ Pkt':>7}",
+                file=out,
+            )
+            for _pid, name, _sp, cost, new_cost, _profit, _new_profit, margin, new_margin in shown:
+                delta_margin = _fmt(None if margin is None else new_margin - margin, "{:+.1f}")
+                print(
+                    f"{name:<{width}}  {cost:>10.2f}  {new_cost:>10.2f}  {new_cost - cost:>+8.2f}  "
+                    f"{_fmt(margin, '{:.1f}'):>8}  {_fmt(new_margin, '{:.1f}'):>8}  {delta_margin:>7}",
+                    file=out,
+                )
+            s = summary(rows)
+            print(
+                f"{s['affected']} von {s['products']} Produkten betroffen; Kosten {s['cost_delta']:+.2f}, "
+                f"Gewinn {s['profit_delta']:+.2f}, Marge Ø {s['margin_delta_avg']:+.1f} Pkt.",
+                file=out,
+            )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+# ---------- reprice ----------
+def cmd_reprice(args) -> int:
+    """Sale prices for a target margin: preview, or write them with --apply (one transaction per DB).
+
+    All databases are planned before any is written; if writing one fails, the
+    ones already written are listed and the rest are left unchanged.
+    """
+    plans = []
+    for path in args.db:
+        db = None
+        try:
+            db = DB(path)
+            plans.append((path, plan_repricing(db, args.margin, args.rounding, args.search, args.only_below)))
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        except sqlite3.Error as e:
+            print(f"{path}: {e} (nichts gespeichert)", file=sys.stderr)
+            return 1
+        finally:
+            if db is not None:
+                db.close()
+
+    written = []
+    failed = False
+    if args.apply:
+        for path, plan in plans:
+            db = None
+            try:
+                db = DB(path)
+                db.set_sale_prices((pid, new_price) for pid, _n, _c, _old, new_price, _om, _nm in plan)
+            except sqlite3.Error as e:  # rolled back, this DB is unchanged
+                rest = [p for p, _plan in plans[len(written) :]]
+                print(f"{path}: {e}", file=sys.stderr)
+                print(f"  gespeichert: {', '.join(written) or '-'}", file=sys.stderr)
+                print(f"  nicht gespeichert: {', '.join(rest)}", file=sys.stderr)
+                failed = True
+                break
+            finally:
+                if db is not None:
+                    db.close()
+            written.append(path)
+
+    out = _open_output(args.output)
+    try:
+        if args.format == "csv":
+            w = csv.writer(out, delimiter=args.delimiter)
+            w.writerow(["db", "product_id", "product", "cost", "old_price", "new_price", "old_margin_pct", "new_margin_pct"])
+
+        for path, plan in plans:
+            if args.format == "csv":
+                for pid, name, cost, old_price, new_price, old_margin, new_margin in plan:
+                    w.writerow(
+                        [path, pid, name, _fmt(cost, "{:.4f}"), _fmt(old_price), _fmt(new_price), _fmt(old_margin), _fmt(new_margin)]
+                    )
+                continue
+
+            if len(args.db) > 1:
+                print(f"== {path}", file=out)
+            width = max([len("Produkt")] + [len(r[1] or "") for r in plan])
+            print(f"{'Produkt':<{width}}  {'Kosten':>10}  {'VK alt':>10}  {'VK neu':>10}  {'Marge %':>8}  {'neu':>8}", file=out)
+            for _pid, name, cost, old_price, new_price, old_margin, new_margin in plan:
+                print(
+                    f"{name:<{width}}  {cost:>10.2f}  {_fmt(old_price):>10}  {new_price:>10.2f}  "
+                    f"{_fmt(old_margin, '{:.1f}'):>8}  {new_margin:>8.1f}",
+                    file=out,
+                )
+            if not args.apply:
+                print(f"{len(plan)} Verkaufspreise würden geändert (Vorschau, mit --apply speichern).", file=out)
+            elif path in written:
+                print(f"{len(plan)} Verkaufspreise gespeichert.", file=out)
+            else:
+                print("Nicht gespeichert.", file=out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failed else 0
+
+
+# ---------- import ----------
+def cmd_import(args) -> int:
+    """Supplier price list (CSV) into the ingredients; one transaction per DB."""
+    failed = False
+    for path in args.db:
+        db = None
+        try:
+            db = DB(path)
+            report = import_price_list_file(
+                db, args.file, delimiter=args.delimiter, encoding=args.encoding, dry_run=args.dry_run
+            )
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"{args.file}: {e}", file=sys.stderr)
+            return 2
+        except sqlite3.Error as e:  # not openable, or rolled back: the DB is unchanged
+            print(f"{path}: {e}", file=sys.stderr)
+            failed = True
+            continue
+        finally:
+            if db is not None:
+                db.close()
+        rejected = report["rejected"]
+        failed = failed or bool(rejected)
+        print(
+            f"{path}: {report['inserted']} neu, {report['updated']} aktualisiert, "
+            f"{report['unchanged']} unverändert, {len(rejected)} abgelehnt" + (" (Probelauf)" if args.dry_run else "")
+        )
+        for line, reason in rejected:
+            print(f"  Zeile {line}: {reason}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+# ---------- export ----------
+def cmd_export(args) -> int:
+    """Stream the costing book as CSV files or JSON Lines."""
+    if len(args.db) > 1:
+        print("export: bitte genau eine --db angeben", file=sys.stderr)
+        return 2
+    if args.format == "csv" and (not args.output or args.output == "-"):
+        print("export: CSV braucht -o DATEI.csv (je Datensatz eine Datei DATEI_<datensatz>.csv)", file=sys.stderr)
+        return 2
+
+    db = DB(args.db[0])
+    try:
+        if args.format == "csv":
+            counts = export_csv(db, args.output, args.only, args.delimiter)
+            paths = csv_paths(args.output, counts)
+            for name, n in counts.items():
+                print(f"{paths[name]}: {n} Zeilen", file=sys.stderr)
+        else:
+            out = _open_output(args.output)
+            try:
+                counts = export_jsonl(db, out, args.only)
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+            print(", ".join(f"{name}: {n}" for name, n in counts.items()), file=sys.stderr)
+    finally:
+        db.close()
+    return 0
+
+
+# ---------- entry point ----------
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m we", description="Wareneinsatz Tracker (ohne Oberfläche)")
+    sub = parser.add_subparsers(dest="command", metavar="BEFEHL")
+
+    db_args = argparse.ArgumentParser(add_help=False)
+    db_args.add_argument(
+        "--db",
+        action="append",
+        type=_existing_db,
+        metavar="DATEI",
+        help=f"SQLite-Datenbank, mehrfach angebbar (Standard: {DB_FILE})",
+    )
+
+    p = sub.add_parser("costs", parents=[db_args], help="Kosten, Gewinn und Marge aller Produkte ausgeben")
+    p.add_argument("--format", choices=("table", "csv"), default="table")
+    p.add_argument("--delimiter", default=";", help="CSV-Trennzeichen (Standard: ;)")
+    p.add_argument("-o", "--output", metavar="DATEI", help="in Datei schreiben statt auf stdout")
+    p.add_argument("--as-of", type=_day, metavar="JJJJ-MM-TT", help="Kosten mit den Einkaufspreisen dieses Tages")
+    p.set_defaults(func=cmd_costs)
+
+    p = sub.add_parser(
+        "cost-history", parents=[db_args], help="Kosten aller Produkte je Monatsanfang aus der Preishistorie"
+    )
+    p.add_argument("--from", dest="start", type=_month, required=True, metavar="JJJJ-MM")
+    p.add_argument("--to", dest="end", type=_month, required=True, metavar="JJJJ-MM")
+    p.add_argument("--format", choices=("table", "csv"), default="table")
+    p.add_argument("--delimiter", default=";", help="CSV-Trennzeichen (Standard: ;)")
+    p.add_argument("-o", "--output", metavar="DATEI", help="in Datei schreiben statt auf stdout")
+    p.set_defaults(func=cmd_cost_history)
+
+    p = sub.add_parser("check", parents=[db_args], help="Integrität und gespeicherte Kosten prüfen")
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser(
+        "whatif",
+        parents=[db_args],
+        help="Kosten und Margen bei hypothetischen Einkaufspreisen (ohne zu speichern)",
+        description="Regeln: MUSTER=+8%% (prozentual) oder MUSTER=12,90 (neuer Packungspreis); "
+        "MUSTER ist ein Zutatenname mit * und ?, Groß-/Kleinschreibung egal.",
+    )
+    p.add_argument("rule", nargs="*", metavar="REGEL", help="z.B. '*sahne*=+8%%' '*=+3%%' 'Rum=12,90'")
+    p.add_argument("-f", "--file", metavar="DATEI", help="Regeln zeilenweise aus Datei (# = Kommentar)")
+    p.add_argument("--all", action="store_true", help="auch unveränderte Produkte ausgeben")
+    p.add_argument("--format", choices=("table", "csv"), default="table")
+    p.add_argument("--delimiter", default=";", help="CSV-Trennzeichen (Standard: ;)")
+    p.add_argument("-o", "--output", metavar="DATEI", help="in Datei schreiben statt auf stdout")
+    p.set_defaults(func=cmd_whatif)
+
+    p = sub.add_parser("export", parents=[db_args], help="Zutaten, Produkte, Rezepte und Kosten exportieren")
+    p.add_argument("--format", choices=("csv", "jsonl"), default="jsonl")
+    p.add_argument(
+        "-o", "--output", metavar="DATEI", help="JSONL: Datei (Standard: stdout); CSV: Basisname, z.B. kalkulation.csv"
+    )
+    p.add_argument("--only", action="append", choices=list(DATASETS), metavar="DATENSATZ", help=", ".join(DATASETS))
+    p.add_argument("--delimiter", default=";", help="CSV-Trennzeichen (Standard: ;)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", parents=[db_args], help="Lieferanten-Preisliste (CSV) in die Zutaten übernehmen")
+    p.add_argument("file", metavar="CSV", help="Spalten: Name, Einheit, Packungsmenge, Packungspreis (Kopfzeile optional)")
+    p.add_argument("--delimiter", help="Trennzeichen (Standard: aus der ersten Zeile erkannt)")
+    p.add_argument("--encoding", default="utf-8-sig", help="Zeichensatz, z.B. cp1252 für Excel (Standard: utf-8)")
+    p.add_argument("--dry-run", action="store_true", help="nur prüfen und zählen, nichts speichern")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("reprice", parents=[db_args], help="Verkaufspreise für eine Zielmarge berechnen und setzen")
+    p.add_argument("--margin", type=float, required=True, metavar="PROZENT", help="Zielmarge in %%, z.B. 70")
+    p.add_argument("--rounding", choices=list(ROUNDINGS), default=DEFAULT_ROUNDING, help="Preispunkte (aufgerundet)")
+    p.add_argument("--search", default="", metavar="TEXT", help="nur Produkte, deren Name TEXT enthält")
+    p.add_argument("--only-below", action="store_true", help="nur Produkte unter der Zielmarge oder ohne Preis")
+    p.add_argument("--apply", action="store_true", help="Preise speichern (sonst nur Vorschau)")
+    p.add_argument("--format", choices=("table", "csv"), default="table")
+    p.add_argument("--delimiter", default=";", help="CSV-Trennzeichen (Standard: ;)")
+    p.add_argument("-o", "--output", metavar="DATEI", help="in Datei schreiben statt auf stdout")
+    p.set_defaults(func=cmd_reprice)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        from .app import App  # only the GUI needs tkinter
+
+        App().mainloop()
+        return 0
+
+    if not args.db:
+        try:
+            args.db = [_existing_db(DB_FILE)]
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+    try:
+        rc = args.func(args)
+        sys.stdout.flush()  # a closed pipe shows up here for short outputs
+    except BrokenPipeError:
+        # output piped into e.g. `head`, which exited: stop quietly; stdout goes
+        # to devnull so the interpreter's final flush does not fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return rc
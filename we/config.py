@@ -1,5 +1,14 @@
 DB_FILE = "wareneinsatz.db"
-PAGE_SIZE = 50
+
+# Delay between the last keystroke and re-filtering a list
+SEARCH_DEBOUNCE_MS = 120
+# Max. suggestions pushed into an autocomplete dropdown
+AUTOCOMPLETE_LIMIT = 100
+
+# Event-loop watchdog: heartbeat interval, stall threshold, rotating log file
+HEARTBEAT_MS = 50
+STALL_THRESHOLD_MS = 250
+STALL_LOG_FILE = "wareneinsatz_stalls.log"
 
 # Theme colors
 BG = "#1f1f1f"
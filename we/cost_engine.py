@@ -0,0 +1,242 @@
+from collections import defaultdict
+
+from .cost_matrix import CostMatrix
+from .recipe_graph import flatten_lines, topological_order
+
+# when at least this share of the products is dirty, costs() recomputes all of
+# them with one CostMatrix product instead of product by product
+BULK_FRACTION = 0.25
+
+
+class CostEngine:
+    """In-memory product costs with an ingredient -> products reverse index.
+
+    Creating an engine attaches it to the DB (`db.cost_engine`). The DB mutators
+    then report which ingredient or product changed; only the products depending
+    on it are marked dirty and recomputed on the next read, together with the
+    products containing them as sub-recipes (components); dirty products are
+    recomputed children first, each reusing the cached costs of its
+    components. When most products
+    are dirty again (e.g. after a price list import) all costs come from one
+    CostMatrix product; the matrix is kept until a recipe changes, so later
+    price changes only need a new price vector.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._unit_price = {}  # ing_id -> price per base unit (ingredients.unit_price)
+        self._items = {}  # pid -> [(ing_id, qty)]
+        self._slots = {}  # pid -> [(slot_name, qty)]
+        self._selection = {}  # pid -> {slot_name: ing_id}
+        self._components = {}  # pid -> [(component pid, qty)]
+        self._users = defaultdict(set)  # ing_id -> {pid} (direct items and slot selections)
+        self._parents = defaultdict(set)  # component pid -> {pid containing it}
+        self._costs = {}  # pid -> cost
+        self._dirty = set()
+        self._matrix = None  # CostMatrix of the current recipes, built on demand
+        self.load()
+        db.cost_engine = self
+
+    # ---------- loading ----------
+    def load(self):
+        """(Re)load all recipes and recompute every product cost."""
+        cur = self.db.conn.cursor()
+
+        cur.execute("SELECT id, unit_price FROM ingredients;")
+        self._unit_price = dict(cur.fetchall())
+
+        cur.execute("SELECT id FROM products;")
+        pids = [r[0] for r in cur]
+        self._items = {pid: [] for pid in pids}
+        self._slots = {pid: [] for pid in pids}
+        self._selection = {pid: {} for pid in pids}
+        self._components = {pid: [] for pid in pids}
+
+        cur.execute("SELECT product_id, ingredient_id, qty FROM product_items;")
+        for pid, ing_id, qty in cur:
+            self._items[pid].append((ing_id, qty))
+
+        cur.execute("SELECT product_id, slot_name, qty FROM product_slot_lines;")
+        for pid, slot_name, qty in cur:
+            self._slots[pid].append((slot_name, qty))
+
+        cur.execute("SELECT product_id, slot_name, ingredient_id FROM product_slot_selection;")
+        for pid, slot_name, ing_id in cur:
+            self._selection[pid][slot_name] = ing_id
+
+        cur.execute("SELECT product_id, component_id, qty FROM product_components;")
+        for pid, component_id, qty in cur:
+            self._components[pid].append((component_id, qty))
+
+        self._users = defaultdict(set)
+        self._parents = defaultdict(set)
+        for pid in pids:
+            self._index_product(pid)
+
+        self._costs = {}
+        self._dirty = set(pids)
+        self._matrix = None
+
+    def _index_product(self, pid: int):
+        for ing_id, _qty in self._items.get(pid, ()):
+            self._users[ing_id].add(pid)
+        for ing_id in self._selection.get(pid, {}).values():
+            self._users[ing_id].add(pid)
+        for component_id, _qty in self._components.get(pid, ()):
+            self._parents[component_id].add(pid)
+
+    def _unindex_product(self, pid: int):
+        ing_ids = {ing_id for ing_id, _qty in self._items.get(pid, ())}
+        ing_ids.update(self._selection.get(pid, {}).values())
+        for ing_id in ing_ids:
+            users = self._users.get(ing_id)
+            if users is not None:
+                users.discard(pid)
+                if not users:
+                    del self._users[ing_id]
+        for component_id, _qty in self._components.get(pid, ()):
+            parents = self._parents.get(component_id)
+            if parents is not None:
+                parents.discard(pid)
+                if not parents:
+                    del self._parents[component_id]
+
+    # ---------- change notifications (called by DB mutators) ----------
+    def ingredient_changed(self, ing_id: int):
+        """Re-read one ingredient's price and invalidate the products using it."""
+        cur = self.db.conn.cursor()
+        cur.execute("SELECT unit_price FROM ingredients WHERE id=?;", (ing_id,))
+        r = cur.fetchone()
+        if r is None:
+            self._unit_price.pop(ing_id, None)
+        else:
+            self._unit_price[ing_id] = r[0]
+        self._invalidate(self._users.get(ing_id, ()))
+
+    def product_changed(self, pid: int):
+        """Re-read one product's recipe (or drop it if it no longer exists)."""
+        self._invalidate((pid,))
+        self._unindex_product(pid)
+        self._matrix = None
+        cur = self.db.conn.cursor()
+        cur.execute("SELECT 1 FROM products WHERE id=?;", (pid,))
+        if cur.fetchone() is None:
+            for d in (self._items, self._slots, self._selection, self._components, self._costs):
+                d.pop(pid, None)
+            self._dirty.discard(pid)
+            return
+
+        cur.execute("SELECT ingredient_id, qty FROM product_items WHERE product_id=?;", (pid,))
+        self._items[pid] = cur.fetchall()
+        cur.execute("SELECT slot_name, qty FROM product_slot_lines WHERE product_id=?;", (pid,))
+        self._slots[pid] = cur.fetchall()
+        cur.execute("SELECT slot_name, ingredient_id FROM product_slot_selection WHERE product_id=?;", (pid,))
+        self._selection[pid] = dict(cur.fetchall())
+        cur.execute("SELECT component_id, qty FROM product_components WHERE product_id=?;", (pid,))
+        self._components[pid] = cur.fetchall()
+        self._index_product(pid)
+
+    def _invalidate(self, pids):
+        """Mark `pids` and the products containing them dirty.
+
+        The dirty set is closed upwards (a product is dirty whenever one of its
+        components is), so the walk stops at products that are dirty already.
+        """
+        dirty = self._dirty
+        stack = [pid for pid in pids if pid not in dirty]
+        dirty.update(stack)
+        while stack:
+            for parent in self._parents.get(stack.pop(), ()):
+                if parent not in dirty:
+                    dirty.add(parent)
+                    stack.append(parent)
+
+    # ---------- reading ----------
+    def products_using(self, ing_id: int):
+        """Products whose cost depends on the ingredient, directly or through a sub-recipe."""
+        return self.dependents(self._users.get(ing_id, ()))
+
+    def dependents(self, pids) -> set:
+        """`pids` plus every product containing one of them, at any depth."""
+        seen = set(pids)
+        stack = list(seen)
+        while stack:
+            for parent in self._parents.get(stack.pop(), ()):
+                if parent not in seen:
+                    seen.add(parent)
+                    stack.append(parent)
+        return seen
+
+    def cost(self, pid: int) -> float:
+        if self._bulk():
+            return self.costs().get(pid, 0.0)
+        if pid in self._dirty:
+            self._recompute((pid,))
+        return self._costs.get(pid, 0.0)
+
+    def costs(self) -> dict:
+        """All product costs as {pid: cost} (recomputes dirty products first)."""
+        if self._bulk():
+            self._costs = self.matrix().costs(self._unit_price)
+            self._dirty.clear()
+            return self._costs
+        self._recompute(list(self._dirty))
+        self._dirty.clear()
+        return self._costs
+
+    def matrix(self) -> CostMatrix:
+        """CostMatrix of the current recipes, sub-recipes expanded (cached until a recipe changes)."""
+        if self._matrix is None:
+            flat = flatten_lines(self._items, self._lines, self._components)
+            self._matrix = CostMatrix.from_rows(self._items, self._unit_price, (flat[pid] for pid in self._items))
+        return self._matrix
+
+    def unit_prices(self) -> dict:
+        """Current {ing_id: price per unit} (a copy)."""
+        return dict(self._unit_price)
+
+    def _bulk(self) -> bool:
+        # the very first computation after load() stays per product: building the
+        # matrix costs more than that and only pays off when it is reused
+        if not self._costs:
+            return False
+        return len(self._dirty) >= 2 and len(self._dirty) >= BULK_FRACTION * len(self._items)
+
+    def _lines(self, pid: int):
+        """(ing_id, qty) of the recipe lines of `pid`, slot lines resolved via the selection."""
+        lines = list(self._items.get(pid, ()))
+        selection = self._selection.get(pid, {})
+        for slot_name, qty in self._slots.get(pid, ()):
+            ing_id = selection.get(slot_name)
+            if ing_id is not None:
+                lines.append((ing_id, qty))
+        return lines
+
+    def _recompute(self, pids):
+        """Recompute the dirty ones of `pids` and their dirty components, components first."""
+        dirty = self._dirty
+        components = self._components
+        order = topological_order(
+            [pid for pid in pids if pid in dirty],
+            lambda pid: [c for c, _qty in components.get(pid, ()) if c in dirty],
+        )
+        for pid in order:
+            if pid in self._items:
+                self._costs[pid] = self._compute(pid)
+            dirty.discard(pid)
+
+    def _compute(self, pid: int) -> float:
+        """Own recipe lines plus the (already computed) costs of the component products."""
+        unit_price = self._unit_price
+        total = 0.0
+        for ing_id, qty in self._items.get(pid, ()):
+            total += unit_price.get(ing_id, 0.0) * qty
+        selection = self._selection.get(pid, {})
+        for slot_name, qty in self._slots.get(pid, ()):
+            ing_id = selection.get(slot_name)
+            if ing_id is not None:
+                total += unit_price.get(ing_id, 0.0) * qty
+        costs = self._costs
+        for component_id, qty in self._components.get(pid, ()):
+            total += costs.get(component_id, 0.0) * qty
+        return total
@@ -0,0 +1,123 @@
+"""Product x ingredient quantity matrix for recomputing every product cost at once.
+
+Rows are products, columns ingredients, values the recipe quantities (direct
+recipe lines plus slot lines resolved through the slot selection, and the
+lines of component products expanded into their ingredients), stored as
+compressed sparse rows (CSR). All costs are then one matrix-vector product
+with the stored unit prices (price per base unit, see we.units).
+
+NumPy is used when it is installed; otherwise the same arrays are kept in the
+`array` module and multiplied row by row in Python.
+"""
+
+from array import array
+from collections import defaultdict
+from itertools import chain, repeat
+from operator import sub
+
+from .recipe_graph import flatten_lines
+
+try:
+    import numpy as np
+except ImportError:  # optional
+    np = None
+
+
+class CostMatrix:
+    """CSR matrix: row r spans `indices/data[indptr[r]:indptr[r + 1]]`."""
+
+    def __init__(self, product_ids, ingredient_ids, indptr, indices, data):
+        self.product_ids = list(product_ids)
+        self.ingredient_ids = list(ingredient_ids)
+        self.column = {ing_id: j for j, ing_id in enumerate(self.ingredient_ids)}
+        if np is not None:
+            self.indptr = np.asarray(indptr, dtype=np.int64)
+            self.indices = np.asarray(indices, dtype=np.int64)
+            self.data = np.asarray(data, dtype=np.float64)
+            # row number of every stored entry, for the bincount product
+            self._rows = np.repeat(np.arange(len(self.product_ids)), np.diff(self.indptr))
+        else:
+            self.indptr = array("q", indptr)
+            self.indices = array("q", indices)
+            self.data = array("d", data)
+            self._rows = array("q", chain.from_iterable(map(repeat, range(len(indptr) - 1), map(sub, indptr[1:], indptr))))
+
+    # ---------- building ----------
+    @classmethod
+    def from_rows(cls, product_ids, ingredient_ids, row_lines):
+        """Build from one iterable of (ingredient_id, qty) per product, in `product_ids` order.
+
+        Lines of unknown ingredients are skipped; products without lines get an
+        empty row (cost 0).
+        """
+        product_ids = list(product_ids)
+        ingredient_ids = list(ingredient_ids)
+        column = {ing_id: j for j, ing_id in enumerate(ingredient_ids)}.get
+        indptr = [0]
+        indices = []
+        data = []
+        for lines in row_lines:
+            for ing_id, qty in lines:
+                j = column(ing_id)
+                if j is not None and qty:
+                    indices.append(j)
+                    data.append(float(qty))
+            indptr.append(len(indices))
+        return cls(product_ids, ingredient_ids, indptr, indices, data)
+
+    @classmethod
+    def from_db(cls, db):
+        """Build from product_items, the slot lines resolved via product_slot_selection and product_components."""
+        cur = db.conn.cursor()
+        cur.execute("SELECT id FROM ingredients ORDER BY id;")
+        ingredient_ids = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT id FROM products ORDER BY id;")
+        lines = {r[0]: [] for r in cur.fetchall()}
+        cur.execute(
+            """
+            SELECT product_id, ingredient_id, qty FROM product_items
+            UNION ALL
+            SELECT l.product_id, s.ingredient_id, l.qty
+            FROM product_slot_lines l
+            JOIN product_slot_selection s ON s.product_id = l.product_id AND s.slot_name = l.slot_name;
+            """
+        )
+        for pid, ing_id, qty in cur:
+            lines[pid].append((ing_id, qty))
+        cur.execute("SELECT product_id, component_id, qty FROM product_components;")
+        components = defaultdict(list)
+        for pid, component_id, qty in cur:
+            components[pid].append((component_id, qty))
+        if components:
+            flat = flatten_lines(lines, lambda pid: lines.get(pid, []), components)
+            lines = {pid: flat[pid] for pid in lines}
+        return cls.from_rows(lines, ingredient_ids, lines.values())
+
+    # ---------- multiplying ----------
+    def price_vector(self, unit_price: dict):
+        """Unit prices {ing_id: price} in column order (missing ingredients cost 0)."""
+        values = [float(unit_price.get(ing_id, 0.0)) for ing_id in self.ingredient_ids]
+        return np.asarray(values, dtype=np.float64) if np is not None else array("d", values)
+
+    def multiply(self, prices):
+        """Cost of every product (row order) for the column price vector `prices`."""
+        n = len(self.product_ids)
+        if np is not None:
+            weights = self.data * np.asarray(prices, dtype=np.float64)[self.indices]
+            return np.bincount(self._rows, weights=weights, minlength=n)
+
+        out = [0.0] * n
+        for r, qty, j in zip(self._rows, self.data, self.indices):
+            out[r] += qty * prices[j]
+        return array("d", out)
+
+    def costs(self, unit_price: dict) -> dict:
+        """{pid: cost} for unit prices {ing_id: price}."""
+        return dict(zip(self.product_ids, map(float, self.multiply(self.price_vector(unit_price)))))
+
+
+def unit_prices_from_db(db) -> dict:
+    """{ing_id: price per base unit} for every ingredient."""
+    cur = db.conn.cursor()
+    cur.execute("SELECT id, unit_price FROM ingredients;")
+    return dict(cur.fetchall())
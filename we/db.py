@@ -1,12 +1,31 @@
 import sqlite3
+from collections import defaultdict
+from contextlib import contextmanager
+
 from .config import DB_FILE
+from .cost_matrix import CostMatrix, unit_prices_from_db
+from .migrations import _refresh_costs_sql, migrate
+from .recipe_graph import topological_order
+from .units import base_unit, compatible_units, pack_unit_price, to_base
+from .utils import iso_day, profit_margin
 
 
 class DB:
     def __init__(self, path=DB_FILE):
         self.conn = sqlite3.connect(path)
         self.conn.execute("PRAGMA foreign_keys = ON;")
+        # a sub-recipe's cost change must reach the products containing it, level by level
+        self.conn.execute("PRAGMA recursive_triggers = ON;")
+        # Unicode-aware lower() for the name search (SQLite's folds ASCII only)
+        self.conn.create_function("py_lower", 1, _py_lower, deterministic=True)
+        self._tx_depth = 0
+        self._costs_deferred = False  # inside deferred_ingredient_costs()
+        self.cost_engine = None  # optional CostEngine, attaches itself
         self.init_db()
+        # name search: FTS5 trigram tables, or the plain trigram tables as fallback
+        self._fts = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='ingredients_fts';"
+        ).fetchone() is not None
 
     def close(self):
         try:
@@ -15,68 +34,234 @@ class DB:
             pass
 
     def init_db(self):
+        migrate(self.conn)
+
+    # ---------- Transactions ----------
+    @contextmanager
+    def transaction(self):
+        """Run several writes as one unit: a single commit, or a full rollback on error.
+
+        Mutators called inside the block do not commit themselves. Blocks may be
+        nested; inner blocks use savepoints so they can fail without discarding
+        the outer work.
+        """
+        depth = self._tx_depth
+        savepoint = f"tx_{depth}"
+        if depth == 0:
+            if self.conn.in_transaction:
+                self.conn.commit()
+            self.conn.execute("BEGIN;")
+        else:
+            self.conn.execute(f"SAVEPOINT {savepoint};")
+
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth -= 1
+            if depth == 0:
+                self.conn.rollback()
+            else:
+                self.conn.execute(f"ROLLBACK TO {savepoint};")
+                self.conn.execute(f"RELEASE {savepoint};")
+            if self.cost_engine is not None:
+                self.cost_engine.load()
+            raise
+        else:
+            self._tx_depth -= 1
+            if depth == 0:
+                self.conn.commit()
+            else:
+                self.conn.execute(f"RELEASE {savepoint};")
+
+    @contextmanager
+    def deferred_ingredient_costs(self):
+        """Inside transaction(): ingredient price updates in the block recompute product costs once, at the end.
+
+        Without it every updated ingredient recomputes all products using it,
+        so a product with ten changed ingredients is recomputed ten times.
+        The costs are also brought up to date when the block raises, as a
+        caller catching the error may still commit the updates made so far.
+        Nested blocks are part of the outermost one.
+        """
+        if self._tx_depth == 0:
+            raise RuntimeError("deferred_ingredient_costs() needs a surrounding transaction()")
+        if self._costs_deferred:
+            yield self
+            return
+        self._costs_deferred = True
+        self.conn.execute("INSERT OR IGNORE INTO cost_refresh_deferred(flag) VALUES (1);")
+        try:
+            yield self
+        finally:
+            self._costs_deferred = False
+            self.conn.execute("DELETE FROM cost_refresh_deferred;")
+            where = """product_id IN (
+                SELECT pi.product_id FROM product_items pi
+                JOIN cost_refresh_pending p ON p.ingredient_id = pi.ingredient_id
+                UNION
+                SELECT ss.product_id FROM product_slot_selection ss
+                JOIN cost_refresh_pending p ON p.ingredient_id = ss.ingredient_id
+            )"""
+            for stmt in _refresh_costs_sql(where):
+                self.conn.execute(stmt)
+            self.conn.execute("DELETE FROM cost_refresh_pending;")
+
+    def _commit(self):
+        """Commit unless a surrounding transaction() will do it."""
+        if self._tx_depth == 0:
+            self.conn.commit()
+
+    # ---------- Cost engine notifications ----------
+    def _ingredient_changed(self, ing_id):
+        if self.cost_engine is not None and ing_id is not None:
+            self.cost_engine.ingredient_changed(ing_id)
+
+    def _product_changed(self, pid):
+        if self.cost_engine is not None and pid is not None:
+            self.cost_engine.product_changed(pid)
+
+    def _lookup_id(self, sql: str, params):
+        """Single id lookup, only needed to notify an attached cost engine."""
+        if self.cost_engine is None:
+            return None
+        r = self.conn.execute(sql, params).fetchone()
+        return r[0] if r else None
+
+    # ---------- Name search ----------
+    def _name_filter(self, table: str, query: str):
+        """(SQL condition, params) selecting rows of `table` whose name contains `query`, ignoring case."""
+        q = (query or "").strip()
+        if not q:
+            return "1", ()
+        if q.isascii():  # LIKE folds ASCII case, and is faster than calling into Python per row
+            escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            contains_sql, contains = f"{table}.name LIKE ? ESCAPE '\\'", f"%{escaped}%"
+        else:  # py_lower (see __init__) also folds umlauts
+            contains_sql, contains = f"instr(py_lower({table}.name), ?) > 0", q.lower()
+        if len(q) < 3:
+            return contains_sql, (contains,)  # too short for trigrams: scan
+        if self._fts:
+            phrase = '"' + q.replace('"', '""') + '"'
+            return f"{table}.id IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)", (phrase,)
+
+        # fallback index: rows having every trigram of the query, then the substring test.
+        # The index grams are folded by SQLite's lower(), so only all-ASCII grams are
+        # folded the same way on both sides; without any, scan.
+        lowered = _ascii_lower(q)
+        grams = sorted({g for g in (lowered[i : i + 3] for i in range(len(lowered) - 2)) if g.isascii()})
+        if not grams:
+            return contains_sql, (contains,)
+        marks = ",".join("?" * len(grams))
+        cond = (
+            f"{table}.id IN (SELECT ref_id FROM {table}_trigrams WHERE gram IN ({marks}) "
+            f"GROUP BY ref_id HAVING COUNT(*) = {len(grams)}) AND {contains_sql}"
+        )
+        return cond, (*grams, contains)
+
+    def search_ingredients(self, query: str = "", limit=None, offset: int = 0):
+        """Like list_ingredients(), restricted to names containing `query`; optionally one page."""
+        cond, params = self._name_filter("ingredients", query)
         cur = self.conn.cursor()
         cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS ingredients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                unit TEXT NOT NULL,
-                pack_qty REAL NOT NULL,
-                pack_price REAL NOT NULL
-            );
-            """
+            f"""
+            SELECT id, name, unit, pack_qty, pack_price FROM ingredients
+            WHERE {cond} ORDER BY name LIMIT ? OFFSET ?;
+            """,
+            (*params, -1 if limit is None else limit, offset),
         )
+        return cur.fetchall()
+
+    def count_ingredients(self, query: str = ""):
+        cond, params = self._name_filter("ingredients", query)
+        return self.conn.execute(f"SELECT COUNT(*) FROM ingredients WHERE {cond};", params).fetchone()[0]
+
+    def ingredient_position(self, ing_id: int, query: str = ""):
+        """Index of ingredient `ing_id` in the list search_ingredients() produces, or None if it is filtered out."""
+        cond, params = self._name_filter("ingredients", query)
+        cur = self.conn.cursor()
+        cur.execute(f"SELECT name FROM ingredients WHERE ingredients.id = ? AND {cond};", (ing_id, *params))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        cur.execute(f"SELECT COUNT(*) FROM ingredients WHERE {cond} AND name < ?;", (*params, row[0]))
+        return cur.fetchone()[0]
+
+    def search_products(self, query: str = "", limit=None, offset: int = 0):
+        """Like list_product_costs(), restricted to names containing `query`, by name; optionally one page."""
+        cond, params = self._name_filter("products", query)
+        cur = self.conn.cursor()
         cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE
-            );
-            """
+            f"""
+            SELECT products.id, products.name, pc.cost, products.sale_price, pc.profit, pc.margin
+            FROM products
+            JOIN product_costs pc ON pc.product_id = products.id
+            WHERE {cond} ORDER BY products.name LIMIT ? OFFSET ?;
+            """,
+            (*params, -1 if limit is None else limit, offset),
         )
-        cur.execute("PRAGMA table_info(products);")
-        cols = [r[1] for r in cur.fetchall()]
-        if "sale_price" not in cols:
-            cur.execute("ALTER TABLE products ADD COLUMN sale_price REAL;")
+        return cur.fetchall()
 
+    def count_products(self, query: str = ""):
+        cond, params = self._name_filter("products", query)
+        return self.conn.execute(f"SELECT COUNT(*) FROM products WHERE {cond};", params).fetchone()[0]
+
+    def product_page(
+        self, query: str = "", sort: str = "name", desc: bool = False, after=None, limit: int = 50, offset: int = 0
+    ):
+        """One page of (id, name, cost, sale_price, profit, margin), filtered and sorted in SQL.
+
+        Keyset paging: pass `after=product_sort_key(last_row, sort)` of the previous
+        page to continue behind it; `offset` is only for jumping to an arbitrary row.
+        """
+        key_sql, id_sql, _key = PRODUCT_SORT_KEYS[sort]
+        direction, cmp = ("DESC", "<") if desc else ("ASC", ">")
+        cond, params = self._name_filter("products", query)
+        if after is not None:
+            cond += " AND " + _keyset_sql(sort, cmp)
+            params = (*params, after[0], *after)
+        cur = self.conn.cursor()
         cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS product_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER NOT NULL,
-                ingredient_id INTEGER NOT NULL,
-                qty REAL NOT NULL,
-                FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE,
-                FOREIGN KEY(ingredient_id) REFERENCES ingredients(id) ON DELETE RESTRICT
-            );
-            """
+            f"""
+            SELECT products.id, products.name, pc.cost, products.sale_price, pc.profit, pc.margin
+            FROM products
+            JOIN product_costs pc ON pc.product_id = products.id
+            WHERE {cond}
+            ORDER BY {key_sql} {direction}, {id_sql} {direction}
+            LIMIT ? OFFSET ?;
+            """,
+            (*params, limit, offset),
         )
+        return cur.fetchall()
+
+    def product_position(self, pid: int, query: str = "", sort: str = "name", desc: bool = False):
+        """Index of product `pid` in the list product_page() produces, or None if it is filtered out."""
+        key_sql = PRODUCT_SORT_KEYS[sort][0]
+        cur = self.conn.cursor()
         cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS product_slot_lines (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER NOT NULL,
-                slot_name TEXT NOT NULL,
-                qty REAL NOT NULL,
-                FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE
-            );
-            """
+            f"""
+            SELECT {key_sql}, products.id FROM products
+            JOIN product_costs pc ON pc.product_id = products.id
+            WHERE products.id = ?;
+            """,
+            (pid,),
         )
+        key = cur.fetchone()
+        if key is None:
+            return None
+        cond, params = self._name_filter("products", query)
+        cur.execute(f"SELECT 1 FROM products WHERE products.id = ? AND {cond};", (pid, *params))
+        if cur.fetchone() is None:
+            return None
         cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS product_slot_selection (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER NOT NULL,
-                slot_name TEXT NOT NULL,
-                ingredient_id INTEGER NOT NULL,
-                UNIQUE(product_id, slot_name),
-                FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE,
-                FOREIGN KEY(ingredient_id) REFERENCES ingredients(id) ON DELETE RESTRICT
-            );
-            """
+            f"""
+            SELECT COUNT(*) FROM products
+            JOIN product_costs pc ON pc.product_id = products.id
+            WHERE {cond} AND {_keyset_sql(sort, ">" if desc else "<")};
+            """,
+            (*params, key[0], *key),
         )
-        self.conn.commit()
+        return cur.fetchone()[0]
 
     # ---------- Ingredients ----------
     def list_ingredients(self):
@@ -94,12 +279,14 @@ class DB:
             """,
             (name, unit, pack_qty, pack_price),
         )
-        self.conn.commit()
+        self._ingredient_changed(self._lookup_id("SELECT id FROM ingredients WHERE name=?;", (name,)))
+        self._commit()
 
     def delete_ingredient(self, ing_id: int):
         cur = self.conn.cursor()
         cur.execute("DELETE FROM ingredients WHERE id=?;", (ing_id,))
-        self.conn.commit()
+        self._ingredient_changed(ing_id)
+        self._commit()
 
     def ingredient_is_used(self, ing_id: int):
         cur = self.conn.cursor()
@@ -127,9 +314,27 @@ class DB:
         return [r[0] for r in cur.fetchall()]
 
     # ---------- Products ----------
-    def list_products(self):
+    def list_products(self, ids=None):
+        """(id, name, sale_price) of all products, or only of the given ids."""
         cur = self.conn.cursor()
-        cur.execute("SELECT id, name, sale_price FROM products;")
+        if ids is None:
+            cur.execute("SELECT id, name, sale_price FROM products;")
+        else:
+            ids = list(ids)
+            marks = ",".join("?" * len(ids))
+            cur.execute(f"SELECT id, name, sale_price FROM products WHERE id IN ({marks});", ids)
+        return cur.fetchall()
+
+    def list_product_costs(self):
+        """(id, name, cost, sale_price, profit, margin) for every product, from product_costs."""
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT p.id, p.name, pc.cost, p.sale_price, pc.profit, pc.margin
+            FROM products p
+            JOIN product_costs pc ON pc.product_id = p.id;
+            """
+        )
         return cur.fetchall()
 
     def upsert_product(self, name: str):
@@ -142,11 +347,25 @@ class DB:
             """,
             (name,),
         )
-        self.conn.commit()
+        self._product_changed(self._lookup_id("SELECT id FROM products WHERE name=?;", (name,)))
+        self._commit()
 
     def delete_product(self, pid: int):
         self.conn.execute("DELETE FROM products WHERE id=?;", (pid,))
-        self.conn.commit()
+        self._product_changed(pid)
+        self._commit()
+
+    def product_is_used(self, pid: int):
+        """True if the product is a component of another product."""
+        cur = self.conn.cursor()
+        cur.execute("SELECT 1 FROM product_components WHERE component_id=? LIMIT 1;", (pid,))
+        return cur.fetchone() is not None
+
+    def get_product_id_by_name(self, name: str):
+        cur = self.conn.cursor()
+        cur.execute("SELECT id FROM products WHERE name=?;", (name,))
+        r = cur.fetchone()
+        return int(r[0]) if r else None
 
     def get_product_name(self, pid: int):
         cur = self.conn.cursor()
@@ -156,7 +375,14 @@ class DB:
 
     def set_sale_price(self, pid: int, price_or_none):
         self.conn.execute("UPDATE products SET sale_price=? WHERE id=?;", (price_or_none, pid))
-        self.conn.commit()
+        self._commit()
+
+    def set_sale_prices(self, prices):
+        """Set many sale prices [(pid, price_or_none)] in one transaction; returns the number of rows."""
+        params = [(price, pid) for pid, price in prices]
+        with self.transaction():
+            self.conn.executemany("UPDATE products SET sale_price=? WHERE id=?;", params)
+        return len(params)
 
     def get_sale_price(self, pid: int):
         cur = self.conn.cursor()
@@ -165,22 +391,68 @@ class DB:
         return (float(r[0]) if (r and r[0] is not None) else None)
 
     # ---------- Recipe Items ----------
-    def add_product_item(self, pid: int, ing_id: int, qty: float):
-        self.conn.execute(
-            "INSERT INTO product_items(product_id, ingredient_id, qty) VALUES (?, ?, ?);",
-            (pid, ing_id, qty),
+    def add_product_item(self, pid: int, ing_id: int, qty: float, unit=None):
+        """Add qty of an ingredient, in `unit` (default: the ingredient's unit); ValueError if not convertible.
+
+        qty is stored in base units, the unit only for display.
+        """
+        cur = self.conn.cursor()
+        cur.execute("SELECT unit FROM ingredients WHERE id=?;", (ing_id,))
+        r = cur.fetchone()
+        if r is None:
+            raise ValueError("Zutat nicht gefunden.")
+        ing_unit = r[0]
+        if unit is None or unit == ing_unit:
+            unit = None
+        elif base_unit(unit) != base_unit(ing_unit):
+            raise ValueError(f"Einheit '{unit}' passt nicht zu '{ing_unit}' (möglich: {', '.join(compatible_units(ing_unit))}).")
+        cur.execute(
+            "INSERT INTO product_items(product_id, ingredient_id, qty, unit) VALUES (?, ?, ?, ?);",
+            (pid, ing_id, to_base(qty, unit or ing_unit), unit),
         )
-        self.conn.commit()
+        self._product_changed(pid)
+        self._commit()
 
     def delete_product_item(self, item_id: int):
+        pid = self._lookup_id("SELECT product_id FROM product_items WHERE id=?;", (item_id,))
         self.conn.execute("DELETE FROM product_items WHERE id=?;", (item_id,))
-        self.conn.commit()
+        self._product_changed(pid)
+        self._commit()
+
+    def add_product_component(self, pid: int, component_id: int, qty: float):
+        """Use product `component_id` (qty units of it) in the recipe of `pid`; ValueError if that makes a cycle."""
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            WITH RECURSIVE sub(id) AS (
+                SELECT ?
+                UNION
+                SELECT pc.component_id FROM product_components pc JOIN sub ON pc.product_id = sub.id
+            )
+            SELECT 1 FROM sub WHERE id = ? LIMIT 1;
+            """,
+            (component_id, pid),
+        )
+        if cur.fetchone() is not None:
+            raise ValueError("Das Produkt enthält sich damit selbst (direkt oder über ein Teilrezept).")
+        cur.execute(
+            "INSERT INTO product_components(product_id, component_id, qty) VALUES (?, ?, ?);",
+            (pid, component_id, qty),
+        )
+        self._product_changed(pid)
+        self._commit()
+
+    def delete_product_component(self, line_id: int):
+        pid = self._lookup_id("SELECT product_id FROM product_components WHERE id=?;", (line_id,))
+        self.conn.execute("DELETE FROM product_components WHERE id=?;", (line_id,))
+        self._product_changed(pid)
+        self._commit()
 
     def list_product_items(self, pid: int):
         cur = self.conn.cursor()
         cur.execute(
             """
-            SELECT pi.id, i.name, pi.qty, i.unit, i.pack_qty, i.pack_price
+            SELECT pi.id, i.name, pi.qty, i.unit, i.pack_qty, i.pack_price, i.unit_price
             FROM product_items pi
             JOIN ingredients i ON i.id = pi.ingredient_id
             WHERE pi.product_id = ?
@@ -196,11 +468,14 @@ class DB:
             "INSERT INTO product_slot_lines(product_id, slot_name, qty) VALUES (?, ?, ?);",
             (pid, slot_name, qty),
         )
-        self.conn.commit()
+        self._product_changed(pid)
+        self._commit()
 
     def delete_slot_line(self, line_id: int):
+        pid = self._lookup_id("SELECT product_id FROM product_slot_lines WHERE id=?;", (line_id,))
         self.conn.execute("DELETE FROM product_slot_lines WHERE id=?;", (line_id,))
-        self.conn.commit()
+        self._product_changed(pid)
+        self._commit()
 
     def list_slot_lines(self, pid: int):
         cur = self.conn.cursor()
@@ -224,7 +499,8 @@ class DB:
             """,
             (pid, slot_name, ing_id),
         )
-        self.conn.commit()
+        self._product_changed(pid)
+        self._commit()
 
     def get_slot_selection_name(self, pid: int, slot_name: str):
         cur = self.conn.cursor()
@@ -240,11 +516,25 @@ class DB:
         r = cur.fetchone()
         return r[0] if r else None
 
+    def get_slot_selections(self, pid: int):
+        """{slot_name: ingredient name} for all slot selections of a product."""
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT s.slot_name, i.name
+            FROM product_slot_selection s
+            JOIN ingredients i ON i.id = s.ingredient_id
+            WHERE s.product_id=?;
+            """,
+            (pid,),
+        )
+        return dict(cur.fetchall())
+
     def get_slot_selection_price_unit(self, pid: int, slot_name: str):
         cur = self.conn.cursor()
         cur.execute(
             """
-            SELECT i.name, i.unit, i.pack_qty, i.pack_price
+            SELECT i.name, i.unit, i.pack_qty, i.pack_price, i.unit_price
             FROM product_slot_selection s
             JOIN ingredients i ON i.id = s.ingredient_id
             WHERE s.product_id=? AND s.slot_name=?;
@@ -253,30 +543,251 @@ class DB:
         )
         return cur.fetchone()
 
-    # ---------- Cost computation ----------
-    def compute_product_cost(self, pid: int):
+    # ---------- Recipe view ----------
+    def get_recipe_view(self, pid: int):
+        """Everything the recipe panel shows, from a single query.
+
+        Returns None if the product does not exist, otherwise a dict with
+        - "items": [(item_id, ingredient, qty, unit, unit_price, line_cost)], in the unit the line was entered in
+        - "slots": [(line_id, slot_name, ingredient_or_None, qty, unit_or_None, unit_price, line_cost)], in base units
+        - "components": [(line_id, product, qty, unit_cost, line_cost)], at the components' stored costs
+        - "cost", "sale_price", "profit", "margin"
+        """
         cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT p.sale_price, r.kind, r.line_id, r.label, r.sel_name, r.qty, r.unit, r.unit_price
+            FROM products p
+            LEFT JOIN (
+                SELECT 0 AS kind, pi.id AS line_id, i.name AS label, NULL AS sel_name,
+                       pi.qty / COALESCE(u.factor, 1.0) AS qty, COALESCE(pi.unit, i.unit) AS unit,
+                       i.unit_price * COALESCE(u.factor, 1.0) AS unit_price
+                FROM product_items pi
+                JOIN ingredients i ON i.id = pi.ingredient_id
+                LEFT JOIN units u ON u.unit = COALESCE(pi.unit, i.unit)
+                WHERE pi.product_id = ?
+                UNION ALL
+                SELECT 1, sl.id, sl.slot_name, i.name, sl.qty, COALESCE(u.base_unit, i.unit), i.unit_price
+                FROM product_slot_lines sl
+                LEFT JOIN product_slot_selection ss
+                  ON ss.product_id = sl.product_id AND ss.slot_name = sl.slot_name
+                LEFT JOIN ingredients i ON i.id = ss.ingredient_id
+                LEFT JOIN units u ON u.unit = i.unit
+                WHERE sl.product_id = ?
+                UNION ALL
+                SELECT 2, pc.id, c.name, NULL, pc.qty, NULL, cc.cost
+                FROM product_components pc
+                JOIN products c ON c.id = pc.component_id
+                JOIN product_costs cc ON cc.product_id = pc.component_id
+                WHERE pc.product_id = ?
+            ) r ON 1
+            WHERE p.id = ?
+            ORDER BY r.kind, r.label;
+            """,
+            (pid, pid, pid, pid),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            return None
+
+        items, slots, components = [], [], []
         total = 0.0
+        sale_price = rows[0][0]
+        for _sp, kind, line_id, label, sel_name, qty, unit, unit_price in rows:
+            if kind is None:  # product without recipe lines
+                continue
+            if kind == 1 and sel_name is None:
+                slots.append((line_id, label, None, qty, None, None, 0.0))
+                continue
+            line_cost = unit_price * qty
+            total += line_cost
+            if kind == 0:
+                items.append((line_id, label, qty, unit, unit_price, line_cost))
+            elif kind == 1:
+                slots.append((line_id, label, sel_name, qty, unit, unit_price, line_cost))
+            else:
+                components.append((line_id, label, qty, unit_price, line_cost))
+
+        profit, margin = profit_margin(total, sale_price)
+        return {
+            "items": items,
+            "slots": slots,
+            "components": components,
+            "cost": total,
+            "sale_price": (float(sale_price) if sale_price is not None else None),
+            "profit": profit,
+            "margin": margin,
+        }
 
+    # ---------- Cost computation ----------
+    def compute_product_cost(self, pid: int):
+        if self.cost_engine is not None:
+            return self.cost_engine.cost(pid)
+
+        view = self.get_recipe_view(pid)
+        return view["cost"] if view else 0.0
+
+    def compute_all_costs(self):
+        """{pid: cost} for every product in one sparse matrix product (via the CostEngine if attached)."""
+        if self.cost_engine is not None:
+            return dict(self.cost_engine.costs())
+        return CostMatrix.from_db(self).costs(unit_prices_from_db(self))
+
+    # ---------- Price history ----------
+    def list_ingredient_prices(self, ing_id: int):
+        """[(valid_from, pack_qty, pack_price)] of one ingredient, newest first."""
+        cur = self.conn.cursor()
         cur.execute(
             """
-            SELECT pi.qty, i.pack_qty, i.pack_price
-            FROM product_items pi
-            JOIN ingredients i ON i.id = pi.ingredient_id
-            WHERE pi.product_id = ?;
+            SELECT valid_from, pack_qty, pack_price FROM ingredient_prices
+            WHERE ingredient_id=? ORDER BY valid_from DESC;
             """,
-            (pid,),
+            (ing_id,),
         )
-        for qty, pack_qty, pack_price in cur.fetchall():
-            unit_price = (pack_price / pack_qty) if pack_qty else 0.0
-            total += unit_price * qty
+        return cur.fetchall()
+
+    def add_ingredient_price(self, ing_id: int, valid_from, pack_qty: float, pack_price: float):
+        """Record a price valid from a past day (e.g. an old invoice); replaces an entry of the same day.
+
+        The pack is in the ingredient's current unit. If it is the newest entry
+        up to today, it also becomes the current price.
+        """
+        day = iso_day(valid_from)
+        cur = self.conn.cursor()
+        cur.execute("SELECT date('now', 'localtime');")
+        if day > cur.fetchone()[0]:
+            raise ValueError("Preise können nur ab heute oder rückwirkend erfasst werden.")
+        cur.execute("SELECT unit FROM ingredients WHERE id=?;", (ing_id,))
+        r = cur.fetchone()
+        if r is None:
+            raise ValueError("Zutat nicht gefunden.")
+        with self.transaction():
+            cur.execute(
+                """
+                INSERT INTO ingredient_prices(ingredient_id, valid_from, pack_qty, pack_price, unit_price)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(ingredient_id, valid_from) DO UPDATE
+                SET pack_qty=excluded.pack_qty, pack_price=excluded.pack_price, unit_price=excluded.unit_price;
+                """,
+                (ing_id, day, pack_qty, pack_price, pack_unit_price(pack_qty, pack_price, r[0])),
+            )
+            cur.execute(
+                "SELECT 1 FROM ingredient_prices WHERE ingredient_id=? AND valid_from > ? AND valid_from <= date('now', 'localtime');",
+                (ing_id, day),
+            )
+            if cur.fetchone() is None:
+                # the history already holds this price, so the trigger adds no entry for today
+                cur.execute("UPDATE ingredients SET pack_qty=?, pack_price=? WHERE id=?;", (pack_qty, pack_price, ing_id))
+                self._ingredient_changed(ing_id)
+
+    def unit_prices_as_of(self, day) -> dict:
+        """{ing_id: price per base unit} valid on `day`, in one query.
+
+        Before its first recorded price an ingredient is costed at that first price.
+        """
+        cur = self.conn.cursor()
+        cur.execute(f"SELECT ingredient_id, unit_price FROM ({_UNIT_PRICE_AS_OF_SQL});", {"day": iso_day(day)})
+        return {ing_id: unit_price or 0.0 for ing_id, unit_price in cur}
+
+    def compute_all_costs_as_of(self, day) -> dict:
+        """{pid: cost} with the ingredient prices valid on `day`.
+
+        Recipes are the current ones; only the prices are looked up in the history.
+        One set-based query gives each product's own lines; sub-recipes are then
+        added children first (recipe_graph.topological_order), so a shared
+        component is costed once however many products contain it.
+        CROSS JOIN keeps the recipe lines as the outer loop; otherwise SQLite may
+        scan all prices once per product.
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            f"""
+            WITH price AS ({_UNIT_PRICE_AS_OF_SQL})
+            SELECT p.id,
+                COALESCE((
+                    SELECT SUM(pi.qty * pr.unit_price)
+                    FROM product_items pi
+                    CROSS JOIN price pr ON pr.ingredient_id = pi.ingredient_id
+                    WHERE pi.product_id = p.id
+                ), 0.0)
+                + COALESCE((
+                    SELECT SUM(sl.qty * pr.unit_price)
+                    FROM product_slot_lines sl
+                    JOIN product_slot_selection ss ON ss.product_id = sl.product_id AND ss.slot_name = sl.slot_name
+                    CROSS JOIN price pr ON pr.ingredient_id = ss.ingredient_id
+                    WHERE sl.product_id = p.id
+                ), 0.0)
+            FROM products p;
+            """,
+            {"day": iso_day(day)},
+        )
+        costs = dict(cur.fetchall())
+        components = defaultdict(list)
+        cur.execute("SELECT product_id, component_id, qty FROM product_components;")
+        for pid, component_id, qty in cur:
+            components[pid].append((component_id, qty))
+        for pid in topological_order(list(components), lambda p: [c for c, _qty in components.get(p, ())]):
+            costs[pid] += sum(qty * costs.get(component_id, 0.0) for component_id, qty in components[pid])
+        return costs
+
+    def cost_history(self, days):
+        """(day, {pid: cost}) for each of `days` (e.g. month starts), for reports over many dates.
+
+        The recipe matrix is built once; each day then costs one price lookup
+        (unit_prices_as_of) and one matrix product.
+        """
+        matrix = CostMatrix.from_db(self)
+        for day in days:
+            yield iso_day(day), matrix.costs(self.unit_prices_as_of(day))
+
+
+# Unit price of every ingredient on :day. Each lookup is one seek on the
+# ingredient_prices primary key; the current price covers ingredients without history.
+_UNIT_PRICE_AS_OF_SQL = """
+    SELECT i.id AS ingredient_id, COALESCE(
+        (SELECT h.unit_price FROM ingredient_prices h
+         WHERE h.ingredient_id = i.id AND h.valid_from <= :day ORDER BY h.valid_from DESC LIMIT 1),
+        (SELECT h.unit_price FROM ingredient_prices h
+         WHERE h.ingredient_id = i.id ORDER BY h.valid_from LIMIT 1),
+        i.unit_price
+    ) AS unit_price
+    FROM ingredients i
+"""
+
+
+# Product list sort orders: name -> (SQL key, SQL id tie-breaker, same key from a product_page() row).
+# Key and id columns match the indexes of migration 5; NULL profit/margin sort lowest.
+_NULL_LOW = -1e308
+PRODUCT_SORT_KEYS = {
+    "name": ("products.name COLLATE NOCASE", "products.id", lambda r: r[1]),
+    "cost": ("pc.cost", "pc.product_id", lambda r: r[2]),
+    "profit": ("ifnull(pc.profit, -1e308)", "pc.product_id", lambda r: _NULL_LOW if r[4] is None else r[4]),
+    "margin": ("ifnull(pc.margin, -1e308)", "pc.product_id", lambda r: _NULL_LOW if r[5] is None else r[5]),
+}
+
+
+def product_sort_key(row, sort: str):
+    """Keyset anchor (sort value, id) of a product_page() row, for `after=`."""
+    return PRODUCT_SORT_KEYS[sort][2](row), row[0]
+
+
+def _keyset_sql(sort: str, cmp: str) -> str:
+    """Condition for rows behind the anchor (key, id) in `cmp` direction; takes (key, key, id).
+
+    The single-column bound in front lets SQLite seek the index; the row value
+    comparison alone is only checked row by row.
+    """
+    key_sql, id_sql, _key = PRODUCT_SORT_KEYS[sort]
+    return f"{key_sql} {cmp}= ? AND ({key_sql}, {id_sql}) {cmp} (?, ?)"
+
+
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def _py_lower(s):
+    return s.lower() if isinstance(s, str) else s
 
-        for _line_id, slot_name, qty in self.list_slot_lines(pid):
-            r = self.get_slot_selection_price_unit(pid, slot_name)
-            if not r:
-                continue
-            _name, _unit, pack_qty, pack_price = r
-            unit_price = (pack_price / pack_qty) if pack_qty else 0.0
-            total += unit_price * qty
 
-        return total
\ No newline at end of file
+def _ascii_lower(s: str) -> str:
+    """lower() as SQLite does it (ASCII letters only)."""
+    return s.translate(_ASCII_LOWER)
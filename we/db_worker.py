@@ -0,0 +1,111 @@
+import queue
+import sys
+import threading
+from tkinter import messagebox
+
+from .config import DB_FILE
+from .cost_engine import CostEngine
+from .db import DB
+
+
+class DBWorker:
+    """Runs all database work on a dedicated thread with its own connection.
+
+    `submit(fn, on_done, on_error)` queues `fn(db)` for the worker thread, where
+    `db` is the worker's DB (with a CostEngine attached). Jobs run strictly in
+    submission order, so a read queued after a write sees that write.
+    Callbacks are delivered on the Tk thread by polling the result queue with
+    `app.after`, so a locked database or a slow disk never blocks the UI.
+    """
+
+    POLL_MS = 15
+
+    def __init__(self, app, path=DB_FILE):
+        self.app = app
+        self.path = path
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._pending = 0
+        self._poll_id = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+        self._thread.start()
+
+    # ---------- worker thread ----------
+    def _run(self):
+        db = None
+        open_error = None
+        try:
+            db = DB(self.path)
+            CostEngine(db)
+        except Exception as e:
+            open_error = e
+
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            fn, on_done, on_error = job
+            try:
+                if open_error is not None:
+                    raise open_error
+                result = fn(db)
+            except Exception as e:
+                self._results.put((on_error or self._report_error, e))
+            else:
+                self._results.put((on_done, result))
+
+        if db is not None:
+            db.close()
+
+    # ---------- Tk thread ----------
+    def submit(self, fn, on_done=None, on_error=None):
+        """Queue `fn(db)`; `on_done(result)` / `on_error(exc)` run later on the Tk thread."""
+        if self._closed:
+            return
+        self._pending += 1
+        self._jobs.put((fn, on_done, on_error))
+        self._schedule_poll()
+
+    def call(self, method: str, *args, on_done=None, on_error=None):
+        """Shortcut for submitting a single DB method call."""
+        self.submit(lambda db: getattr(db, method)(*args), on_done, on_error)
+
+    def _schedule_poll(self):
+        if self._poll_id is None and not self._closed:
+            self._poll_id = self.app.after(self.POLL_MS, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                callback, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if callback is None:
+                continue
+            try:
+                callback(value)
+            except Exception:
+                self.app.report_callback_exception(*sys.exc_info())
+
+        if self._pending > 0:
+            self._schedule_poll()
+
+    def _report_error(self, exc):
+        messagebox.showerror("Fehler", f"Datenbankfehler: {exc}")
+
+    def close(self, timeout: float = 5.0):
+        """Finish queued jobs, close the worker's connection and stop the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._poll_id is not None:
+            try:
+                self.app.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+        self._jobs.put(None)
+        self._thread.join(timeout)
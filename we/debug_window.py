@@ -0,0 +1,83 @@
+import tkinter as tk
+from tkinter import ttk
+
+from . import instrument
+from .config import BG
+from .ui_helpers import reconcile_tree
+
+COLUMNS = (
+    ("name", "Pfad", 320, "w"),
+    ("count", "Aufrufe", 70, "e"),
+    ("total", "Gesamt (ms)", 100, "e"),
+    ("p50", "p50 (ms)", 80, "e"),
+    ("p99", "p99 (ms)", 80, "e"),
+    ("rows", "Zeilen", 80, "e"),
+)
+
+
+class DebugWindow:
+    """Hidden statistics window for the instrumentation (Strg+Umschalt+D)."""
+
+    REFRESH_MS = 1000
+
+    def __init__(self, app):
+        self.app = app
+        self.win = tk.Toplevel(app, bg=BG)
+        self.win.title("Instrumentierung")
+        self.win.geometry("780x420")
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        bar = ttk.Frame(self.win, padding=(10, 10, 10, 0))
+        bar.pack(fill="x")
+        ttk.Button(bar, text="Zurücksetzen", command=self._reset).pack(side="left")
+        ttk.Button(bar, text="JSON speichern", command=self._dump).pack(side="left", padx=(6, 0))
+        self.status = ttk.Label(bar, text="")
+        self.status.pack(side="right")
+
+        body = ttk.Frame(self.win, padding=10)
+        body.pack(fill="both", expand=True)
+        self.tree = ttk.Treeview(body, columns=[c[0] for c in COLUMNS], show="headings", selectmode="browse")
+        for col, text, width, anchor in COLUMNS:
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width, anchor=anchor)
+        self.tree.pack(side="left", fill="both", expand=True)
+        sb = ttk.Scrollbar(body, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscroll=sb.set)
+        sb.pack(side="right", fill="y")
+
+        self._after_id = None
+        self._refresh()
+
+    def _refresh(self):
+        self._after_id = None
+        rows = [
+            (name, (name, s["count"], f"{s['total_ms']:.1f}", f"{s['p50_ms']:.2f}", f"{s['p99_ms']:.2f}", s["rows"]))
+            for name, s in instrument.recorder.snapshot().items()
+        ]
+        reconcile_tree(self.tree, rows)
+        self._after_id = self.win.after(self.REFRESH_MS, self._refresh)
+
+    def _reset(self):
+        instrument.recorder.reset()
+        self.status.config(text="")
+
+    def _dump(self):
+        path = instrument.dump()
+        self.status.config(text=f"gespeichert: {path}")
+
+    def close(self):
+        if self._after_id is not None:
+            try:
+                self.win.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self.win.destroy()
+        self.app.debug_window = None
+
+
+def toggle(app):
+    """Open the window, or close it if it is already open."""
+    if getattr(app, "debug_window", None) is not None:
+        app.debug_window.close()
+    else:
+        app.debug_window = DebugWindow(app)
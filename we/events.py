@@ -0,0 +1,43 @@
+import sys
+from collections import defaultdict
+
+# Event types; the payload is the id of the changed row (None = unknown / everything)
+INGREDIENT_CHANGED = "ingredient_changed"  # ingredient id (added, updated or deleted)
+PRODUCT_CHANGED = "product_changed"  # product id (added, renamed, deleted, sale price)
+RECIPE_CHANGED = "recipe_changed"  # product id whose recipe lines or slot selections changed
+
+
+class EventBus:
+    """Scoped change notifications between the tabs.
+
+    `emit(event, obj_id)` only records the change. Everything emitted during
+    one Tk tick is delivered together from `after_idle`: each subscriber of an
+    event type is called once with the set of affected ids, so several changes
+    in a row cause one refresh.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._handlers = defaultdict(list)
+        self._pending = {}  # event -> {obj_id}
+        self._idle_id = None
+
+    def subscribe(self, event: str, handler):
+        """Call `handler(ids)` for coalesced `event`s."""
+        self._handlers[event].append(handler)
+
+    def emit(self, event: str, obj_id=None):
+        self._pending.setdefault(event, set()).add(obj_id)
+        if self._idle_id is None:
+            self._idle_id = self.app.after_idle(self.flush)
+
+    def flush(self):
+        """Deliver all pending events now (normally called from after_idle)."""
+        self._idle_id = None
+        pending, self._pending = self._pending, {}
+        for event, ids in pending.items():
+            for handler in self._handlers.get(event, ()):
+                try:
+                    handler(ids)
+                except Exception:
+                    self.app.report_callback_exception(*sys.exc_info())
@@ -0,0 +1,145 @@
+"""Streaming export of the costing book: ingredients and their price history, products, recipe, slot and sub-recipe lines, costs.
+
+Every dataset is one query read with fetchmany(FETCH_SIZE), so memory stays
+constant however large the catalog is. Output is either one CSV file per
+dataset (`kalkulation.csv` -> `kalkulation_ingredients.csv`, ...) or a single
+JSON Lines stream where every line carries its dataset in "type".
+"""
+
+import csv
+import json
+import os
+
+FETCH_SIZE = 500
+
+# dataset -> (column names, query); unit prices are the stored prices per base
+# unit (base_unit), line costs use them like the cost triggers
+DATASETS = {
+    "ingredients": (
+        ("id", "name", "unit", "pack_qty", "pack_price", "base_unit", "unit_price"),
+        """
+        SELECT i.id, i.name, i.unit, i.pack_qty, i.pack_price, COALESCE(u.base_unit, i.unit), i.unit_price
+        FROM ingredients i
+        LEFT JOIN units u ON u.unit = i.unit
+        ORDER BY i.id;
+        """,
+    ),
+    "ingredient_prices": (
+        ("ingredient_id", "ingredient", "valid_from", "pack_qty", "pack_price", "unit_price"),
+        """
+        SELECT h.ingredient_id, i.name, h.valid_from, h.pack_qty, h.pack_price, h.unit_price
+        FROM ingredient_prices h
+        JOIN ingredients i ON i.id = h.ingredient_id
+        ORDER BY h.ingredient_id, h.valid_from;
+        """,
+    ),
+    "products": (
+        ("id", "name", "sale_price"),
+        "SELECT id, name, sale_price FROM products ORDER BY id;",
+    ),
+    "recipe_lines": (
+        ("id", "product_id", "product", "ingredient_id", "ingredient", "qty", "unit", "base_qty", "line_cost"),
+        """
+        SELECT pi.id, pi.product_id, p.name, pi.ingredient_id, i.name,
+               pi.qty / COALESCE(u.factor, 1.0), COALESCE(pi.unit, i.unit), pi.qty, pi.qty * i.unit_price
+        FROM product_items pi
+        JOIN products p ON p.id = pi.product_id
+        JOIN ingredients i ON i.id = pi.ingredient_id
+        LEFT JOIN units u ON u.unit = COALESCE(pi.unit, i.unit)
+        ORDER BY pi.product_id, pi.id;
+        """,
+    ),
+    "slot_lines": (
+        ("id", "product_id", "product", "slot_name", "qty", "ingredient_id", "ingredient", "unit", "line_cost"),
+        """
+        SELECT sl.id, sl.product_id, p.name, sl.slot_name, sl.qty, i.id, i.name, COALESCE(u.base_unit, i.unit),
+               sl.qty * i.unit_price
+        FROM product_slot_lines sl
+        JOIN products p ON p.id = sl.product_id
+        LEFT JOIN product_slot_selection ss ON ss.product_id = sl.product_id AND ss.slot_name = sl.slot_name
+        LEFT JOIN ingredients i ON i.id = ss.ingredient_id
+        LEFT JOIN units u ON u.unit = i.unit
+        ORDER BY sl.product_id, sl.id;
+        """,
+    ),
+    "component_lines": (
+        ("id", "product_id", "product", "component_id", "component", "qty", "unit_cost", "line_cost"),
+        """
+        SELECT pc.id, pc.product_id, p.name, pc.component_id, c.name, pc.qty, cc.cost, pc.qty * cc.cost
+        FROM product_components pc
+        JOIN products p ON p.id = pc.product_id
+        JOIN products c ON c.id = pc.component_id
+        JOIN product_costs cc ON cc.product_id = pc.component_id
+        ORDER BY pc.product_id, pc.id;
+        """,
+    ),
+    "costs": (
+        ("product_id", "product", "cost", "sale_price", "profit", "margin_pct"),
+        """
+        SELECT pc.product_id, p.name, pc.cost, p.sale_price, pc.profit, pc.margin
+        FROM product_costs pc
+        JOIN products p ON p.id = pc.product_id
+        ORDER BY pc.product_id;
+        """,
+    ),
+}
+
+
+def iter_rows(db, dataset: str, fetch_size: int = FETCH_SIZE):
+    """Rows of `dataset`, fetched in batches of `fetch_size`."""
+    cur = db.conn.cursor()
+    cur.execute(DATASETS[dataset][1])
+    try:
+        while True:
+            batch = cur.fetchmany(fetch_size)
+            if not batch:
+                return
+            yield from batch
+    finally:
+        cur.close()
+
+
+def csv_paths(base_path: str, datasets) -> dict:
+    """{dataset: file} for a CSV export to `base_path` (e.g. kalkulation.csv -> kalkulation_costs.csv)."""
+    stem, ext = os.path.splitext(base_path)
+    return {name: f"{stem}_{name}{ext or '.csv'}" for name in datasets}
+
+
+def export_csv(db, base_path: str, datasets=None, delimiter: str = ";") -> dict:
+    """One CSV file per dataset next to `base_path`; returns {dataset: row count}."""
+    datasets = list(datasets or DATASETS)
+    counts = {}
+    for name, path in csv_paths(base_path, datasets).items():
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f, delimiter=delimiter)
+            w.writerow(DATASETS[name][0])
+            n = 0
+            for row in iter_rows(db, name):
+                w.writerow(["" if v is None else v for v in row])
+                n += 1
+        counts[name] = n
+    return counts
+
+
+def export_jsonl(db, out, datasets=None) -> dict:
+    """All datasets as JSON Lines to the open text stream `out`; returns {dataset: row count}."""
+    counts = {}
+    for name in datasets or DATASETS:
+        columns = DATASETS[name][0]
+        n = 0
+        for row in iter_rows(db, name):
+            record = {"type": name}
+            record.update(zip(columns, row))
+            out.write(json.dumps(record, ensure_ascii=False))
+            out.write("\n")
+            n += 1
+        counts[name] = n
+    return counts
+
+
+def export_file(db, path: str, datasets=None, delimiter: str = ";") -> dict:
+    """JSON Lines for *.jsonl / *.json paths, otherwise CSV files (see csv_paths)."""
+    if os.path.splitext(path)[1].lower() in (".jsonl", ".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            return export_jsonl(db, f, datasets)
+    return export_csv(db, path, datasets, delimiter)
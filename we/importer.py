@@ -0,0 +1,161 @@
+"""Streaming import of supplier price lists (CSV) into the ingredients table.
+
+Columns: name, unit, pack qty, pack price. A header row is optional; when
+present, its columns may be in any order and named in German or English
+(Name/Zutat, Einheit/Unit, Packungsmenge/Menge, Packungspreis/Preis). The
+delimiter (; , or tab) is detected from the first line.
+
+Rows are read through generators and written with executemany in chunks of
+CHUNK_SIZE inside one transaction, so a 15k-line list never sits in memory
+as a whole and a failure leaves the database unchanged.
+"""
+
+import csv
+from itertools import islice
+
+from .units import UNITS
+from .utils import safe_float
+
+CHUNK_SIZE = 1000
+DELIMITERS = ";,\t"
+
+# header spellings (casefolded) -> field
+_HEADER = {
+    "name": "name",
+    "zutat": "name",
+    "bezeichnung": "name",
+    "artikel": "name",
+    "unit": "unit",
+    "einheit": "unit",
+    "pack_qty": "pack_qty",
+    "packungsmenge": "pack_qty",
+    "menge": "pack_qty",
+    "inhalt": "pack_qty",
+    "pack_price": "pack_price",
+    "packungspreis": "pack_price",
+    "preis": "pack_price",
+    "ek": "pack_price",
+}
+_FIELDS = ("name", "unit", "pack_qty", "pack_price")
+
+_UPSERT = """
+    INSERT INTO ingredients(name, unit, pack_qty, pack_price)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET unit=excluded.unit, pack_qty=excluded.pack_qty, pack_price=excluded.pack_price;
+"""
+
+
+def read_rows(f, delimiter=None):
+    """(line_no, [cells]) for every non-empty CSV row of the open text file `f`."""
+    first = f.readline()
+    if not first:
+        return
+    if delimiter is None:
+        delimiter = max(DELIMITERS, key=first.count)
+
+    def _lines():
+        yield first
+        yield from f
+
+    for line_no, cells in enumerate(csv.reader(_lines(), delimiter=delimiter), start=1):
+        if any(c.strip() for c in cells):
+            yield line_no, cells
+
+
+def parse_rows(rows):
+    """(line_no, (name, unit, pack_qty, pack_price), None) or (line_no, None, reason) per row."""
+    columns = None  # field -> cell index
+    for line_no, cells in rows:
+        if columns is None:
+            header = {_HEADER.get(c.strip().casefold()): i for i, c in enumerate(cells)}
+            if all(field in header for field in _FIELDS):
+                columns = {field: header[field] for field in _FIELDS}
+                continue
+            columns = {field: i for i, field in enumerate(_FIELDS)}
+            if len(cells) >= 4 and safe_float(cells[2]) is None and safe_float(cells[3]) is None:
+                continue  # unknown header; fall back to the column order
+
+        try:
+            name, unit, qty_raw, price_raw = (cells[columns[field]].strip() for field in _FIELDS)
+        except IndexError:
+            yield line_no, None, "zu wenige Spalten"
+            continue
+        unit = unit.lower()
+        pack_qty = safe_float(qty_raw)
+        pack_price = safe_float(price_raw)
+        if not name:
+            yield line_no, None, "Name fehlt"
+        elif unit not in UNITS:
+            yield line_no, None, f"Einheit '{unit}' nicht erlaubt ({'/'.join(UNITS)})"
+        elif pack_qty is None or pack_qty <= 0:
+            yield line_no, None, f"Packungsmenge '{qty_raw}' ungültig"
+        elif pack_price is None or pack_price < 0:
+            yield line_no, None, f"Packungspreis '{price_raw}' ungültig"
+        else:
+            yield line_no, (name, unit, pack_qty, pack_price), None
+
+
+def import_price_list(db, rows, dry_run=False, chunk_size=CHUNK_SIZE) -> dict:
+    """Upsert parsed `rows` (see parse_rows) into ingredients; returns the report.
+
+    Report: {"inserted", "updated", "unchanged": counts, "rejected": [(line_no, reason)]}.
+    Unchanged ingredients are not written; the costs of the products using the
+    changed ones are recomputed once at the end (DB.deferred_ingredient_costs).
+    A name repeated in the list counts once; its last line wins.
+    """
+    cur = db.conn.cursor()
+    cur.execute("SELECT name, unit, pack_qty, pack_price FROM ingredients;")
+    existing = {name: (unit, pack_qty, pack_price) for name, unit, pack_qty, pack_price in cur}
+    report = {"inserted": 0, "updated": 0, "unchanged": 0, "rejected": []}
+    seen = {}  # name -> (report key, values) of the names met so far in this import
+
+    def _changes():
+        for line_no, record, error in rows:
+            if record is None:
+                report["rejected"].append((line_no, error))
+                continue
+            name, values = record[0], record[1:]
+            prev = seen.get(name)
+            if prev is None:
+                old = existing.get(name)
+                kind = "inserted" if old is None else ("unchanged" if old == values else "updated")
+                report[kind] += 1
+                seen[name] = (kind, values)
+                if kind != "unchanged":
+                    yield record
+            elif prev[1] != values:
+                kind = prev[0]
+                if kind == "unchanged":
+                    report["unchanged"] -= 1
+                    report["updated"] += 1
+                    kind = "updated"
+                seen[name] = (kind, values)
+                yield record
+
+    changes = _changes()
+    if dry_run:
+        for _record in changes:
+            pass
+        return report
+
+    written = set()
+    with db.transaction(), db.deferred_ingredient_costs():
+        while True:
+            chunk = list(islice(changes, chunk_size))
+            if not chunk:
+                break
+            cur.executemany(_UPSERT, chunk)
+            written.update(name for name, *_rest in chunk)
+
+    if db.cost_engine is not None and written:
+        cur.execute("SELECT id, name FROM ingredients;")
+        ids = {name: ing_id for ing_id, name in cur}
+        for name in written:
+            db.cost_engine.ingredient_changed(ids[name])
+    return report
+
+
+def import_price_list_file(db, path, delimiter=None, encoding="utf-8-sig", dry_run=False) -> dict:
+    """import_price_list() for a CSV file, streamed row by row."""
+    with open(path, newline="", encoding=encoding) as f:
+        return import_price_list(db, parse_rows(read_rows(f, delimiter)), dry_run=dry_run)
@@ -0,0 +1,170 @@
+"""Optional hot-path instrumentation, switched on with `WE_INSTRUMENT`.
+
+    WE_INSTRUMENT=1                 record; dump to we_instrument.json on exit
+    WE_INSTRUMENT=/tmp/stats.json   record; dump to that file on exit
+
+Every public DB method and the UI refresh paths are wrapped to record call
+count, total/p50/p99 latency and rows returned. When the variable is not set
+nothing is wrapped and there is no overhead.
+"""
+
+import atexit
+import functools
+import importlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+ENV_VAR = "WE_INSTRUMENT"
+DEFAULT_DUMP = "we_instrument.json"
+SAMPLES = 2048  # latencies kept per name for the percentiles
+
+# (module, class, methods) wrapped besides all public DB methods
+UI_PATHS = [
+    ("we.app", "App", ["refresh_all"]),
+    ("we.tabs_ingredients", "IngredientsTab", ["refresh"]),
+    (
+        "we.tabs_products",
+        "ProductsTab",
+        ["refresh", "refresh_products", "_render_recipe", "_refresh_product_detail"],
+    ),
+]
+
+
+class _Stat:
+    __slots__ = ("count", "total", "rows", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=SAMPLES)
+
+
+class Recorder:
+    """Thread-safe per-name latency/row statistics (DB calls run on the worker thread)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name: str, seconds: float, rows=None):
+        with self._lock:
+            st = self._stats.get(name)
+            if st is None:
+                st = self._stats[name] = _Stat()
+            st.count += 1
+            st.total += seconds
+            st.samples.append(seconds)
+            if rows:
+                st.rows += rows
+
+    def snapshot(self) -> dict:
+        """{name: {count, total_ms, p50_ms, p99_ms, rows}}, slowest total first."""
+        with self._lock:
+            items = [(name, st.count, st.total, st.rows, sorted(st.samples)) for name, st in self._stats.items()]
+        out = {}
+        for name, count, total, rows, samples in sorted(items, key=lambda x: -x[2]):
+            out[name] = {
+                "count": count,
+                "total_ms": total * 1000.0,
+                "p50_ms": _percentile(samples, 0.50) * 1000.0,
+                "p99_ms": _percentile(samples, 0.99) * 1000.0,
+                "rows": rows,
+            }
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def _percentile(sorted_samples, q: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(q * len(sorted_samples)))]
+
+
+def _row_count(result):
+    """Rows in a query result: fetchall() lists, {key: value} maps, recipe views."""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        if "items" in result and "slots" in result:  # DB.get_recipe_view
+            return len(result["items"]) + len(result["slots"])
+        return len(result)
+    return None
+
+
+recorder = None  # Recorder when enabled
+_dump_path = None
+
+
+def enabled() -> bool:
+    return recorder is not None
+
+
+def wrap(name: str, fn):
+    """`fn` recording into the global recorder under `name`."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - t0
+        recorder.record(name, elapsed, _row_count(result))
+        return result
+
+    wrapper.__wrapped_by_instrument__ = True
+    return wrapper
+
+
+def instrument_methods(cls, names=None, prefix=None, exclude=()):
+    """Wrap `names` (default: all public methods) of `cls` in place."""
+    prefix = prefix or cls.__name__
+    if names is None:
+        names = [n for n, v in vars(cls).items() if callable(v) and not n.startswith("_") and n not in exclude]
+    for n in names:
+        fn = getattr(cls, n, None)
+        if fn is None or getattr(fn, "__wrapped_by_instrument__", False):
+            continue
+        setattr(cls, n, wrap(f"{prefix}.{n}", fn))
+
+
+def install(dump_path=DEFAULT_DUMP):
+    """Enable recording: wrap DB and the UI refresh paths, dump JSON at exit."""
+    global recorder, _dump_path
+    if recorder is not None:
+        return recorder
+    from .db import DB
+
+    recorder = Recorder()
+    _dump_path = dump_path
+    # transaction() only hands out a context manager; its statements are timed individually
+    instrument_methods(DB, exclude=("transaction",))
+    for module, cls_name, methods in UI_PATHS:
+        instrument_methods(getattr(importlib.import_module(module), cls_name), methods)
+    atexit.register(dump)
+    return recorder
+
+
+def install_from_env():
+    """install() if WE_INSTRUMENT is set; returns the recorder or None."""
+    value = os.environ.get(ENV_VAR, "").strip()
+    if not value or value == "0":
+        return None
+    return install(value if value.endswith(".json") else DEFAULT_DUMP)
+
+
+def dump(path=None):
+    """Write the current statistics as JSON (no-op when disabled)."""
+    if recorder is None:
+        return None
+    path = path or _dump_path
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"generated": time.strftime("%Y-%m-%d %H:%M:%S"), "stats": recorder.snapshot()}, f, indent=2)
+    return path
@@ -0,0 +1,628 @@
+"""Versioned schema migrations, keyed on ``PRAGMA user_version``.
+
+Each entry in ``MIGRATIONS`` upgrades the schema by one version and must be
+idempotent, so databases created before versioning (user_version 0) can be
+brought up to date safely.
+"""
+import sqlite3
+
+from .units import UNITS
+
+# Cost of one product (fixed items + resolved slot lines). `{pid}` is the SQL
+# expression naming the product, e.g. "product_costs.product_id"; `{unit_price}`
+# the ingredient's unit price (see _refresh_costs_sql).
+PRODUCT_COST_SQL = """
+    COALESCE((
+        SELECT SUM(pi.qty * {unit_price})
+        FROM product_items pi
+        JOIN ingredients i ON i.id = pi.ingredient_id
+        WHERE pi.product_id = {pid}
+    ), 0.0)
+    + COALESCE((
+        SELECT SUM(sl.qty * {unit_price})
+        FROM product_slot_lines sl
+        JOIN product_slot_selection ss
+          ON ss.product_id = sl.product_id AND ss.slot_name = sl.slot_name
+        JOIN ingredients i ON i.id = ss.ingredient_id
+        WHERE sl.product_id = {pid}
+    ), 0.0)
+"""
+
+# Cost of the component products (sub-recipes) of one product, from their
+# materialized costs; added to PRODUCT_COST_SQL from migration 9 on.
+COMPONENT_COST_SQL = """
+    + COALESCE((
+        SELECT SUM(pc.qty * c.cost)
+        FROM product_components pc
+        JOIN product_costs c ON c.product_id = pc.component_id
+        WHERE pc.product_id = {pid}
+    ), 0.0)
+"""
+
+
+def _refresh_costs_sql(where: str, version: int = None):
+    """Statements recomputing cost, then profit and margin, for product_costs rows matching `where`.
+
+    `version` is the schema the statements are written for (default: the
+    latest), so earlier migrations keep their formula: the sub-recipe term
+    comes with migration 9, the stored ingredients.unit_price with 10.
+    """
+    if version is None:
+        version = len(MIGRATIONS)
+    cost_sql = PRODUCT_COST_SQL + (COMPONENT_COST_SQL if version >= 9 else "")
+    unit_price = "i.unit_price" if version >= 10 else "(i.pack_price / i.pack_qty)"
+    cost = f"""
+        UPDATE product_costs
+        SET cost = {cost_sql.format(pid="product_costs.product_id", unit_price=unit_price)}
+        WHERE {where}
+    """
+    margin = f"""
+        UPDATE product_costs
+        SET profit = (SELECT p.sale_price - product_costs.cost FROM products p WHERE p.id = product_costs.product_id),
+            margin = (
+                SELECT CASE
+                    WHEN p.sale_price IS NULL THEN NULL
+                    WHEN p.sale_price > 0 THEN (p.sale_price - product_costs.cost) / p.sale_price * 100.0
+                    ELSE 0.0
+                END
+                FROM products p WHERE p.id = product_costs.product_id
+            )
+        WHERE {where}
+    """
+    return cost, margin
+
+
+# Triggers keeping product_costs in sync: (name, event, product_costs filter)
+_COST_TRIGGERS = [
+    ("trg_pc_product_price", "AFTER UPDATE OF sale_price ON products", "product_id = NEW.id"),
+    (
+        "trg_pc_ingredient_price",
+        "AFTER UPDATE OF pack_qty, pack_price ON ingredients",
+        """product_id IN (
+            SELECT product_id FROM product_items WHERE ingredient_id = NEW.id
+            UNION
+            SELECT product_id FROM product_slot_selection WHERE ingredient_id = NEW.id
+        )""",
+    ),
+    ("trg_pc_items_ins", "AFTER INSERT ON product_items", "product_id = NEW.product_id"),
+    ("trg_pc_items_upd", "AFTER UPDATE ON product_items", "product_id IN (OLD.product_id, NEW.product_id)"),
+    ("trg_pc_items_del", "AFTER DELETE ON product_items", "product_id = OLD.product_id"),
+    ("trg_pc_slots_ins", "AFTER INSERT ON product_slot_lines", "product_id = NEW.product_id"),
+    ("trg_pc_slots_upd", "AFTER UPDATE ON product_slot_lines", "product_id IN (OLD.product_id, NEW.product_id)"),
+    ("trg_pc_slots_del", "AFTER DELETE ON product_slot_lines", "product_id = OLD.product_id"),
+    ("trg_pc_sel_ins", "AFTER INSERT ON product_slot_selection", "product_id = NEW.product_id"),
+    ("trg_pc_sel_upd", "AFTER UPDATE ON product_slot_selection", "product_id IN (OLD.product_id, NEW.product_id)"),
+    ("trg_pc_sel_del", "AFTER DELETE ON product_slot_selection", "product_id = OLD.product_id"),
+]
+
+
+def _m1_base_tables(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ingredients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            unit TEXT NOT NULL,
+            pack_qty REAL NOT NULL,
+            pack_price REAL NOT NULL
+        );
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        );
+        """
+    )
+    cur.execute("PRAGMA table_info(products);")
+    cols = [r[1] for r in cur.fetchall()]
+    if "sale_price" not in cols:
+        cur.execute("ALTER TABLE products ADD COLUMN sale_price REAL;")
+
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS product_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            ingredient_id INTEGER NOT NULL,
+            qty REAL NOT NULL,
+            FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE,
+            FOREIGN KEY(ingredient_id) REFERENCES ingredients(id) ON DELETE RESTRICT
+        );
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS product_slot_lines (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            slot_name TEXT NOT NULL,
+            qty REAL NOT NULL,
+            FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE
+        );
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS product_slot_selection (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            slot_name TEXT NOT NULL,
+            ingredient_id INTEGER NOT NULL,
+            UNIQUE(product_id, slot_name),
+            FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE,
+            FOREIGN KEY(ingredient_id) REFERENCES ingredients(id) ON DELETE RESTRICT
+        );
+        """
+    )
+
+
+def _m2_product_costs(cur):
+    """Materialized per-product cost/profit/margin, maintained by triggers."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS product_costs (
+            product_id INTEGER PRIMARY KEY,
+            cost REAL NOT NULL DEFAULT 0.0,
+            profit REAL,
+            margin REAL,
+            FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE
+        );
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_pc_product_ins AFTER INSERT ON products
+        BEGIN
+            INSERT OR IGNORE INTO product_costs(product_id) VALUES (NEW.id);
+        END;
+        """
+    )
+    for name, event, where in _COST_TRIGGERS:
+        body = "".join(f"{stmt};" for stmt in _refresh_costs_sql(where, version=2))
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END;")
+
+    cur.execute("INSERT OR IGNORE INTO product_costs(product_id) SELECT id FROM products;")
+    for stmt in _refresh_costs_sql("1", version=2):
+        cur.execute(stmt)
+
+
+def _m3_fk_indexes(cur):
+    """Covering indexes on the foreign-key columns used by recipe lookups and FK checks."""
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_product_items_product ON product_items(product_id, ingredient_id, qty);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_product_items_ingredient ON product_items(ingredient_id, product_id);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_product_slot_lines_product ON product_slot_lines(product_id, slot_name, qty);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_product_slot_selection_ingredient "
+        "ON product_slot_selection(ingredient_id, product_id);"
+    )
+
+
+# Name search index per table: (table, FTS5 table, trigram fallback table)
+NAME_SEARCH_TABLES = [
+    ("ingredients", "ingredients_fts", "ingredients_trigrams"),
+    ("products", "products_fts", "products_trigrams"),
+]
+TRIGRAM_MAX_LEN = 256  # longest name the fallback trigram index covers completely
+
+
+def _fts5_trigram_available(cur) -> bool:
+    cur.execute("SAVEPOINT fts_probe;")
+    try:
+        cur.execute("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(x, tokenize='trigram');")
+        ok = True
+    except sqlite3.OperationalError:
+        ok = False
+    cur.execute("ROLLBACK TO fts_probe;")
+    cur.execute("RELEASE fts_probe;")
+    return ok
+
+
+def _m4_name_search(cur):
+    """Trigram index on ingredients.name / products.name for substring search.
+
+    Uses an external-content FTS5 table with the trigram tokenizer. Without
+    FTS5 (or an SQLite older than 3.34) it falls back to a plain
+    (gram, id) table filled by triggers; grams are taken over lower(name).
+    """
+    if _fts5_trigram_available(cur):
+        for table, fts, _trigrams in NAME_SEARCH_TABLES:
+            cur.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} "
+                f"USING fts5(name, content='{table}', content_rowid='id', tokenize='trigram');"
+            )
+            cur.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{fts}_ins AFTER INSERT ON {table}
+                BEGIN
+                    INSERT INTO {fts}(rowid, name) VALUES (NEW.id, NEW.name);
+                END;
+                """
+            )
+            cur.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{fts}_del AFTER DELETE ON {table}
+                BEGIN
+                    INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+                END;
+                """
+            )
+            cur.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{fts}_upd AFTER UPDATE OF name ON {table}
+                BEGIN
+                    INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+                    INSERT INTO {fts}(rowid, name) VALUES (NEW.id, NEW.name);
+                END;
+                """
+            )
+            cur.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild');")
+        return
+
+    # Fallback: triggers can't use CTEs, so a fixed sequence table drives substr()
+    cur.execute("CREATE TABLE IF NOT EXISTS trigram_seq (i INTEGER PRIMARY KEY);")
+    cur.executemany("INSERT OR IGNORE INTO trigram_seq(i) VALUES (?);", [(i,) for i in range(1, TRIGRAM_MAX_LEN + 1)])
+    for table, _fts, trigrams in NAME_SEARCH_TABLES:
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {trigrams} (
+                gram TEXT NOT NULL,
+                ref_id INTEGER NOT NULL,
+                PRIMARY KEY (gram, ref_id),
+                FOREIGN KEY(ref_id) REFERENCES {table}(id) ON DELETE CASCADE
+            ) WITHOUT ROWID;
+            """
+        )
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{trigrams}_ref ON {trigrams}(ref_id);")
+        insert = (
+            f"INSERT OR IGNORE INTO {trigrams}(gram, ref_id) "
+            f"SELECT substr(lower(NEW.name), s.i, 3), NEW.id FROM trigram_seq s "
+            f"WHERE s.i <= length(NEW.name) - 2"
+        )
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{trigrams}_ins AFTER INSERT ON {table} BEGIN {insert}; END;")
+        cur.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{trigrams}_upd AFTER UPDATE OF name ON {table} "
+            f"BEGIN DELETE FROM {trigrams} WHERE ref_id = OLD.id; {insert}; END;"
+        )
+        cur.execute(f"DELETE FROM {trigrams};")
+        cur.execute(
+            f"INSERT OR IGNORE INTO {trigrams}(gram, ref_id) "
+            f"SELECT substr(lower(t.name), s.i, 3), t.id FROM {table} t JOIN trigram_seq s "
+            f"ON s.i <= length(t.name) - 2;"
+        )
+
+
+def _m5_product_sort_indexes(cur):
+    """Indexes matching the product list's ORDER BY keys (see db.PRODUCT_SORT_KEYS), id as tie-breaker."""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_name_nocase ON products(name COLLATE NOCASE, id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_product_costs_cost ON product_costs(cost, product_id);")
+    # NULL (no sale price) sorts lowest, as a plain number so keyset comparisons stay valid
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_product_costs_profit ON product_costs(ifnull(profit, -1e308), product_id);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_product_costs_margin ON product_costs(ifnull(margin, -1e308), product_id);"
+    )
+
+
+def _m6_sale_price_trigger(cur):
+    """A sale price change only moves profit and margin; stop recomputing the cost for it.
+
+    Bulk repricing updates thousands of rows, and the cost subqueries made up
+    most of the trigger time.
+    """
+    cur.execute("DROP TRIGGER IF EXISTS trg_pc_product_price;")
+    cur.execute(
+        """
+        CREATE TRIGGER trg_pc_product_price AFTER UPDATE OF sale_price ON products
+        BEGIN
+            UPDATE product_costs
+            SET profit = NEW.sale_price - cost,
+                margin = CASE
+                    WHEN NEW.sale_price IS NULL THEN NULL
+                    WHEN NEW.sale_price > 0 THEN (NEW.sale_price - cost) / NEW.sale_price * 100.0
+                    ELSE 0.0
+                END
+            WHERE product_id = NEW.id;
+        END;
+        """
+    )
+
+
+_WHEN_NOT_DEFERRED = "WHEN NOT EXISTS (SELECT 1 FROM cost_refresh_deferred)"
+
+# Note an ingredient for the deferred refresh. Not INSERT OR IGNORE: the
+# conflict policy of the outer statement (e.g. the importer's upsert) overrides
+# the trigger's, so a second change of the same ingredient would abort it.
+_NOTE_PENDING_SQL = """
+    INSERT INTO cost_refresh_pending(ingredient_id)
+    SELECT NEW.id WHERE NOT EXISTS (SELECT 1 FROM cost_refresh_pending WHERE ingredient_id = NEW.id);
+"""
+
+
+def _m7_deferred_ingredient_costs(cur):
+    """Let bulk price updates skip the per-row cost trigger (see DB.deferred_ingredient_costs).
+
+    While cost_refresh_deferred has a row, ingredient price updates only note
+    the ingredient in cost_refresh_pending; the products using them are then
+    recomputed once, set-based, instead of once per changed ingredient.
+    """
+    cur.execute("CREATE TABLE IF NOT EXISTS cost_refresh_deferred (flag INTEGER PRIMARY KEY);")
+    cur.execute("CREATE TABLE IF NOT EXISTS cost_refresh_pending (ingredient_id INTEGER PRIMARY KEY);")
+    name, event, where = next(t for t in _COST_TRIGGERS if t[0] == "trg_pc_ingredient_price")
+    body = "".join(f"{stmt};" for stmt in _refresh_costs_sql(where, version=7))
+    cur.execute(f"DROP TRIGGER IF EXISTS {name};")
+    cur.execute(f"CREATE TRIGGER {name} {event} {_WHEN_NOT_DEFERRED} BEGIN {body} END;")
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_pc_ingredient_price_deferred {event}
+        WHEN EXISTS (SELECT 1 FROM cost_refresh_deferred)
+        BEGIN {_NOTE_PENDING_SQL} END;
+        """
+    )
+
+
+# Upsert of the ingredient's price as valid from today (a second change on the same day replaces the first)
+_RECORD_PRICE_SQL = """
+    INSERT INTO ingredient_prices(ingredient_id, valid_from, pack_qty, pack_price)
+    VALUES (NEW.id, date('now', 'localtime'), NEW.pack_qty, NEW.pack_price)
+    ON CONFLICT(ingredient_id, valid_from) DO UPDATE SET pack_qty = excluded.pack_qty, pack_price = excluded.pack_price;
+"""
+
+
+def _m8_ingredient_price_history(cur):
+    """Price history per ingredient: one row per (ingredient, valid_from day), kept by triggers.
+
+    ingredients keeps the current price; every insert and every price change
+    is also written here (unless the history already has that price as of
+    today, e.g. after DB.add_ingredient_price), so costs can be computed as
+    of any past date (DB.compute_all_costs_as_of). The primary key doubles as
+    the as-of index: the price at a date is one seek to the last
+    valid_from <= date. Existing ingredients start their history with the
+    current price as of today.
+    """
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ingredient_prices (
+            ingredient_id INTEGER NOT NULL,
+            valid_from TEXT NOT NULL,
+            pack_qty REAL NOT NULL,
+            pack_price REAL NOT NULL,
+            PRIMARY KEY (ingredient_id, valid_from),
+            FOREIGN KEY(ingredient_id) REFERENCES ingredients(id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+        """
+    )
+    cur.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_ip_ingredient_ins AFTER INSERT ON ingredients BEGIN {_RECORD_PRICE_SQL} END;"
+    )
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_ip_ingredient_price AFTER UPDATE OF pack_qty, pack_price ON ingredients
+        WHEN (OLD.pack_qty IS NOT NEW.pack_qty OR OLD.pack_price IS NOT NEW.pack_price)
+        AND NOT EXISTS (
+            SELECT 1 FROM (
+                SELECT pack_qty, pack_price FROM ingredient_prices
+                WHERE ingredient_id = NEW.id AND valid_from <= date('now', 'localtime')
+                ORDER BY valid_from DESC LIMIT 1
+            ) h
+            WHERE h.pack_qty = NEW.pack_qty AND h.pack_price = NEW.pack_price
+        )
+        BEGIN {_RECORD_PRICE_SQL} END;
+        """
+    )
+    cur.execute(
+        """
+        INSERT OR IGNORE INTO ingredient_prices(ingredient_id, valid_from, pack_qty, pack_price)
+        SELECT id, date('now', 'localtime'), pack_qty, pack_price FROM ingredients;
+        """
+    )
+
+
+# Triggers of migration 9 keeping product_costs in sync with the sub-recipes
+_COMPONENT_TRIGGERS = [
+    ("trg_pc_components_ins", "AFTER INSERT ON product_components", "product_id = NEW.product_id"),
+    ("trg_pc_components_upd", "AFTER UPDATE ON product_components", "product_id IN (OLD.product_id, NEW.product_id)"),
+    ("trg_pc_components_del", "AFTER DELETE ON product_components", "product_id = OLD.product_id"),
+    # a changed cost moves on to the products containing it; level by level,
+    # which needs PRAGMA recursive_triggers (set by DB)
+    (
+        "trg_pc_component_cost",
+        "AFTER UPDATE OF cost ON product_costs WHEN OLD.cost IS NOT NEW.cost",
+        "product_id IN (SELECT product_id FROM product_components WHERE component_id = NEW.product_id)",
+    ),
+]
+
+
+def _m9_product_components(cur):
+    """Products as components of other products (sub-recipes: syrups, batches, prepared bases).
+
+    qty counts units of the component product, costed at its own product
+    cost. The cost triggers are recreated with the component term; cycles
+    are refused by DB.add_product_component, as triggers can't run the
+    recursive query needed to find them.
+    """
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS product_components (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            component_id INTEGER NOT NULL,
+            qty REAL NOT NULL,
+            CHECK (component_id <> product_id),
+            FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE,
+            FOREIGN KEY(component_id) REFERENCES products(id) ON DELETE RESTRICT
+        );
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_product_components_product "
+        "ON product_components(product_id, component_id, qty);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_product_components_component ON product_components(component_id, product_id);"
+    )
+
+    _recreate_cost_triggers(cur, 9)
+
+
+# Since migration 10 the ingredient cost triggers follow the stored unit price
+_UNIT_PRICE_EVENT = "AFTER UPDATE OF unit_price ON ingredients"
+
+
+def _recreate_cost_triggers(cur, version: int):
+    """Drop and recreate the cost triggers (all but the sale price one, see migration 6) for schema `version`."""
+    for name, event, where in _COST_TRIGGERS + _COMPONENT_TRIGGERS:
+        if name == "trg_pc_product_price":
+            continue  # migration 6: only profit and margin
+        when = ""
+        if name == "trg_pc_ingredient_price":
+            when = _WHEN_NOT_DEFERRED
+            if version >= 10:
+                event = _UNIT_PRICE_EVENT
+        body = "".join(f"{stmt};" for stmt in _refresh_costs_sql(where, version))
+        cur.execute(f"DROP TRIGGER IF EXISTS {name};")
+        cur.execute(f"CREATE TRIGGER {name} {event} {when} BEGIN {body} END;")
+
+
+def _unit_price_sql(row: str) -> str:
+    """SQL for the price per base unit of the ingredient `row` (e.g. "NEW"), via the units table."""
+    return (
+        f"CASE WHEN {row}.pack_qty THEN {row}.pack_price / ({row}.pack_qty * "
+        f"COALESCE((SELECT factor FROM units WHERE unit = {row}.unit), 1.0)) ELSE 0.0 END"
+    )
+
+
+def _m10_unit_conversion(cur):
+    """Unit families (l/cl/ml, kg/g, Stk) and a stored price per base unit.
+
+    units mirrors we.units.UNITS. ingredients.unit_price (and the same column
+    in the price history) is the pack price per base unit, kept by triggers,
+    so every cost query multiplies base quantities by it without converting
+    per row; the cost triggers now fire on changes of unit_price. Recipe lines
+    keep qty in base units, product_items.unit only remembers the unit it was
+    entered in (NULL: the ingredient's unit). Existing data is all base units
+    already, so quantities need no conversion.
+    """
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS units (
+            unit TEXT PRIMARY KEY,
+            base_unit TEXT NOT NULL,
+            factor REAL NOT NULL
+        ) WITHOUT ROWID;
+        """
+    )
+    cur.executemany(
+        "INSERT OR REPLACE INTO units(unit, base_unit, factor) VALUES (?, ?, ?);",
+        [(unit, base, factor) for unit, (base, factor) in UNITS.items()],
+    )
+    for table, column, decl in (
+        ("ingredients", "unit_price", "REAL NOT NULL DEFAULT 0.0"),
+        ("ingredient_prices", "unit_price", "REAL NOT NULL DEFAULT 0.0"),
+        ("product_items", "unit", "TEXT"),
+    ):
+        cur.execute(f"PRAGMA table_info({table});")
+        if column not in {row[1] for row in cur.fetchall()}:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl};")
+
+    unit_price = _unit_price_sql("NEW")
+    cur.execute(f"UPDATE ingredients SET unit_price = {_unit_price_sql('ingredients')};")
+    cur.execute(
+        """
+        UPDATE ingredient_prices SET unit_price = CASE WHEN pack_qty THEN pack_price / (pack_qty * COALESCE((
+            SELECT u.factor FROM ingredients i JOIN units u ON u.unit = i.unit WHERE i.id = ingredient_prices.ingredient_id
+        ), 1.0)) ELSE 0.0 END;
+        """
+    )
+    for name, event in (
+        ("trg_ing_unit_price_ins", "AFTER INSERT ON ingredients"),
+        ("trg_ing_unit_price_upd", "AFTER UPDATE OF unit, pack_qty, pack_price ON ingredients"),
+    ):
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {name} {event}
+            WHEN NEW.unit_price IS NOT ({unit_price})
+            BEGIN
+                UPDATE ingredients SET unit_price = {unit_price} WHERE id = NEW.id;
+            END;
+            """
+        )
+
+    _recreate_cost_triggers(cur, 10)
+    cur.execute("DROP TRIGGER IF EXISTS trg_pc_ingredient_price_deferred;")
+    cur.execute(
+        f"""
+        CREATE TRIGGER trg_pc_ingredient_price_deferred {_UNIT_PRICE_EVENT}
+        WHEN EXISTS (SELECT 1 FROM cost_refresh_deferred)
+        BEGIN {_NOTE_PENDING_SQL} END;
+        """
+    )
+
+    # price history: as migration 8, plus the unit price (and unit changes)
+    record = f"""
+        INSERT INTO ingredient_prices(ingredient_id, valid_from, pack_qty, pack_price, unit_price)
+        VALUES (NEW.id, date('now', 'localtime'), NEW.pack_qty, NEW.pack_price, {unit_price})
+        ON CONFLICT(ingredient_id, valid_from) DO UPDATE SET
+            pack_qty = excluded.pack_qty, pack_price = excluded.pack_price, unit_price = excluded.unit_price;
+    """
+    cur.execute("DROP TRIGGER IF EXISTS trg_ip_ingredient_ins;")
+    cur.execute(f"CREATE TRIGGER trg_ip_ingredient_ins AFTER INSERT ON ingredients BEGIN {record} END;")
+    cur.execute("DROP TRIGGER IF EXISTS trg_ip_ingredient_price;")
+    cur.execute(
+        f"""
+        CREATE TRIGGER trg_ip_ingredient_price AFTER UPDATE OF unit, pack_qty, pack_price ON ingredients
+        WHEN (OLD.unit IS NOT NEW.unit OR OLD.pack_qty IS NOT NEW.pack_qty OR OLD.pack_price IS NOT NEW.pack_price)
+        AND NOT EXISTS (
+            SELECT 1 FROM (
+                SELECT pack_qty, pack_price, unit_price FROM ingredient_prices
+                WHERE ingredient_id = NEW.id AND valid_from <= date('now', 'localtime')
+                ORDER BY valid_from DESC LIMIT 1
+            ) h
+            WHERE h.pack_qty = NEW.pack_qty AND h.pack_price = NEW.pack_price AND h.unit_price = ({unit_price})
+        )
+        BEGIN {record} END;
+        """
+    )
+
+
+MIGRATIONS = [
+    _m1_base_tables,
+    _m2_product_costs,
+    _m3_fk_indexes,
+    _m4_name_search,
+    _m5_product_sort_indexes,
+    _m6_sale_price_trigger,
+    _m7_deferred_ingredient_costs,
+    _m8_ingredient_price_history,
+    _m9_product_components,
+    _m10_unit_conversion,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn) -> int:
+    """Apply pending migrations, one transaction per version. Returns the resulting version."""
+    version = conn.execute("PRAGMA user_version;").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return version
+
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN;")
+            MIGRATIONS[target - 1](cur)
+            cur.execute(f"PRAGMA user_version = {target};")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return SCHEMA_VERSION
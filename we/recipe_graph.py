@@ -0,0 +1,58 @@
+"""Products used as components of other products (sub-recipes).
+
+A product_components line "P contains qty x C" makes the recipes a directed
+acyclic graph: cost(P) = own recipe lines + sum(qty * cost(C)). Cycles are
+refused on insert (DB.add_product_component); the helpers here still skip a
+back edge instead of looping forever should one be in the data.
+"""
+
+from collections import defaultdict
+
+
+def topological_order(roots, children):
+    """Nodes reachable from `roots`, every node after all of its children (`children(node)` -> nodes)."""
+    order = []
+    done = set()
+    active = set()  # on the current DFS path
+    for root in roots:
+        if root in done:
+            continue
+        stack = [(root, iter(children(root)))]
+        active.add(root)
+        while stack:
+            node, it = stack[-1]
+            for child in it:
+                if child not in done and child not in active:
+                    active.add(child)
+                    stack.append((child, iter(children(child))))
+                    break
+            else:
+                stack.pop()
+                active.discard(node)
+                done.add(node)
+                order.append(node)
+    return order
+
+
+def flatten_lines(pids, lines, components):
+    """{pid: [(ing_id, qty)]} with the component products expanded into their ingredients.
+
+    `lines(pid)` gives a product's own (ing_id, qty) lines, `components` maps
+    pid -> [(component_pid, qty)]. Each product is expanded once, children
+    first, and reused by every product containing it.
+    """
+    flat = {}
+    for pid in topological_order(pids, lambda p: [c for c, _qty in components.get(p, ())]):
+        own = lines(pid)
+        parts = components.get(pid)
+        if not parts:
+            flat[pid] = own
+            continue
+        merged = defaultdict(float)
+        for ing_id, qty in own:
+            merged[ing_id] += qty
+        for component_id, factor in parts:
+            for ing_id, qty in flat.get(component_id, ()):
+                merged[ing_id] += factor * qty
+        flat[pid] = list(merged.items())
+    return flat
@@ -0,0 +1,156 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+from .config import BG
+from .events import PRODUCT_CHANGED
+from .repricing import DEFAULT_ROUNDING, ROUNDINGS, plan_repricing
+from .ui_helpers import VirtualTreeview
+from .utils import money, safe_float
+
+COLUMNS = (
+    ("name", "Produkt", 260, "w"),
+    ("cost", "Kosten", 90, "e"),
+    ("old_price", "VK alt", 90, "e"),
+    ("new_price", "VK neu", 90, "e"),
+    ("old_margin", "Marge alt", 80, "e"),
+    ("new_margin", "Marge neu", 80, "e"),
+)
+
+
+class RepriceDialog:
+    """Set the sale prices of many products to a target margin: preview, then apply in one transaction."""
+
+    def __init__(self, app, db, events, query=""):
+        self.app = app
+        self.db = db  # DBWorker
+        self.events = events
+        self._plan = []
+        self._seq = 0
+
+        self.win = tk.Toplevel(app, bg=BG)
+        self.win.title("Preise nach Zielmarge")
+        self.win.geometry("820x540")
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        form = ttk.Frame(self.win, padding=(10, 10, 10, 0))
+        form.pack(fill="x")
+
+        ttk.Label(form, text="Produkte mit:").grid(row=0, column=0, sticky="w")
+        self.query_var = tk.StringVar(value=query)
+        ttk.Entry(form, textvariable=self.query_var, width=24).grid(row=0, column=1, sticky="we", padx=(6, 12))
+
+        ttk.Label(form, text="Zielmarge (%):").grid(row=0, column=2, sticky="w")
+        self.margin_var = tk.StringVar(value="70")
+        margin_entry = ttk.Entry(form, textvariable=self.margin_var, width=8)
+        margin_entry.grid(row=0, column=3, sticky="w", padx=(6, 12))
+
+        ttk.Label(form, text="Rundung:").grid(row=0, column=4, sticky="w")
+        self.rounding_var = tk.StringVar(value=DEFAULT_ROUNDING)
+        ttk.Combobox(
+            form, textvariable=self.rounding_var, values=list(ROUNDINGS), state="readonly", width=7
+        ).grid(row=0, column=5, sticky="w", padx=(6, 0))
+        form.columnconfigure(1, weight=1)
+
+        self.only_below = tk.BooleanVar(value=True)
+        ttk.Checkbutton(form, text="nur Produkte unter der Zielmarge oder ohne Preis", variable=self.only_below).grid(
+            row=1, column=0, columnspan=4, sticky="w", pady=(6, 0)
+        )
+
+        bar = ttk.Frame(self.win, padding=(10, 8, 10, 0))
+        bar.pack(fill="x")
+        ttk.Button(bar, text="Vorschau", command=self.preview).pack(side="left")
+        self.apply_button = ttk.Button(bar, text="Übernehmen", command=self.apply, state="disabled")
+        self.apply_button.pack(side="left", padx=(6, 0))
+        self.status = ttk.Label(bar, text="")
+        self.status.pack(side="right")
+
+        body = ttk.Frame(self.win, padding=10)
+        body.pack(fill="both", expand=True)
+        self.tree = VirtualTreeview(body, columns=[c[0] for c in COLUMNS], show="headings", selectmode="browse")
+        for col, text, width, anchor in COLUMNS:
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width, anchor=anchor)
+        self.tree.pack(side="left", fill="both", expand=True)
+        sb = ttk.Scrollbar(body, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscroll=sb.set)
+        sb.pack(side="right", fill="y")
+
+        margin_entry.bind("<Return>", lambda _e: self.preview())
+        margin_entry.focus_set()
+        margin_entry.select_range(0, tk.END)
+
+    def _show_plan(self, plan):
+        self._plan = plan
+        self.tree.set_rows(plan, values_of=_values)
+        self.apply_button.config(state="normal" if plan else "disabled")
+
+    def preview(self):
+        margin = safe_float(self.margin_var.get())
+        if margin is None:
+            messagebox.showerror("Fehler", "Bitte eine Zielmarge in % angeben.", parent=self.win)
+            return
+        query = self.query_var.get().strip()
+        rounding = self.rounding_var.get()
+        only_below = self.only_below.get()
+
+        self._seq += 1
+        seq = self._seq
+        self._show_plan([])
+        self.status.config(text="Berechne …")
+
+        def _done(plan):
+            if seq != self._seq or not self.win.winfo_exists():
+                return
+            self._show_plan(plan)
+            self.status.config(text=f"{len(plan)} Preise würden geändert.")
+
+        def _error(exc):
+            if seq != self._seq or not self.win.winfo_exists():
+                return
+            self.status.config(text="")
+            messagebox.showerror("Fehler", str(exc), parent=self.win)
+
+        self.db.submit(lambda db: plan_repricing(db, margin, rounding, query, only_below), on_done=_done, on_error=_error)
+
+    def apply(self):
+        plan = self._plan
+        if not plan:
+            return
+        if not messagebox.askyesno("Bestätigen", f"{len(plan)} Verkaufspreise übernehmen?", parent=self.win):
+            return
+
+        self._seq += 1  # a preview still running is outdated now
+        self._show_plan([])
+        self.status.config(text="Speichere …")
+        prices = [(pid, new_price) for pid, _name, _cost, _old, new_price, _om, _nm in plan]
+
+        def _done(count):
+            self.events.emit(PRODUCT_CHANGED, None)  # one list refresh for all of them
+            if self.win.winfo_exists():
+                self.status.config(text=f"{count} Verkaufspreise gespeichert.")
+
+        self.db.submit(lambda db: db.set_sale_prices(prices), on_done=_done)
+
+    def close(self):
+        self.win.destroy()
+        self.app.reprice_dialog = None
+
+
+def _values(row):
+    _pid, name, cost, old_price, new_price, old_margin, new_margin = row
+    return (
+        name,
+        money(cost),
+        money(old_price) if old_price is not None else "–",
+        money(new_price),
+        f"{old_margin:.1f} %" if old_margin is not None else "–",
+        f"{new_margin:.1f} %",
+    )
+
+
+def open_dialog(app, db, events, query=""):
+    """Open the dialog, or raise it if it is already open."""
+    if getattr(app, "reprice_dialog", None) is not None:
+        app.reprice_dialog.win.lift()
+    else:
+        app.reprice_dialog = RepriceDialog(app, db, events, query)
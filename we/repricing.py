@@ -0,0 +1,58 @@
+"""Batch repricing: sale prices that reach a target margin, rounded to price points.
+
+plan_repricing() only computes a preview; DB.set_sale_prices() applies it in
+one transaction.
+"""
+
+from math import ceil
+
+from .utils import profit_margin
+
+# rounding name -> (step, ending) in cents; prices are always rounded up, so the
+# target margin is reached or exceeded
+ROUNDINGS = {
+    "0,01": (1, 0),
+    "0,10": (10, 0),
+    "0,50": (50, 0),
+    "x,00": (100, 0),
+    "x,50": (100, 50),
+    "x,90": (100, 90),
+    "x,99": (100, 99),
+}
+DEFAULT_ROUNDING = "0,01"
+
+
+def target_price(cost: float, margin_pct: float) -> float:
+    """Sale price at which `cost` leaves `margin_pct` % margin."""
+    if not 0 <= margin_pct < 100:
+        raise ValueError("Zielmarge muss zwischen 0 und unter 100 % liegen.")
+    return cost / (1.0 - margin_pct / 100.0)
+
+
+def round_price(price: float, rounding: str = DEFAULT_ROUNDING) -> float:
+    """Smallest price >= `price` on the grid of `rounding` (e.g. 4.12 -> 4.90 for 'x,90')."""
+    step, ending = ROUNDINGS[rounding]
+    cents = ceil(round(price * 100.0, 6))  # 4.1200000001 must not become 4.13
+    k = max(0, ceil((cents - ending) / step))
+    return (k * step + ending) / 100.0
+
+
+def plan_repricing(db, margin_pct: float, rounding: str = DEFAULT_ROUNDING, query: str = "", only_below: bool = False):
+    """Preview rows (pid, name, cost, old_price, new_price, old_margin, new_margin), by name.
+
+    Covers the products whose name contains `query` (same search as the product
+    list), optionally only those below the target margin or without a price.
+    Products without cost (no recipe) and unchanged prices are left out.
+    """
+    target_price(0.0, margin_pct)  # validates the margin
+    plan = []
+    for pid, name, cost, sale_price, _profit, margin in db.search_products(query):
+        if cost <= 0:
+            continue
+        if only_below and margin is not None and margin >= margin_pct:
+            continue
+        new_price = round_price(target_price(cost, margin_pct), rounding)
+        if sale_price is not None and abs(new_price - sale_price) < 0.005:
+            continue
+        plan.append((pid, name, cost, sale_price, new_price, margin, profit_margin(cost, new_price)[1]))
+    return plan
@@ -0,0 +1,70 @@
+import itertools
+import re
+from bisect import bisect_left
+
+
+class PrefixIndex:
+    """Casefolded, sorted name keys for logarithmic prefix lookups (bisect).
+
+    `complete(prefix, limit)` returns the first `limit` names starting with
+    `prefix`. `resolve(typed)` maps user input to one name: an exact
+    (case-insensitive) match, else the only name that the input starts, or
+    one of whose words it starts.
+    """
+
+    _END = "\U0010ffff"  # sorts after every character a prefix can continue with
+
+    def __init__(self, names=()):
+        self.build(names)
+
+    def build(self, names):
+        self.names = list(names)
+        self._exact = {}
+        for n in self.names:
+            self._exact.setdefault(n.casefold(), n)
+        entries = sorted((n.casefold(), n) for n in self._exact.values())
+        self._keys = [k for k, _n in entries]
+        self._sorted = [n for _k, n in entries]
+
+        # every word start ("rote zwiebel" -> "zwiebel") for resolving fragments
+        words = []
+        for key, n in entries:
+            words.append((key, n))
+            words.extend((key[m.start():], n) for m in _WORD_START.finditer(key) if m.start())
+        words.sort()
+        self._word_keys = [k for k, _n in words]
+        self._word_names = [n for _k, n in words]
+
+    def __len__(self):
+        return len(self._keys)
+
+    @classmethod
+    def _range(cls, keys, prefix: str):
+        return bisect_left(keys, prefix), bisect_left(keys, prefix + cls._END)
+
+    def complete(self, prefix: str, limit=None) -> list:
+        p = (prefix or "").strip().casefold()
+        lo, hi = self._range(self._keys, p)
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return self._sorted[lo:hi]
+
+    def resolve(self, typed: str):
+        t = (typed or "").strip().casefold()
+        if not t:
+            return None
+        exact = self._exact.get(t)
+        if exact is not None:
+            return exact
+
+        lo, hi = self._range(self._word_keys, t)
+        found = None
+        for n in itertools.islice(self._word_names, lo, hi):
+            if found is None:
+                found = n
+            elif n != found:
+                return None  # ambiguous
+        return found
+
+
+_WORD_START = re.compile(r"\b\w")
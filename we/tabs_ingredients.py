@@ -1,26 +1,30 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-
-from .config import PAGE_SIZE
-from .ui_helpers import UIHelpers
+from tkinter import ttk, filedialog, messagebox
+
+from .config import SEARCH_DEBOUNCE_MS
+from .events import INGREDIENT_CHANGED
+from .exporter import export_file
+from .importer import import_price_list_file
+from .ui_helpers import UIHelpers, VirtualTreeview
+from .units import UNITS
 from .utils import money, safe_float
 
 
 class IngredientsTab(UIHelpers):
-    def __init__(self, app, parent, db, on_any_change):
+    def __init__(self, app, parent, db, events):
         self.app = app
         self.parent = parent
-        self.db = db
-        self.on_any_change = on_any_change  # callback to refresh products costs
+        self.db = db  # DBWorker: calls are queued, results arrive via callbacks
+        self.events = events  # EventBus: emits ingredient_changed, reloads the list on it
         self.ing_filter = ""
-        self.ing_offset = 0
-        self._ingredients_rows = []
+        self._search_seq = 0  # id of the newest list query; older results are dropped
         # "secret" buffer: remember last used unit but keep the Unit entry visually empty if desired
         self._unit_buffer = "ml"
         self._suppress_on_select = False
         self._suppress_autoselect_once = False
-        self._allowed_units = {"ml", "g", "stk"}
+        self._allowed_units = set(UNITS)
         self._build()
+        self.events.subscribe(INGREDIENT_CHANGED, lambda _ids: self.refresh())
 
     def _build(self):
         top_outer = tk.Frame(self.parent, bg=self.app["bg"], bd=0, highlightthickness=0)
@@ -30,7 +34,7 @@ class IngredientsTab(UIHelpers):
         top.pack(fill="x")
 
         ttk.Label(top, text="Zutat").grid(row=0, column=0, sticky="w")
-        ttk.Label(top, text="Einheit (ml/g/Stk)").grid(row=0, column=1, sticky="w")
+        ttk.Label(top, text="Einheit (ml/cl/l, g/kg, Stk)").grid(row=0, column=1, sticky="w")
         ttk.Label(top, text="Packungsmenge").grid(row=0, column=2, sticky="w")
         ttk.Label(top, text="Packungspreis (€)").grid(row=0, column=3, sticky="w")
 
@@ -55,8 +59,12 @@ class IngredientsTab(UIHelpers):
             row=1, column=4, padx=(0, 10), pady=5
         )
         ttk.Button(top, text="Zutat löschen", command=self.delete_selected).grid(row=1, column=5, pady=5)
+        ttk.Button(top, text="Preisliste importieren …", command=self.import_price_list).grid(
+            row=1, column=6, padx=(10, 0), pady=5
+        )
+        ttk.Button(top, text="Exportieren …", command=self.export_book).grid(row=1, column=7, padx=(6, 0), pady=5)
 
-        # Search + paging
+        # Search + row count
         search_row = ttk.Frame(top_outer, padding=(10, 0, 10, 6))
         search_row.pack(fill="x")
 
@@ -64,22 +72,23 @@ class IngredientsTab(UIHelpers):
         self.ing_search_var = tk.StringVar()
         self.ing_search_entry = ttk.Entry(search_row, textvariable=self.ing_search_var, width=30)
         self.ing_search_entry.pack(side="left", padx=(8, 12))
-        self.ing_search_entry.bind("<KeyRelease>", lambda _e: self._on_search_changed())
+        self.ing_search_entry.bind(
+            "<KeyRelease>", lambda _e: self._debounce("ing_search", SEARCH_DEBOUNCE_MS, self._on_search_changed)
+        )
         # keyboard: from search into list
         self.ing_search_entry.bind("<Down>", lambda _e: (self._tree_move_selection(self.ing_tree, +1), "break")[1])
         self.ing_search_entry.bind("<Up>", lambda _e: (self._tree_move_selection(self.ing_tree, -1), "break")[1])
         self.ing_search_entry.bind("<Return>", self._focus_ingredients_tree_from_search)
 
-        self.ing_page_label = ttk.Label(search_row, text="")
-        self.ing_page_label.pack(side="right")
-        ttk.Button(search_row, text="Weiter ▶", command=lambda: self._page(+1)).pack(side="right", padx=(6, 0))
-        ttk.Button(search_row, text="◀ Zurück", command=lambda: self._page(-1)).pack(side="right")
+        self.ing_count_label = ttk.Label(search_row, text="")
+        self.ing_count_label.pack(side="right")
 
         mid = ttk.Frame(top_outer, padding=(10, 0, 10, 10))
         mid.pack(fill="both", expand=True)
 
         cols = ("name", "unit", "pack_qty", "pack_price", "unit_price")
-        self.ing_tree = ttk.Treeview(mid, columns=cols, show="headings", height=18, selectmode="browse")
+        # only the visible rows exist as Tk items; scrolling covers the full list
+        self.ing_tree = VirtualTreeview(mid, columns=cols, show="headings", height=18, selectmode="browse")
         self.ing_tree.heading("name", text="Name")
         self.ing_tree.heading("unit", text="Einheit")
         self.ing_tree.heading("pack_qty", text="Packungsmenge")
@@ -166,10 +175,8 @@ class IngredientsTab(UIHelpers):
             w.bind("<Left>", _on_left)
             w.bind("<Right>", _on_right)
 
-        # Enter on list -> focus form, PageUp/PageDown -> paging
+        # Enter on list -> focus form (PageUp/PageDown scroll inside the virtual list)
         self.ing_tree.bind("<Return>", self._focus_form_from_ingredients_tree)
-        self.ing_tree.bind("<Next>", lambda _e: (self._page(+1), self._select_first_in_tree(), "break")[2])  # PageDown
-        self.ing_tree.bind("<Prior>", lambda _e: (self._page(-1), self._select_first_in_tree(), "break")[2])  # PageUp
 
     def _select_first_in_tree(self):
         items = self.ing_tree.get_children()
@@ -208,66 +215,53 @@ class IngredientsTab(UIHelpers):
         except Exception:
             pass
 
-    def refresh(self):
-        self._ingredients_rows = self.db.list_ingredients()
-        self._render()
-
-    def _render(self):
-        for r in self.ing_tree.get_children():
-            self.ing_tree.delete(r)
-
-        rows = list(self._ingredients_rows)
-        f = (self.ing_filter or "").strip().lower()
-        if f:
-            rows = [r for r in rows if f in (r[1] or "").lower()]
-
-        total = len(rows)
-        if total <= PAGE_SIZE:
-            self.ing_offset = 0
-        else:
-            self.ing_offset = max(0, min(self.ing_offset, max(0, total - PAGE_SIZE)))
-
-        page = rows[self.ing_offset : self.ing_offset + PAGE_SIZE]
-        for _id, name, unit, pack_qty, pack_price in page:
-            unit_price = (pack_price / pack_qty) if pack_qty else 0.0
-            self.ing_tree.insert(
-                "",
-                "end",
-                iid=str(_id),
-                values=(name, unit, f"{pack_qty:g}", money(pack_price), f"{unit_price:.4f} €/{unit}"),
-            )
+    def refresh(self, scroll_top: bool = False):
+        """Re-query the count for the current search; the tree loads the rows page by page.
 
-        # Ensure selection for keyboard navigation (can be suppressed once)
-        items = self.ing_tree.get_children()
-        if getattr(self, "_suppress_autoselect_once", False):
-            # keep list unselected so the form stays empty for fast entry
-            self._suppress_autoselect_once = False
-        elif items and not self.ing_tree.selection():
-            first = items[0]
-            self.ing_tree.selection_set(first)
-            self.ing_tree.focus(first)
-            self.ing_tree.see(first)
-
-        start = self.ing_offset + 1 if total else 0
-        end = min(self.ing_offset + PAGE_SIZE, total)
-        self.ing_page_label.config(text=f"{start}–{end} von {total}")
+        Substring search runs on the DB's trigram index; the selected ingredient
+        stays selected if it still matches.
+        """
+        query = self.ing_filter
+        sel = self.ing_tree.selection()
+        wanted = int(sel[0]) if sel else None
+        self._search_seq += 1
+        seq = self._search_seq
+
+        def _count(db):
+            pos = db.ingredient_position(wanted, query) if wanted is not None else None
+            return db.count_ingredients(query), pos
+
+        def _fetch(start, count, _prev_row, done):
+            self.db.call("search_ingredients", query, count, start, on_done=done)
+
+        def _done(result):
+            if seq != self._search_seq:
+                return  # a newer search is already queued
+            total, pos = result
+            if scroll_top:
+                self.ing_tree.yview_moveto(0)
+            self.ing_tree.set_provider(total, _fetch, values_of=_ingredient_values, on_ready=self._autoselect)
+            self.ing_count_label.config(text=f"{total} Zutaten")
+            if pos is not None:
+                self.ing_tree.select_index(pos)  # once its page is loaded
+            elif self.ing_tree.selection():
+                self.ing_tree.selection_set()  # deleted or filtered out
+
+        self.db.submit(_count, on_done=_done)
+
+    def _autoselect(self):
+        # Ensure selection for keyboard navigation. Suppressed after add/update so the
+        # form stays empty for fast entry, until the next search (refreshes are async).
+        if self.ing_tree.row_count() and not self.ing_tree.selection() and not self._suppress_autoselect_once:
+            self.ing_tree.select_index(0)
 
     def _on_search_changed(self):
-        self.ing_filter = (self.ing_search_var.get() or "").strip()
-        self.ing_offset = 0
-        self._render()
-
-    def _page(self, direction: int):
-        rows = list(self._ingredients_rows)
-        f = (self.ing_filter or "").strip().lower()
-        if f:
-            rows = [r for r in rows if f in (r[1] or "").lower()]
-        total = len(rows)
-        if total <= PAGE_SIZE:
-            self.ing_offset = 0
-        else:
-            self.ing_offset = max(0, min(self.ing_offset + direction * PAGE_SIZE, max(0, total - PAGE_SIZE)))
-        self._render()
+        query = (self.ing_search_var.get() or "").strip()
+        if query == self.ing_filter:
+            return  # e.g. cursor keys
+        self.ing_filter = query
+        self._suppress_autoselect_once = False
+        self.refresh(scroll_top=True)
 
     def on_select(self, _):
         if getattr(self, "_suppress_on_select", False):
@@ -290,8 +284,8 @@ class IngredientsTab(UIHelpers):
         else:
             unit = unit_raw.lower()
 
-        if unit not in getattr(self, "_allowed_units", {"ml", "g", "stk"}):
-            messagebox.showerror("Fehler", "Einheit muss ml, g oder Stk sein.")
+        if unit not in getattr(self, "_allowed_units", set(UNITS)):
+            messagebox.showerror("Fehler", f"Einheit muss eine von {', '.join(UNITS)} sein.")
             return
 
         # update buffer with normalized unit
@@ -310,7 +304,12 @@ class IngredientsTab(UIHelpers):
             messagebox.showerror("Fehler", "Packungspreis darf nicht negativ sein.")
             return
 
-        self.db.upsert_ingredient(name, unit, pack_qty, pack_price)
+        def _save(db):
+            db.upsert_ingredient(name, unit, pack_qty, pack_price)
+            return db.get_ingredient_id_by_name(name)
+
+        # queued write; subscribers (this list, product costs) refresh once it is done
+        self.db.submit(_save, on_done=lambda ing_id: self.events.emit(INGREDIENT_CHANGED, ing_id))
 
         # Normalize the visible unit field (even if it will be cleared below)
         try:
@@ -329,13 +328,9 @@ class IngredientsTab(UIHelpers):
         self.ing_pack_qty.set("")
         self.ing_pack_price.set("")
 
-        # ensure list is unselected before/after refresh
-        self._clear_tree_selection()
-        self.refresh()
-        # clear any selection/focus that might still exist so the form stays empty
+        # ensure list is unselected; the (async) refresh renders with auto-select suppressed
         self._clear_tree_selection()
 
-        self.on_any_change()
         try:
             self.ing_name_entry.focus_set()
         except Exception:
@@ -350,6 +345,51 @@ class IngredientsTab(UIHelpers):
         except Exception:
             _reenable()
 
+    def import_price_list(self):
+        path = filedialog.askopenfilename(
+            title="Preisliste importieren",
+            filetypes=[("CSV-Dateien", "*.csv *.txt"), ("Alle Dateien", "*")],
+        )
+        if not path:
+            return
+
+        def _done(report):
+            # one event for the whole list: one refresh of this list and of the product costs
+            self.events.emit(INGREDIENT_CHANGED, None)
+            text = (
+                f"{report['inserted']} neu, {report['updated']} aktualisiert, "
+                f"{report['unchanged']} unverändert, {len(report['rejected'])} abgelehnt."
+            )
+            rejected = report["rejected"]
+            if rejected:
+                text += "\n\n" + "\n".join(f"Zeile {line}: {reason}" for line, reason in rejected[:15])
+                if len(rejected) > 15:
+                    text += f"\n… und {len(rejected) - 15} weitere"
+            messagebox.showinfo("Import", text)
+
+        def _error(exc):
+            messagebox.showerror("Fehler", f"Import fehlgeschlagen, nichts wurde gespeichert:\n{exc}")
+
+        self.db.submit(lambda db: import_price_list_file(db, path), on_done=_done, on_error=_error)
+
+    def export_book(self):
+        path = filedialog.asksaveasfilename(
+            title="Kalkulation exportieren",
+            defaultextension=".jsonl",
+            initialfile="kalkulation.jsonl",
+            filetypes=[("JSON Lines", "*.jsonl"), ("CSV (eine Datei je Datensatz)", "*.csv")],
+        )
+        if not path:
+            return
+
+        def _done(counts):
+            messagebox.showinfo("Export", "\n".join(f"{name}: {n} Zeilen" for name, n in counts.items()))
+
+        def _error(exc):
+            messagebox.showerror("Fehler", f"Export fehlgeschlagen:\n{exc}")
+
+        self.db.submit(lambda db: export_file(db, path), on_done=_done, on_error=_error)
+
     def delete_selected(self):
         sel = self.ing_tree.selection()
         if not sel:
@@ -361,14 +401,27 @@ class IngredientsTab(UIHelpers):
         if not messagebox.askyesno("Bestätigen", f"Zutat '{name}' wirklich löschen?"):
             return
 
-        if self.db.ingredient_is_used(ing_id):
+        def _delete(db):
+            if db.ingredient_is_used(ing_id):
+                return False
+            db.delete_ingredient(ing_id)
+            return True
+
+        self.db.submit(_delete, on_done=lambda deleted: self._after_delete(ing_id, deleted))
+
+    def _after_delete(self, ing_id: int, deleted: bool):
+        if not deleted:
             messagebox.showerror("Fehler", "Zutat ist in Produkten/Slots verwendet und kann nicht gelöscht werden.")
             return
 
-        self.db.delete_ingredient(ing_id)
-        self.refresh()
-        self.on_any_change()
+        self.events.emit(INGREDIENT_CHANGED, ing_id)
         try:
             self.ing_name_entry.focus_set()
         except Exception:
-            pass
\ No newline at end of file
+            pass
+
+
+def _ingredient_values(row):
+    _id, name, unit, pack_qty, pack_price = row
+    unit_price = (pack_price / pack_qty) if pack_qty else 0.0
+    return (name, unit, f"{pack_qty:g}", money(pack_price), f"{unit_price:.4f} €/{unit}")
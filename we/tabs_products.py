@@ -3,31 +3,42 @@ from tkinter import ttk, messagebox
 
 import webbrowser
 
-from .config import PAGE_SIZE
-from .ui_helpers import UIHelpers
-from .utils import money, safe_float
+from .config import AUTOCOMPLETE_LIMIT, SEARCH_DEBOUNCE_MS
+from .events import INGREDIENT_CHANGED, PRODUCT_CHANGED, RECIPE_CHANGED
+from .db import product_sort_key
+from .search import PrefixIndex
+from .ui_helpers import UIHelpers, VirtualTreeview
+from .units import compatible_units, parse_quantity
+from .utils import money, profit_margin, safe_float
 
 
 class ProductsTab(UIHelpers):
-    def __init__(self, app, parent, db, on_any_change):
+    def __init__(self, app, parent, db, events):
         self.app = app
         self.parent = parent
-        self.db = db
-        self.on_any_change = on_any_change
+        self.db = db  # DBWorker: calls are queued, results arrive via callbacks
+        self.events = events  # EventBus: product/recipe changes out, all three event types in
 
         self.prod_filter = ""
-        self.prod_offset = 0
         self.prod_sort_col = "name"
         self.prod_sort_desc = False
-        self._products_rows = []
+        self._products_seq = 0  # bumped per list reload; stale counts are dropped
 
         self._all_ingredient_names = []
+        self._ingredient_units = {}  # name -> unit, refreshed with the names
+        self._ingredient_index = PrefixIndex()  # autocomplete + resolve over the names
+        self._slot_selections = {}  # slot_name -> ingredient name, for the selected product
+        self._select_after_refresh = None  # pid to select once the product list has reloaded
+        self._product_complete_seq = 0  # bumped per product autocomplete query (sub-recipe mode)
 
         # combobox popdown flags (used so Enter can select from dropdown)
         self._ing_popdown_open = False
         self._slot_popdown_open = False
 
         self._build()
+        self.events.subscribe(INGREDIENT_CHANGED, self._on_ingredients_changed)
+        self.events.subscribe(PRODUCT_CHANGED, self._on_products_changed)
+        self.events.subscribe(RECIPE_CHANGED, self._on_recipes_changed)
 
     # ---------------- build UI ----------------
     def _build(self):
@@ -118,7 +129,9 @@ class ProductsTab(UIHelpers):
         self.prod_search_var = tk.StringVar()
         self.prod_search_entry = ttk.Entry(search_row, textvariable=self.prod_search_var)
         self.prod_search_entry.pack(side="left", padx=(6, 10), fill="x", expand=True)
-        self.prod_search_entry.bind("<KeyRelease>", lambda _e: self._on_prod_search_changed())
+        self.prod_search_entry.bind(
+            "<KeyRelease>", lambda _e: self._debounce("prod_search", SEARCH_DEBOUNCE_MS, self._on_prod_search_changed)
+        )
         self.prod_search_entry.bind("<Down>", self._kb_products_from_search_down)
         self.prod_search_entry.bind("<Up>", self._kb_products_from_search_up)
         self.prod_search_entry.bind("<Return>", self._kb_focus_products_tree_from_search)
@@ -126,16 +139,17 @@ class ProductsTab(UIHelpers):
         right_controls = ttk.Frame(search_row)
         right_controls.pack(side="right")
 
-        self.prod_page_label = ttk.Label(right_controls, text="")
-        self.prod_page_label.pack(side="left", padx=(0, 6))
+        self.prod_count_label = ttk.Label(right_controls, text="")
+        self.prod_count_label.pack(side="left", padx=(0, 6))
+        ttk.Button(right_controls, text="Was-wäre-wenn …", command=self.open_whatif).pack(side="left")
+        ttk.Button(right_controls, text="Preise nach Marge …", command=self.open_reprice).pack(side="left", padx=(6, 0))
 
-        ttk.Button(right_controls, text="◀", width=3, command=lambda: self._page_prod(-1)).pack(side="left")
-        ttk.Button(right_controls, text="▶", width=3, command=lambda: self._page_prod(+1)).pack(
-            side="left", padx=(4, 0)
-        )
+        tree_frame = ttk.Frame(left)
+        tree_frame.pack(fill="both", expand=True)
 
         cols = ("name", "cost", "profit", "margin")
-        self.prod_tree = ttk.Treeview(left, columns=cols, show="headings", height=20, selectmode="browse")
+        # only the visible rows exist as Tk items; scrolling covers the full list
+        self.prod_tree = VirtualTreeview(tree_frame, columns=cols, show="headings", height=20, selectmode="browse")
 
         self.prod_tree.heading("name", text="Produkt", command=lambda: self.sort_products_by("name"))
         self.prod_tree.heading("cost", text="Kosten (WE)", command=lambda: self.sort_products_by("cost"))
@@ -147,15 +161,16 @@ class ProductsTab(UIHelpers):
         self.prod_tree.column("profit", width=110, anchor="e")
         self.prod_tree.column("margin", width=90, anchor="e")
 
-        self.prod_tree.pack(fill="both", expand=True)
+        self.prod_tree.pack(side="left", fill="both", expand=True)
+        prod_sb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.prod_tree.yview)
+        self.prod_tree.configure(yscroll=prod_sb.set)
+        prod_sb.pack(side="right", fill="y")
         self.prod_tree.bind("<<TreeviewSelect>>", self.on_select_product)
         # Persist column widths
         self.persist_tree_columns(self.prod_tree, "tree.prod", ["name", "cost", "profit", "margin"])
 
         # IMPORTANT: no Up/Down bindings on Treeview itself -> avoid double-step.
         self.prod_tree.bind("<Return>", self._kb_focus_recipe_from_product_tree)
-        self.prod_tree.bind("<Next>", self._kb_products_pagedown)    # PageDown
-        self.prod_tree.bind("<Prior>", self._kb_products_pageup)     # PageUp
         self.prod_tree.bind("<Delete>", self._kb_delete_selected_product)
         self.prod_tree.bind("<BackSpace>", self._kb_delete_selected_product)
 
@@ -194,6 +209,9 @@ class ProductsTab(UIHelpers):
         ttk.Radiobutton(
             mode_row, text="Template-Slot", variable=self.add_mode, value="SLOT", command=self.on_add_mode_changed
         ).pack(side="left", padx=(10, 0))
+        ttk.Radiobutton(
+            mode_row, text="Produkt (Teilrezept)", variable=self.add_mode, value="PROD", command=self.on_add_mode_changed
+        ).pack(side="left", padx=(10, 0))
 
         recipe_top = ttk.Frame(right)
         recipe_top.pack(fill="x", pady=(0, 8))
@@ -341,6 +359,13 @@ class ProductsTab(UIHelpers):
 
     # ---------------- keyboard helpers ----------------
     def _select_first_in_tree(self, tree: ttk.Treeview):
+        if isinstance(tree, VirtualTreeview):
+            tree.select_index(0)
+            try:
+                tree.focus_set()
+            except Exception:
+                pass
+            return
         items = tree.get_children()
         if not items:
             return
@@ -379,16 +404,6 @@ class ProductsTab(UIHelpers):
                 pass
         return "break"
 
-    def _kb_products_pagedown(self, _e=None):
-        self._page_prod(+1)
-        self._select_first_in_tree(self.prod_tree)
-        return "break"
-
-    def _kb_products_pageup(self, _e=None):
-        self._page_prod(-1)
-        self._select_first_in_tree(self.prod_tree)
-        return "break"
-
     def _kb_prodname_return(self, _e=None):
         self.add_or_update_product()
 
@@ -848,18 +863,22 @@ class ProductsTab(UIHelpers):
 
     # ---------------- public refresh ----------------
     def refresh(self):
-        self._all_ingredient_names = self.db.list_ingredient_names()
-        self.ing_combo["values"] = self._all_ingredient_names
-        self.slot_ing_combo["values"] = self._all_ingredient_names
+        self.db.call("list_ingredients", on_done=self._on_ingredients_loaded)
 
-        self.refresh_products()
+        def _reload_selected():
+            pid = self._get_selected_product_id()
+            if pid is not None:
+                self._refresh_product_detail(pid)
 
-        pid = self._get_selected_product_id()
-        if pid is not None:
-            self.refresh_recipe(pid)
-            self._refresh_slot_lists(pid)
-            self.load_sale_price_for_product(pid)
-            self._update_margin_display(pid)
+        self.refresh_products(then=_reload_selected)
+
+    def _on_ingredients_loaded(self, rows):
+        self._all_ingredient_names = [name for _id, name, _unit, _pq, _pp in rows]
+        self._ingredient_units = {name: unit for _id, name, unit, _pq, _pp in rows}
+        self._ingredient_index.build(self._all_ingredient_names)
+        if self.add_mode.get() != "PROD":
+            self.ing_combo["values"] = self._all_ingredient_names
+        self.slot_ing_combo["values"] = self._all_ingredient_names
 
     # ---------------- sorting ----------------
     def sort_products_by(self, col: str):
@@ -870,123 +889,99 @@ class ProductsTab(UIHelpers):
             self.prod_sort_desc = False
         self.refresh_products()
 
-    def _product_sort_key(self, row, col: str):
-        _pid, name, cost, sale_price, profit, margin = row
-        if col == "name":
-            return (name or "").lower()
-        if col == "cost":
-            return float(cost or 0.0)
-        if col == "profit":
-            return float(profit) if profit is not None else float("-inf")
-        if col == "margin":
-            return float(margin) if margin is not None else float("-inf")
-        return (name or "").lower()
-
     # ---------------- products list ----------------
     def _on_prod_search_changed(self):
-        self.prod_filter = (self.prod_search_var.get() or "").strip()
-        self.prod_offset = 0
+        query = (self.prod_search_var.get() or "").strip()
+        if query == self.prod_filter:
+            return  # e.g. cursor keys
+        self.prod_filter = query
+        self.prod_tree.yview_moveto(0)
         self.refresh_products()
 
-    def _page_prod(self, direction: int):
-        rows = getattr(self, "_products_rows", [])
-        f = (self.prod_filter or "").strip().lower()
-        if f:
-            rows = [r for r in rows if f in (r[1] or "").lower()]
-        total = len(rows)
-        if total <= PAGE_SIZE:
-            self.prod_offset = 0
-        else:
-            self.prod_offset = max(0, min(self.prod_offset + direction * PAGE_SIZE, max(0, total - PAGE_SIZE)))
-        self.refresh_products()
-
-    def refresh_products(self):
-        sel = self.prod_tree.selection()
-        selected_pid = int(sel[0]) if sel else None
-
-        products = self.db.list_products()
-
-        costs = {pid: 0.0 for pid, _, _ in products}
-        cur = self.db.conn.cursor()
-
-        cur.execute(
-            """
-            SELECT pi.product_id, SUM(pi.qty * (i.pack_price / i.pack_qty))
-            FROM product_items pi
-            JOIN ingredients i ON i.id = pi.ingredient_id
-            GROUP BY pi.product_id;
-            """
-        )
-        for pid, s in cur.fetchall():
-            costs[int(pid)] += float(s or 0.0)
-
-        cur.execute(
-            """
-            SELECT sl.product_id, SUM(sl.qty * (i.pack_price / i.pack_qty))
-            FROM product_slot_lines sl
-            JOIN product_slot_selection ss
-              ON ss.product_id = sl.product_id AND ss.slot_name = sl.slot_name
-            JOIN ingredients i ON i.id = ss.ingredient_id
-            GROUP BY sl.product_id;
-            """
-        )
-        for pid, s in cur.fetchall():
-            costs[int(pid)] += float(s or 0.0)
-
-        rows_all = []
-        for pid, name, sale_price in products:
-            cost = float(costs.get(pid, 0.0))
-            if sale_price is None:
-                profit = None
-                margin = None
-            else:
-                sp = float(sale_price)
-                profit = sp - cost
-                margin = (profit / sp * 100.0) if sp > 0 else 0.0
-            rows_all.append((pid, name, cost, sale_price, profit, margin))
+    def refresh_products(self, then=None):
+        """Re-query the list for the current search and sort order, then call `then()`.
+
+        Filtering and sorting run in SQL: this only fetches the count and the
+        position of the product to keep selected; the tree loads the rows page
+        by page (keyset) as they scroll into view.
+        """
+        query, sort, desc = self.prod_filter, self.prod_sort_col, self.prod_sort_desc
+        wanted, self._select_after_refresh = self._select_after_refresh, None
+        if wanted is None:
+            wanted = self._get_selected_product_id()
+        self._products_seq += 1
+        seq = self._products_seq
+
+        def _count(db):
+            pos = db.product_position(wanted, query, sort, desc) if wanted is not None else None
+            return db.count_products(query), pos
+
+        def _fetch(start, count, prev_row, done):
+            after = product_sort_key(prev_row, sort) if prev_row is not None else None
+            self.db.call("product_page", query, sort, desc, after, count, 0 if after else start, on_done=done)
+
+        def _done(result):
+            if seq != self._products_seq:
+                return  # a newer search/sort is already on its way
+            total, pos = result
+            self.prod_tree.set_provider(total, _fetch, values_of=_product_values, on_ready=then)
+            self.prod_count_label.config(text=f"{total} Produkte")
+            if pos is None:
+                if self._get_selected_product_id() is not None:
+                    self.prod_tree.selection_set()  # deleted or filtered out; clears the detail panel
+                pos = 0
+            self.prod_tree.select_index(pos)  # once its page is loaded
+
+        self.db.submit(_count, on_done=_done)
+
+    # ---------------- change events ----------------
+    def _on_ingredients_changed(self, ing_ids):
+        """Names/units for the comboboxes, plus costs of the products using the ingredients."""
+        self.db.call("list_ingredients", on_done=self._on_ingredients_loaded)
+
+        def _users(db):
+            if None in ing_ids:
+                return {None}
+            pids = set()
+            for ing_id in ing_ids:
+                pids |= db.cost_engine.products_using(ing_id)
+            return pids
+
+        self.db.submit(_users, on_done=self._on_recipes_changed)
+
+    def _on_products_changed(self, pids):
+        self.refresh_products(then=self._reload_detail_if(pids))
+
+    def _on_recipes_changed(self, pids):
+        if not pids:
+            return
 
-        self._products_rows = rows_all
-        rows = list(rows_all)
+        def _done(dependents):
+            self.refresh_products(then=self._reload_detail_if(dependents))
 
-        f = (self.prod_filter or "").strip().lower()
-        if f:
-            rows = [r for r in rows if f in (r[1] or "").lower()]
+        # products containing a changed one as sub-recipe changed cost, too
+        self.db.submit(lambda db: db.cost_engine.dependents(pids), on_done=_done)
 
-        sort_col = getattr(self, "prod_sort_col", "name")
-        desc = getattr(self, "prod_sort_desc", False)
-        rows.sort(key=lambda r: self._product_sort_key(r, sort_col), reverse=desc)
+    def _reload_detail_if(self, pids):
+        """Callback reloading the detail panel if the product selected now is in `pids` and stays selected."""
+        before = self._get_selected_product_id()
 
-        total = len(rows)
-        if total <= PAGE_SIZE:
-            self.prod_offset = 0
-        else:
-            self.prod_offset = max(0, min(self.prod_offset, max(0, total - PAGE_SIZE)))
+        def _reload():
+            pid = self._get_selected_product_id()
+            if pid is not None and pid == before and (pid in pids or None in pids):
+                self._refresh_product_detail(pid)
 
-        page = rows[self.prod_offset : self.prod_offset + PAGE_SIZE]
+        return _reload
 
-        for r in self.prod_tree.get_children():
-            self.prod_tree.delete(r)
+    def open_whatif(self):
+        from .whatif_dialog import open_dialog
 
-        for pid, name, cost, _sale_price, profit, margin in page:
-            profit_txt = money(profit) if profit is not None else "–"
-            margin_txt = f"{margin:.1f} %" if margin is not None else "–"
-            self.prod_tree.insert("", "end", iid=str(pid), values=(name, money(cost), profit_txt, margin_txt))
+        open_dialog(self.app, self.db)
 
-        if selected_pid is not None and self.prod_tree.exists(str(selected_pid)):
-            self.prod_tree.selection_set(str(selected_pid))
-            self.prod_tree.focus(str(selected_pid))
-            self.prod_tree.see(str(selected_pid))
-        else:
-            items = self.prod_tree.get_children()
-            if items:
-                first = items[0]
-                self.prod_tree.selection_set(first)
-                self.prod_tree.focus(first)
-                self.prod_tree.see(first)
+    def open_reprice(self):
+        from .reprice_dialog import open_dialog
 
-        start = self.prod_offset + 1 if total else 0
-        end = min(self.prod_offset + PAGE_SIZE, total)
-        self.prod_page_label.config(text=f"{start}–{end} von {total}")
+        open_dialog(self.app, self.db, self.events, self.prod_filter)
 
     def add_or_update_product(self):
         name = self.prod_name.get().strip()
@@ -994,18 +989,16 @@ class ProductsTab(UIHelpers):
             messagebox.showerror("Fehler", "Bitte Produktname angeben.")
             return
 
-        self.db.upsert_product(name)
-        self.refresh_products()
-        self._select_product_by_name(name)
-
-    def _select_product_by_name(self, name: str):
-        for iid in self.prod_tree.get_children():
-            if self.prod_tree.item(iid, "values")[0] == name:
-                self.prod_tree.selection_set(iid)
-                self.prod_tree.focus(iid)
-                self.prod_tree.see(iid)
-                self.on_select_product(None)
-                return
+        def _save(db):
+            db.upsert_product(name)
+            return db.get_product_id_by_name(name)
+
+        def _done(pid):
+            # the event reloads the list; select the product once it shows up
+            self._select_after_refresh = pid
+            self.events.emit(PRODUCT_CHANGED, pid)
+
+        self.db.submit(_save, on_done=_done)
 
     def delete_selected_product(self):
         pid = self._get_selected_product_id()
@@ -1017,10 +1010,22 @@ class ProductsTab(UIHelpers):
         if not messagebox.askyesno("Bestätigen", f"Produkt '{pname}' wirklich löschen?"):
             return
 
-        self.db.delete_product(pid)
-        self.prod_name.set("")
-        self.refresh_products()
-        self.on_select_product(None)
+        def _delete(db):
+            if db.product_is_used(pid):
+                return False
+            db.delete_product(pid)
+            return True
+
+        def _done(deleted):
+            if not deleted:
+                messagebox.showerror(
+                    "Fehler", "Produkt ist Teilrezept anderer Produkte und kann nicht gelöscht werden."
+                )
+                return
+            self.events.emit(PRODUCT_CHANGED, pid)
+            self.prod_name.set("")
+
+        self.db.submit(_delete, on_done=_done)
 
     def _get_selected_product_id(self):
         sel = self.prod_tree.selection()
@@ -1034,7 +1039,7 @@ class ProductsTab(UIHelpers):
     def on_select_product(self, _):
         pid = self._get_selected_product_id()
         if pid is None:
-            self.recipe_tree.delete(*self.recipe_tree.get_children())
+            self._tree_reconcile(self.recipe_tree, ())
             self.cost_label.config(text="Kosten: –")
             self.recipe_unit_label.config(text="Einheit: –")
             self.slot_pick_combo["values"] = []
@@ -1045,18 +1050,34 @@ class ProductsTab(UIHelpers):
             self.margin_label.config(text="Marge: –")
             return
 
-        name = self.db.get_product_name(pid)
-        if name:
-            self.prod_name.set(name)
+        self._refresh_product_detail(pid, set_name=True)
 
-        self.refresh_recipe(pid)
-        self._refresh_slot_lists(pid)
-        self.load_sale_price_for_product(pid)
-        self._update_margin_display(pid)
+    def _refresh_product_detail(self, pid: int, set_name: bool = False):
+        """Load name, recipe view and slot data for `pid` in one background job."""
+
+        def _load(db):
+            return {
+                "name": db.get_product_name(pid) if set_name else None,
+                "view": db.get_recipe_view(pid),
+                "slots": db.list_distinct_slots(pid),
+                "selections": db.get_slot_selections(pid),
+            }
+
+        def _done(detail):
+            if self._get_selected_product_id() != pid:
+                return  # selection moved on while loading
+            if detail["name"]:
+                self.prod_name.set(detail["name"])
+            view = detail["view"]
+            self._render_recipe(view)
+            self._apply_slot_lists(detail["slots"], detail["selections"])
+            if view is not None:
+                self._show_sale_price(view["sale_price"])
+
+        self.db.submit(_load, on_done=_done)
 
     # ---------------- sale price / margin ----------------
-    def load_sale_price_for_product(self, pid: int):
-        price = self.db.get_sale_price(pid)
+    def _show_sale_price(self, price):
         if price is None:
             self.sale_price_var.set("")
         else:
@@ -1069,50 +1090,40 @@ class ProductsTab(UIHelpers):
 
         txt = (self.sale_price_var.get() or "").strip()
         if txt == "":
-            self.db.set_sale_price(pid, None)
+            self.db.call("set_sale_price", pid, None, on_done=lambda _r: self.events.emit(PRODUCT_CHANGED, pid))
             self._update_margin_display(pid)
-            self.refresh_products()
             return
 
         val = safe_float(txt)
         if val is None or val < 0:
             return
 
-        self.db.set_sale_price(pid, float(val))
+        self.db.call("set_sale_price", pid, float(val), on_done=lambda _r: self.events.emit(PRODUCT_CHANGED, pid))
         self.sale_price_var.set(f"{float(val):.2f}")
         self._update_margin_display(pid)
-        self.refresh_products()
 
     def _update_margin_display(self, pid: int):
-        cost = self.db.compute_product_cost(pid)
-        price = self.db.get_sale_price(pid)
+        def _load(db):
+            return profit_margin(db.compute_product_cost(pid), db.get_sale_price(pid))
 
-        if price is None:
+        def _done(profit_and_margin):
+            if self._get_selected_product_id() == pid:
+                self._render_margin(*profit_and_margin)
+
+        self.db.submit(_load, on_done=_done)
+
+    def _render_margin(self, profit, margin_pct):
+        if profit is None:
             self.profit_label.config(text="Gewinn: –")
             self.margin_label.config(text="Marge: –")
             return
 
-        profit = float(price) - cost
-        margin_pct = (profit / float(price) * 100.0) if float(price) > 0 else 0.0
-
         self.profit_label.config(text=f"Gewinn: {money(profit)}")
         self.margin_label.config(text=f"Marge: {margin_pct:.1f} %")
 
     # ---------------- autocomplete / ingredient resolve ----------------
     def _resolve_ingredient_name(self, typed_name: str):
-        t = (typed_name or "").strip().lower()
-        if not t:
-            return None
-
-        names = self._all_ingredient_names or []
-        for n in names:
-            if n.lower() == t:
-                return n
-
-        matches = [n for n in names if t in n.lower()]
-        if len(matches) == 1:
-            return matches[0]
-        return None
+        return self._ingredient_index.resolve(typed_name)
 
     def on_ingredient_combo_typed(self, event=None):
         if event is not None and getattr(event, "keysym", "") in {"Up", "Down", "Return", "Tab", "Escape"}:
@@ -1120,6 +1131,9 @@ class ProductsTab(UIHelpers):
 
         typed_raw = self.recipe_ing.get() or ""
         typed = typed_raw.strip().lower()
+        if self.add_mode.get() == "PROD":
+            self._complete_products(typed)
+            return
         names = self._all_ingredient_names or []
         if not names:
             return
@@ -1129,7 +1143,7 @@ class ProductsTab(UIHelpers):
             self._ing_popdown_open = False
             self._unpost_combobox(self.ing_combo)
         else:
-            filtered = [n for n in names if n.lower().startswith(typed)]
+            filtered = self._ingredient_index.complete(typed, AUTOCOMPLETE_LIMIT)
             self.ing_combo["values"] = filtered
             if filtered:
                 self._ing_popdown_open = True
@@ -1138,6 +1152,29 @@ class ProductsTab(UIHelpers):
                 self._ing_popdown_open = False
                 self._unpost_combobox(self.ing_combo)
 
+    def _complete_products(self, typed: str):
+        """Product names containing `typed` for the combobox, queried in the background."""
+        self._product_complete_seq += 1
+        seq = self._product_complete_seq
+        if not typed:
+            self.ing_combo["values"] = []
+            self._ing_popdown_open = False
+            self._unpost_combobox(self.ing_combo)
+            return
+
+        def _done(rows):
+            if seq != self._product_complete_seq or self.add_mode.get() != "PROD":
+                return
+            self.ing_combo["values"] = [r[1] for r in rows]
+            if rows:
+                self._ing_popdown_open = True
+                self.app.after_idle(lambda: self._ensure_combo_dropdown(self.ing_combo))
+            else:
+                self._ing_popdown_open = False
+                self._unpost_combobox(self.ing_combo)
+
+        self.db.submit(lambda db: db.search_products(typed, limit=AUTOCOMPLETE_LIMIT), on_done=_done)
+
     def on_slot_ingredient_typed(self, event=None):
         if event is not None and getattr(event, "keysym", "") in {"Up", "Down", "Return", "Tab", "Escape"}:
             return
@@ -1153,7 +1190,7 @@ class ProductsTab(UIHelpers):
             self._slot_popdown_open = False
             self._unpost_combobox(self.slot_ing_combo)
         else:
-            filtered = [n for n in names if n.lower().startswith(typed)]
+            filtered = self._ingredient_index.complete(typed, AUTOCOMPLETE_LIMIT)
             self.slot_ing_combo["values"] = filtered
             if filtered:
                 self._slot_popdown_open = True
@@ -1164,12 +1201,19 @@ class ProductsTab(UIHelpers):
 
     def on_ingredient_selected(self, _event=None):
         self._ing_popdown_open = False
+        if self.add_mode.get() == "PROD":
+            self.recipe_unit_label.config(text="Einheit: Portion")
+            return
         name = (self.recipe_ing.get() or "").strip()
         if not name:
             self.recipe_unit_label.config(text="Einheit: –")
             return
-        unit = self.db.get_ingredient_unit_by_name(name)
-        self.recipe_unit_label.config(text=f"Einheit: {unit}" if unit else "Einheit: –")
+        unit = self._ingredient_units.get(name)
+        if not unit:
+            self.recipe_unit_label.config(text="Einheit: –")
+            return
+        others = [u for u in compatible_units(unit) if u != unit]
+        self.recipe_unit_label.config(text=f"Einheit: {unit} (oder {'/'.join(others)})" if others else f"Einheit: {unit}")
 
     # ---------------- mode toggle ----------------
     def on_add_mode_changed(self):
@@ -1188,19 +1232,22 @@ class ProductsTab(UIHelpers):
                 self.ing_combo.configure(state="normal")
             except Exception:
                 pass
+            self.recipe_ing.set("")
+            self.ing_combo["values"] = (self._all_ingredient_names or []) if mode == "ING" else []
             self.on_ingredient_selected()
             self.slot_panel.pack_forget()
 
     # ---------------- slot selection ----------------
-    def _refresh_slot_lists(self, pid=None):
-        if pid is None:
-            return
-        slots = self.db.list_distinct_slots(pid)
+    def _apply_slot_lists(self, slots, selections):
+        """Show the product's slots; `selections` maps slot_name -> chosen ingredient name."""
+        self._slot_selections = dict(selections or {})
         self.slot_pick_combo["values"] = slots
         if slots:
             if self.slot_pick.get() not in slots:
                 self.slot_pick.set(slots[0])
-            self.load_slot_selection(pid)
+            pid = self._get_selected_product_id()
+            if pid is not None:
+                self.load_slot_selection(pid)
         else:
             self.slot_pick.set("")
             self.slot_ing_pick.set("")
@@ -1212,12 +1259,12 @@ class ProductsTab(UIHelpers):
         self.load_slot_selection(pid)
 
     def load_slot_selection(self, pid: int):
+        # served from the selections loaded with the product detail (pid is the selected product)
         slot = (self.slot_pick.get() or "").strip()
         if not slot:
             self.slot_ing_pick.set("")
             return
-        name = self.db.get_slot_selection_name(pid, slot)
-        self.slot_ing_pick.set(name or "")
+        self.slot_ing_pick.set(self._slot_selections.get(slot) or "")
 
     def set_slot_selection(self):
         pid = self._get_selected_product_id()
@@ -1236,15 +1283,25 @@ class ProductsTab(UIHelpers):
             messagebox.showerror("Fehler", "Bitte eine Zutat auswählen/tippen für den Slot.")
             return
 
-        ing_id = self.db.get_ingredient_id_by_name(ing_name)
-        if ing_id is None:
+        if ing_name not in self._ingredient_units:
             messagebox.showerror("Fehler", "Zutat nicht gefunden.")
             return
 
-        self.db.set_slot_selection(pid, slot, ing_id)
-        self.refresh_products()
-        self.refresh_recipe(pid)
-        self.load_slot_selection(pid)
+        def _set(db):
+            ing_id = db.get_ingredient_id_by_name(ing_name)
+            if ing_id is None:
+                return False
+            db.set_slot_selection(pid, slot, ing_id)
+            return True
+
+        self.db.submit(_set, on_done=lambda ok: self._after_recipe_change(pid, ok))
+
+    def _after_recipe_change(self, pid: int, ok: bool = True, missing: str = "Zutat nicht gefunden."):
+        """Callback after a background recipe write: announce it (list costs + recipe panel follow)."""
+        if not ok:
+            messagebox.showerror("Fehler", missing)
+            return
+        self.events.emit(RECIPE_CHANGED, pid)
 
     # ---------------- enter helpers (recipe) ----------------
     def _recipe_enter_from_ingredient(self, _event=None):
@@ -1304,20 +1361,47 @@ class ProductsTab(UIHelpers):
             messagebox.showerror("Fehler", "Bitte zuerst ein Produkt auswählen.")
             return
 
-        qty = safe_float(self.recipe_qty.get())
-        if qty is None or qty <= 0:
+        try:
+            qty, qty_unit = parse_quantity(self.recipe_qty.get())
+        except ValueError as e:
+            messagebox.showerror("Fehler", str(e))
+            return
+        if qty <= 0:
             messagebox.showerror("Fehler", "Menge muss > 0 sein.")
             return
 
         mode = self.add_mode.get()
+        if qty_unit is not None and mode != "ING":
+            messagebox.showerror("Fehler", "Eine Einheit zur Menge geht nur bei Zutaten (z.B. 2 cl).")
+            return
 
         if mode == "SLOT":
             slot = (self.slot_name_var.get() or "").strip()
             if not slot:
                 messagebox.showerror("Fehler", "Bitte Slot-Name angeben (z.B. SPIRIT).")
                 return
-            self.db.add_slot_line(pid, slot, qty)
-            self._refresh_slot_lists(pid)
+            self.db.submit(
+                lambda db: db.add_slot_line(pid, slot, qty),
+                on_done=lambda _r: self._after_recipe_change(pid),
+            )
+        elif mode == "PROD":
+            comp_name = (self.recipe_ing.get() or "").strip()
+            if not comp_name:
+                messagebox.showerror("Fehler", "Bitte Produkt auswählen (oder tippen).")
+                return
+
+            def _add_component(db):
+                component_id = db.get_product_id_by_name(comp_name)
+                if component_id is None:
+                    return False
+                db.add_product_component(pid, component_id, qty)
+                return True
+
+            self.db.submit(
+                _add_component,
+                on_done=lambda ok: self._after_recipe_change(pid, ok, "Produkt nicht gefunden."),
+                on_error=lambda exc: messagebox.showerror("Fehler", str(exc)),
+            )
         else:
             ing_typed = (self.recipe_ing.get() or "").strip()
             ing_name = self._resolve_ingredient_name(ing_typed) or ing_typed
@@ -1325,12 +1409,22 @@ class ProductsTab(UIHelpers):
                 messagebox.showerror("Fehler", "Bitte Zutat auswählen (oder tippen).")
                 return
 
-            ing_id = self.db.get_ingredient_id_by_name(ing_name)
-            if ing_id is None:
+            if ing_name not in self._ingredient_units:
                 messagebox.showerror("Fehler", "Zutat nicht gefunden.")
                 return
 
-            self.db.add_product_item(pid, ing_id, qty)
+            def _add(db):
+                ing_id = db.get_ingredient_id_by_name(ing_name)
+                if ing_id is None:
+                    return False
+                db.add_product_item(pid, ing_id, qty, qty_unit)
+                return True
+
+            self.db.submit(
+                _add,
+                on_done=lambda ok: self._after_recipe_change(pid, ok),
+                on_error=lambda exc: messagebox.showerror("Fehler", str(exc)),
+            )
 
         # Clear qty always
         self.recipe_qty.set("")
@@ -1349,16 +1443,13 @@ class ProductsTab(UIHelpers):
             self._ing_popdown_open = False
             try:
                 # restore full list
-                self.ing_combo["values"] = self._all_ingredient_names or []
+                self.ing_combo["values"] = (self._all_ingredient_names or []) if mode == "ING" else []
                 self._unpost_combobox(self.ing_combo)
                 self.ing_combo.focus_set()
                 self.ing_combo.icursor(tk.END)
             except Exception:
                 pass
 
-        self.refresh_products()
-        self.refresh_recipe(pid)
-
     def delete_selected_recipe_item(self):
         pid = self._get_selected_product_id()
         if pid is None:
@@ -1371,65 +1462,60 @@ class ProductsTab(UIHelpers):
 
         iid = sel[0]
         if iid.startswith("ing:"):
-            item_id = int(iid.split(":", 1)[1])
-            self.db.delete_product_item(item_id)
+            method = "delete_product_item"
         elif iid.startswith("slot:"):
-            line_id = int(iid.split(":", 1)[1])
-            self.db.delete_slot_line(line_id)
+            method = "delete_slot_line"
+        elif iid.startswith("comp:"):
+            method = "delete_product_component"
         else:
             return
 
-        self.refresh_products()
-        self.refresh_recipe(pid)
-        self._refresh_slot_lists(pid)
-
-    def refresh_recipe(self, pid: int):
-        self.recipe_tree.delete(*self.recipe_tree.get_children())
-
-        total = 0.0
-
-        for pi_id, iname, qty, unit, pack_qty, pack_price in self.db.list_product_items(pid):
-            unit_price = (pack_price / pack_qty) if pack_qty else 0.0
-            line_cost = unit_price * qty
-            total += line_cost
-            self.recipe_tree.insert(
-                "",
-                "end",
-                iid=f"ing:{pi_id}",
-                values=(iname, f"{qty:g}", unit, f"{unit_price:.4f} €/{unit}", money(line_cost)),
+        line_id = int(iid.split(":", 1)[1])
+        self.db.call(method, line_id, on_done=lambda _r: self._after_recipe_change(pid))
+
+    def _render_recipe(self, view):
+        """Render recipe lines, cost and margin from one DB.get_recipe_view() result."""
+        if view is None:
+            self._tree_reconcile(self.recipe_tree, ())
+            self.cost_label.config(text="Kosten: –")
+            self._render_margin(None, None)
+            return
+
+        rows = []
+        for pi_id, iname, qty, unit, unit_price, line_cost in view["items"]:
+            rows.append(
+                (f"ing:{pi_id}", (iname, f"{qty:g}", unit, f"{unit_price:.4f} €/{unit}", money(line_cost)))
             )
 
-        for sl_id, slot_name, qty in self.db.list_slot_lines(pid):
-            r = self.db.get_slot_selection_price_unit(pid, slot_name)
-            if r:
-                sel_name, unit, pack_qty, pack_price = r
-                unit_price = (pack_price / pack_qty) if pack_qty else 0.0
-                line_cost = unit_price * qty
-                total += line_cost
+        for sl_id, slot_name, sel_name, qty, unit, unit_price, line_cost in view["slots"]:
+            if sel_name is not None:
                 label = f"{slot_name} → {sel_name}"
-                self.recipe_tree.insert(
-                    "",
-                    "end",
-                    iid=f"slot:{sl_id}",
-                    values=(label, f"{qty:g}", unit, f"{unit_price:.4f} €/{unit}", money(line_cost)),
-                )
+                values = (label, f"{qty:g}", unit, f"{unit_price:.4f} €/{unit}", money(line_cost))
             else:
                 label = f"{slot_name} → (nicht gesetzt)"
-                self.recipe_tree.insert(
-                    "",
-                    "end",
-                    iid=f"slot:{sl_id}",
-                    values=(label, f"{qty:g}", "–", "–", money(0.0)),
+                values = (label, f"{qty:g}", "–", "–", money(0.0))
+            rows.append((f"slot:{sl_id}", values))
+
+        for pc_id, pname, qty, unit_cost, line_cost in view["components"]:
+            rows.append(
+                (
+                    f"comp:{pc_id}",
+                    (f"{pname} (Teilrezept)", f"{qty:g}", "Port.", f"{unit_cost:.4f} €/Port.", money(line_cost)),
                 )
+            )
 
-        self.cost_label.config(text=f"Kosten: {money(total)}")
+        # update in place: keeps scroll position and selection of unchanged lines
+        self._tree_reconcile(self.recipe_tree, rows)
+
+        self.cost_label.config(text=f"Kosten: {money(view['cost'])}")
 
         if self.add_mode.get() == "SLOT":
             self.recipe_unit_label.config(text="Einheit: (vom Slot)")
         else:
             self.on_ingredient_selected()
 
-        self._update_margin_display(pid)
+        self._render_margin(view["profit"], view["margin"])
+
     # ---------------- credit tooltip ----------------
     def _show_credit_tooltip(self, event=None):
         try:
@@ -1469,4 +1555,11 @@ class ProductsTab(UIHelpers):
         try:
             webbrowser.open("https://github.com/alexase7")
         except Exception:
-            pass
\ No newline at end of file
+            pass
+
+
+def _product_values(row):
+    _pid, name, cost, _sale_price, profit, margin = row
+    profit_txt = money(profit) if profit is not None else "–"
+    margin_txt = f"{margin:.1f} %" if margin is not None else "–"
+    return (name, money(cost), profit_txt, margin_txt)
@@ -3,11 +3,499 @@ from tkinter import ttk
 import json
 from pathlib import Path
 
+from .config import SEL_BG
+
+
+def reconcile_tree(tree: ttk.Treeview, rows) -> dict:
+    """Make the top-level items of `tree` match `rows` with minimal Tk calls.
+
+    `rows` is a sequence of (iid, values) or (iid, values, tags). Items are
+    matched by iid: missing ones are inserted, stale ones deleted in a single
+    call, out-of-order ones moved, and values/tags only rewritten when they
+    differ from what was last written. Returns the operation counts
+    {"insert", "delete", "move", "update"}.
+
+    Uses the plain ttk.Treeview methods, so it also works on VirtualTreeview.
+    """
+    base = ttk.Treeview
+    ops = {"insert": 0, "delete": 0, "move": 0, "update": 0}
+
+    # last written (values, tags) per iid; saves reading them back from Tcl
+    cache = getattr(tree, "_reconcile_cache", None)
+    if cache is None:
+        cache = tree._reconcile_cache = {}
+
+    wanted = []
+    for row in rows:
+        iid = str(row[0])
+        values = tuple(row[1])
+        tags = tuple(row[2]) if len(row) > 2 else ()
+        wanted.append((iid, values, tags))
+    wanted_iids = {iid for iid, _v, _t in wanted}
+
+    current = base.get_children(tree, "")
+    stale = [iid for iid in current if iid not in wanted_iids]
+    if stale:
+        base.delete(tree, *stale)
+        for iid in stale:
+            cache.pop(iid, None)
+        ops["delete"] = len(stale)
+
+    remaining = [iid for iid in current if iid in wanted_iids]
+    existing = set(remaining)
+    moved = set()
+    j = 0
+    for index, (iid, values, tags) in enumerate(wanted):
+        while j < len(remaining) and remaining[j] in moved:
+            j += 1
+        if iid not in existing:
+            base.insert(tree, "", index, iid=iid, values=values, tags=tags)
+            cache[iid] = (values, tags)
+            ops["insert"] += 1
+            continue
+
+        if j < len(remaining) and remaining[j] == iid:
+            j += 1
+        else:
+            base.move(tree, iid, "", index)
+            moved.add(iid)
+            ops["move"] += 1
+
+        if cache.get(iid) != (values, tags):
+            base.item(tree, iid, values=values, tags=tags)
+            cache[iid] = (values, tags)
+            ops["update"] += 1
+
+    return ops
+
+
+class VirtualTreeview(ttk.Treeview):
+    """Treeview that only materializes the visible rows (plus a small buffer).
+
+    Two ways to feed it:
+
+    - `set_rows(rows, iid_of, values_of)`: the full row set is in memory (100k+
+      entries are fine); `values_of(row)` is only called for rows on screen.
+    - `set_provider(total, fetch, ...)`: only `total` is known up front; rows
+      are requested in blocks of BLOCK via `fetch(start, count, prev_row, done)`
+      when scrolled into view and cached. `prev_row` is the row before `start`
+      if it is loaded (for keyset paging), else None; `done(rows)` delivers the
+      rows for `start...` (possibly later, from another callback).
+
+    Scrolling, selection and focus are tracked virtually, and the usual
+    Treeview calls (selection/selection_set/focus/see/exists/item/get_children,
+    yview for a scrollbar) work on the full (or loaded) row set.
+    <<TreeviewSelect>> is generated on selection changes like a regular Treeview.
+    """
+
+    BUFFER = 2
+    BLOCK = 100
+    MAX_BLOCKS = 20  # provider mode: loaded blocks kept; the ones farthest from view are dropped
+    PENDING = "…"
+
+    def __init__(self, master=None, **kw):
+        self._yscrollcommand = kw.pop("yscrollcommand", None) or kw.pop("yscroll", None)
+        super().__init__(master, **kw)
+        self._rows = []  # list mode: all rows
+        self._fetch = None  # provider mode: block fetcher
+        self._cache = {}  # provider mode: index -> row
+        self._requested = set()  # provider mode: block numbers in flight
+        self._generation = 0  # bumped on every data reset; late blocks are dropped
+        self._on_ready = None
+        self._total = 0
+        self._iids = ()  # list mode only
+        self._index = {}  # iid -> index (all rows, or the loaded ones)
+        self._iid_of = lambda row: str(row[0])
+        self._values_of = lambda row: row[1:]
+        self._first = 0
+        self._sel = None
+        self._pending_sel = None  # index to select once its row is loaded
+        self._focus_iid = ""
+        self._rowheight = None
+        self._header_height = None
+        self.last_ops = {}  # operation counts of the last render (see reconcile_tree)
+
+        self.tag_configure("vsel", background=SEL_BG)
+
+        self.bind("<Configure>", lambda _e: self._on_configure(), add=True)
+        self.bind("<Button-1>", self._on_click)
+        self.bind("<MouseWheel>", self._on_mousewheel)
+        self.bind("<Button-4>", lambda _e: (self.yview_scroll(-3, "units"), "break")[1])
+        self.bind("<Button-5>", lambda _e: (self.yview_scroll(3, "units"), "break")[1])
+        self.bind("<Up>", lambda _e: (self.move_selection(-1), "break")[1])
+        self.bind("<Down>", lambda _e: (self.move_selection(+1), "break")[1])
+        self.bind("<Prior>", lambda _e: (self.move_selection(-self._visible_rows()), "break")[1])
+        self.bind("<Next>", lambda _e: (self.move_selection(+self._visible_rows()), "break")[1])
+        self.bind("<Home>", lambda _e: (self.move_selection(-self._total), "break")[1])
+        self.bind("<End>", lambda _e: (self.move_selection(+self._total), "break")[1])
+
+    # ---------- data ----------
+    def set_rows(self, rows, iid_of=None, values_of=None):
+        """Replace the full row set; keeps scroll position and selection where possible."""
+        if iid_of is not None:
+            self._iid_of = iid_of
+        if values_of is not None:
+            self._values_of = values_of
+        self._generation += 1
+        self._fetch = None
+        self._cache = {}
+        self._requested = set()
+        self._pending_sel = None
+        self._rows = list(rows)
+        self._total = len(self._rows)
+        self._iids = tuple(self._iid_of(r) for r in self._rows)
+        self._index = {iid: i for i, iid in enumerate(self._iids)}
+        if self._sel not in self._index:
+            self._sel = None
+        if self._focus_iid not in self._index:
+            self._focus_iid = ""
+        self._first = self._clamp_first(self._first)
+        self._render()
+
+    def set_provider(self, total: int, fetch, iid_of=None, values_of=None, on_ready=None):
+        """Serve `total` rows lazily from `fetch` (see class doc); drops all cached rows.
+
+        The selection is kept by iid and shows up again once its row is loaded.
+        `on_ready()` runs after the first requested block has been rendered.
+        """
+        if iid_of is not None:
+            self._iid_of = iid_of
+        if values_of is not None:
+            self._values_of = values_of
+        self._generation += 1
+        self._fetch = fetch
+        self._rows = []
+        self._iids = ()
+        self._cache = {}
+        self._requested = set()
+        self._index = {}
+        self._pending_sel = None
+        self._on_ready = on_ready
+        self._total = max(0, int(total))
+        self._first = self._clamp_first(self._first)
+        self._render()
+        if self._total == 0 and on_ready is not None:
+            self._on_ready = None
+            on_ready()
+
+    def _deliver(self, generation: int, block: int, start: int, rows):
+        if generation != self._generation:
+            return  # data was reset meanwhile
+        self._requested.discard(block)
+        for offset, row in enumerate(rows):
+            i = start + offset
+            if i >= self._total:
+                break
+            self._cache[i] = row
+            self._index[self._iid_of(row)] = i
+        self._evict()
+        pending = self._pending_sel
+        if pending is not None and pending in self._cache:
+            self._pending_sel = None
+            target = self._iid_of(self._cache[pending])
+            self.selection_set(target)
+            self.focus(target)
+        self._render()
+        if self._on_ready is not None:
+            on_ready, self._on_ready = self._on_ready, None
+            on_ready()
+
+    def _evict(self):
+        if len(self._cache) <= self.MAX_BLOCKS * self.BLOCK:
+            return
+        here = self._first // self.BLOCK
+        blocks = sorted({i // self.BLOCK for i in self._cache}, key=lambda b: abs(b - here))
+        keep = set(blocks[: self.MAX_BLOCKS])
+        sel = self._index.get(self._sel) if self._sel is not None else None
+        if sel is not None:
+            keep.add(sel // self.BLOCK)  # the selected row stays addressable (item, see)
+        for i in [i for i in self._cache if i // self.BLOCK not in keep]:
+            self._index.pop(self._iid_of(self._cache.pop(i)), None)
+
+    def _request(self, block: int):
+        if block in self._requested or self._fetch is None:
+            return
+        self._requested.add(block)
+        start = block * self.BLOCK
+        count = min(self.BLOCK, self._total - start)
+        generation = self._generation
+        self._fetch(
+            start,
+            count,
+            self._cache.get(start - 1),
+            lambda rows: self._deliver(generation, block, start, rows),
+        )
+
+    def _row_at(self, i: int):
+        if self._fetch is None:
+            return self._rows[i]
+        return self._cache.get(i)
+
+    def iid_at(self, i: int):
+        """iid of row `i`, or None if it is not loaded (yet)."""
+        if not 0 <= i < self._total:
+            return None
+        if self._fetch is None:
+            return self._iids[i]
+        row = self._cache.get(i)
+        return None if row is None else self._iid_of(row)
+
+    def row_count(self) -> int:
+        return self._total
+
+    # ---------- geometry ----------
+    def _row_height(self) -> int:
+        if self._rowheight is None:
+            try:
+                self._rowheight = int(ttk.Style(self).lookup(self.cget("style") or "Treeview", "rowheight"))
+            except Exception:
+                self._rowheight = 20
+        return self._rowheight
+
+    def _visible_rows(self) -> int:
+        h = self.winfo_height()
+        if h <= 1:
+            try:
+                return max(1, int(self.cget("height")))
+            except Exception:
+                return 10
+        rh = self._row_height()
+        header = self._header_height if self._header_height is not None else rh
+        return max(1, (h - header) // rh)
+
+    def _clamp_first(self, first: int) -> int:
+        return max(0, min(int(first), self._total - self._visible_rows()))
+
+    def _on_configure(self):
+        self._first = self._clamp_first(self._first)
+        self._render()
+
+    # ---------- rendering ----------
+    def _render(self):
+        end = min(self._total, self._first + self._visible_rows() + self.BUFFER)
+        rows = []
+        missing = set()
+        for i in range(self._first, end):
+            row = self._row_at(i)
+            if row is None:
+                missing.add(i // self.BLOCK)
+                rows.append((f"__pending_{i}", (self.PENDING,), ()))
+                continue
+            iid = self._iid_of(row)
+            rows.append((iid, self._values_of(row), ("vsel",) if iid == self._sel else ()))
+        self.last_ops = reconcile_tree(self, rows)
+
+        items = super().get_children("")
+        if items:
+            super().yview_moveto(0)
+            if self._focus_iid in self._index and super().exists(self._focus_iid):
+                super().focus(self._focus_iid)
+            if self._header_height is None:
+                bb = self.bbox(items[0])
+                if bb:
+                    self._header_height = int(bb[1])
+        self._update_scrollbar()
+
+        for block in sorted(missing):
+            self._request(block)
+
+    def _update_scrollbar(self):
+        if self._yscrollcommand is None:
+            return
+        lo, hi = self.yview()
+        try:
+            self._yscrollcommand(lo, hi)
+        except Exception:
+            pass
+
+    # ---------- scrolling ----------
+    def configure(self, cnf=None, **kw):
+        cb = kw.pop("yscrollcommand", None) or kw.pop("yscroll", None)
+        if cb is not None:
+            self._yscrollcommand = cb
+            self._update_scrollbar()
+        if cnf is None and not kw and cb is not None:
+            return None
+        return super().configure(cnf, **kw)
+
+    config = configure
+
+    def yview(self, *args):
+        total = self._total
+        if not args:
+            if not total:
+                return (0.0, 1.0)
+            return (self._first / total, min(1.0, (self._first + self._visible_rows()) / total))
+        if args[0] == "moveto":
+            first = float(args[1]) * total
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if len(args) > 2 and args[2] == "pages":
+                step *= self._visible_rows()
+            first = self._first + step
+        else:
+            return None
+        first = self._clamp_first(first)
+        if first != self._first:
+            self._first = first
+            self._render()
+        return None
+
+    def yview_scroll(self, number, what):
+        return self.yview("scroll", number, what)
+
+    def yview_moveto(self, fraction):
+        return self.yview("moveto", fraction)
+
+    def _on_mousewheel(self, event):
+        delta = getattr(event, "delta", 0)
+        if delta:
+            # Windows reports multiples of 120, macOS small integers
+            steps = -int(delta / 120) if abs(delta) >= 120 else -delta
+            self.yview_scroll(steps * 3, "units")
+        return "break"
+
+    # ---------- selection / focus ----------
+    def _on_click(self, event):
+        if self.identify_region(event.x, event.y) not in ("cell", "tree"):
+            return None  # headings / separators keep their default behavior
+        iid = self.identify_row(event.y)
+        if iid:
+            self.selection_set(iid)
+            self.focus(iid)
+        try:
+            self.focus_set()
+        except Exception:
+            pass
+        return "break"
+
+    def selection(self):
+        return (self._sel,) if self._sel is not None else ()
+
+    def selection_set(self, *items):
+        if len(items) == 1 and isinstance(items[0], (list, tuple)):
+            items = tuple(items[0])
+        iid = str(items[0]) if items else None
+        if iid is not None and iid not in self._index:
+            iid = None
+        self._set_selection(iid)
+
+    def selection_remove(self, *items):
+        if len(items) == 1 and isinstance(items[0], (list, tuple)):
+            items = tuple(items[0])
+        if self._sel is not None and self._sel in {str(i) for i in items}:
+            self._set_selection(None)
+
+    def _set_selection(self, iid):
+        self._pending_sel = None
+        if iid == self._sel:
+            return
+        self._sel = iid
+        self._render()
+        self.event_generate("<<TreeviewSelect>>")
+
+    def focus(self, item=None):
+        if item is None:
+            return self._focus_iid
+        self._focus_iid = str(item) if str(item) in self._index else ""
+        if self._focus_iid and super().exists(self._focus_iid):
+            super().focus(self._focus_iid)
+        return None
+
+    def see(self, item):
+        idx = self._index.get(str(item))
+        if idx is not None:
+            self.see_index(idx)
+
+    def see_index(self, idx: int):
+        """Scroll so that row `idx` is visible (it is loaded on demand in provider mode)."""
+        visible = self._visible_rows()
+        if idx < self._first:
+            first = idx
+        elif idx >= self._first + visible:
+            first = idx - visible + 1
+        else:
+            return
+        self._first = self._clamp_first(first)
+        self._render()
+
+    def select_index(self, idx: int):
+        """Select row `idx` and scroll to it; selects once loaded if it is not yet."""
+        if not self._total:
+            return
+        idx = max(0, min(self._total - 1, idx))
+        target = self.iid_at(idx)
+        if target is None:
+            self._pending_sel = idx
+            self.see_index(idx)  # requests the block
+            return
+        self.selection_set(target)
+        self.focus(target)
+        self.see_index(idx)
+
+    def move_selection(self, delta: int):
+        """Move the selection by `delta` rows over the full row set (clamped) and scroll to it."""
+        if not self._total:
+            return
+        idx = self._index.get(self._sel) if self._sel is not None else None
+        if idx is None:
+            # nothing (loaded) selected: step in from the edge of the visible window
+            idx = self._first - 1 if delta > 0 else min(self._total, self._first + self._visible_rows())
+        self.select_index(idx + delta)
+
+    # ---------- item access over the full (or loaded) row set ----------
+    def exists(self, item):
+        return str(item) in self._index
+
+    def get_children(self, item=None):
+        if item:
+            return ()
+        if self._fetch is None:
+            return self._iids
+        return tuple(self._iid_of(self._cache[i]) for i in sorted(self._cache))
+
+    def item(self, item, option=None, **kw):
+        idx = self._index.get(str(item))
+        if idx is not None and option == "values" and not kw:
+            row = self._row_at(idx)
+            if row is not None:
+                return tuple(self._values_of(row))
+        return super().item(item, option, **kw)
+
 
 class UIHelpers:
     """Helper mixin. Expects self.app to be a tk.Tk instance."""
 
+    def _debounce(self, key: str, delay_ms: int, fn) -> None:
+        """Run `fn()` after `delay_ms`; a newer call with the same `key` cancels the pending one."""
+        if not hasattr(self, "_debounce_ids"):
+            self._debounce_ids = {}
+        aid = self._debounce_ids.pop(key, None)
+        if aid is not None:
+            try:
+                self.app.after_cancel(aid)
+            except Exception:
+                pass
+
+        def _run():
+            self._debounce_ids.pop(key, None)
+            fn()
+
+        self._debounce_ids[key] = self.app.after(delay_ms, _run)
+
+    def _tree_reconcile(self, tree: ttk.Treeview, rows) -> dict:
+        """Update `tree` in place to show `rows` [(iid, values[, tags])]; returns op counts."""
+        return reconcile_tree(tree, rows)
+
     def _tree_move_selection(self, tree: ttk.Treeview, delta: int):
+        if isinstance(tree, VirtualTreeview):
+            tree.move_selection(delta)
+            try:
+                tree.focus_set()
+            except Exception:
+                pass
+            return
+
         items = tree.get_children()
         if not items:
             return
@@ -0,0 +1,58 @@
+"""Units and their conversion into base units (families: volume in ml, mass in g, pieces).
+
+Quantities and unit prices are stored in the base unit of the ingredient's
+family (pack of 1 l -> 1000 ml, price per ml), so cost queries never convert
+at read time; the units table of migration 10 mirrors UNITS for the triggers.
+"""
+
+import re
+
+# unit (stored lower-case) -> (base unit, factor: 1 unit = factor base units)
+UNITS = {
+    "ml": ("ml", 1.0),
+    "cl": ("ml", 10.0),
+    "l": ("ml", 1000.0),
+    "g": ("g", 1.0),
+    "kg": ("g", 1000.0),
+    "stk": ("stk", 1.0),
+}
+
+_QUANTITY = re.compile(r"^\s*([0-9]+(?:[.,][0-9]*)?|[.,][0-9]+)\s*([^\s0-9]*)\s*$")
+
+
+def base_unit(unit: str) -> str:
+    """Base unit of `unit`'s family (unknown units are their own base)."""
+    return UNITS.get(unit, (unit, 1.0))[0]
+
+
+def factor(unit: str) -> float:
+    """Base units per one `unit` (1.0 for unknown units)."""
+    return UNITS.get(unit, (unit, 1.0))[1]
+
+
+def compatible_units(unit: str):
+    """The units convertible into `unit`, itself included, smallest first."""
+    base = base_unit(unit)
+    return sorted((u for u, (b, _f) in UNITS.items() if b == base), key=factor) or [unit]
+
+
+def to_base(qty: float, unit: str) -> float:
+    """`qty` in `unit` expressed in base units."""
+    return qty * factor(unit)
+
+
+def pack_unit_price(pack_qty, pack_price, unit: str) -> float:
+    """Price per base unit of a pack of `pack_qty` `unit` (0.0 for an empty pack)."""
+    return (pack_price / (pack_qty * factor(unit))) if pack_qty else 0.0
+
+
+def parse_quantity(text: str):
+    """(qty, unit or None) from input like "2", "2,5 cl" or "0.7kg"; ValueError if unparsable or unknown."""
+    m = _QUANTITY.match(text or "")
+    if not m:
+        raise ValueError(f"Ungültige Menge '{text}'.")
+    qty = float(m.group(1).replace(",", "."))
+    unit = m.group(2).lower() or None
+    if unit is not None and unit not in UNITS:
+        raise ValueError(f"Unbekannte Einheit '{unit}' (erlaubt: {', '.join(UNITS)}).")
+    return qty, unit
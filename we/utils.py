@@ -1,3 +1,6 @@
+from datetime import date, datetime
+
+
 def money(x: float) -> str:
     return f"{x:.2f} €"
 
@@ -6,4 +9,26 @@ def safe_float(s):
     try:
         return float(str(s).replace(",", "."))
     except (TypeError, ValueError):
-        return None
\ No newline at end of file
+        return None
+
+
+def profit_margin(cost: float, sale_price):
+    """(profit, margin %) for a sale price, or (None, None) if no price is set."""
+    if sale_price is None:
+        return None, None
+    sp = float(sale_price)
+    profit = sp - cost
+    margin = (profit / sp * 100.0) if sp > 0 else 0.0
+    return profit, margin
+
+
+def iso_day(value) -> str:
+    """'YYYY-MM-DD' for a date, datetime or ISO date string; ValueError otherwise."""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    try:
+        return date.fromisoformat(str(value).strip()).isoformat()
+    except ValueError:
+        raise ValueError(f"Ungültiges Datum '{value}' (erwartet JJJJ-MM-TT).") from None
@@ -0,0 +1,117 @@
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from logging.handlers import RotatingFileHandler
+
+from .config import HEARTBEAT_MS, STALL_LOG_FILE, STALL_THRESHOLD_MS
+
+_PKG_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class StallWatchdog:
+    """Logs stalls of the Tk mainloop together with the stack that caused them.
+
+    The Tk thread bumps a heartbeat via `after` every HEARTBEAT_MS. A monitor
+    thread checks it; when the heartbeat is older than the threshold it takes
+    the Tk thread's stack from `sys._current_frames()` and logs the running
+    handler (e.g. `ProductsTab.refresh_products`) to a rotating log file. When
+    the loop recovers, the total stall duration is logged too.
+    """
+
+    def __init__(self, app, threshold_ms=STALL_THRESHOLD_MS, interval_ms=HEARTBEAT_MS, log_path=STALL_LOG_FILE):
+        self.app = app
+        self.threshold = threshold_ms / 1000.0
+        self.interval_ms = interval_ms
+        self.log = _stall_logger(log_path)
+        self._last_beat = time.monotonic()
+        self._after_id = None
+        self._tk_ident = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start heartbeat + monitor; must be called on the Tk thread."""
+        self._tk_ident = threading.get_ident()
+        self._beat()
+        self._thread = threading.Thread(target=self._monitor, name="stall-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._after_id is not None:
+            try:
+                self.app.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    # ---------- Tk thread ----------
+    def _beat(self):
+        self._last_beat = time.monotonic()
+        self._after_id = self.app.after(self.interval_ms, self._beat)
+
+    # ---------- monitor thread ----------
+    def _monitor(self):
+        check = max(self.interval_ms / 1000.0, self.threshold / 4)
+        stalled_since = None  # heartbeat value of the stall being reported
+        while not self._stop.wait(check):
+            beat = self._last_beat
+            if stalled_since is not None:
+                if beat != stalled_since:
+                    total_ms = (beat - stalled_since) * 1000.0 - self.interval_ms
+                    self.log.warning("Tk-Hänger beendet nach %.0f ms", total_ms)
+                    stalled_since = None
+                continue
+
+            lag = time.monotonic() - beat
+            if lag > self.threshold:
+                stalled_since = beat
+                self._report(lag)
+
+    def _report(self, lag: float):
+        frame = sys._current_frames().get(self._tk_ident)
+        if frame is None:
+            return
+        frames = []  # outermost first
+        f = frame
+        while f is not None:
+            frames.append(f)
+            f = f.f_back
+        frames.reverse()
+        own = [f for f in frames if _is_own(f)]
+        # the handler is the innermost of our frames that was entered from outside (i.e. from Tk)
+        entries = [f for f in own if f.f_back is None or not _is_own(f.f_back)]
+        handler = _describe(entries[-1]) if entries else "?"
+        current = _describe(own[-1] if own else frames[-1])
+        self.log.warning(
+            "Tk-Hänger seit %.0f ms: Handler %s, gerade in %s\n%s",
+            lag * 1000.0,
+            handler,
+            current,
+            "".join(traceback.format_stack(frame)).rstrip(),
+        )
+
+
+def _is_own(frame) -> bool:
+    return frame.f_code.co_filename.startswith(_PKG_DIR)
+
+
+def _describe(frame) -> str:
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{module}.{name} (Zeile {frame.f_lineno})"
+
+
+def _stall_logger(path: str) -> logging.Logger:
+    log = logging.getLogger("we.watchdog")
+    if not log.handlers:
+        handler = RotatingFileHandler(path, maxBytes=1_000_000, backupCount=3, encoding="utf-8", delay=True)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+        log.propagate = False
+    return log
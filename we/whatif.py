@@ -0,0 +1,112 @@
+"""What-if price scenarios: product costs and margins under hypothetical ingredient prices.
+
+A scenario is a list of rules, one per line, applied in order to the pack
+price of every ingredient whose name matches (glob, case-insensitive):
+
+    *sahne*=+8%     matching ingredients 8 % more expensive
+    *=-2,5%         every ingredient 2.5 % cheaper
+    Rum=12.90       new pack price 12.90 for "Rum"
+    # comment
+
+Nothing is written to the database. All product costs are recomputed in one
+batch (CostMatrix) for the current and the hypothetical prices.
+"""
+
+import re
+from fnmatch import fnmatchcase
+
+from .cost_matrix import CostMatrix, unit_prices_from_db
+from .units import pack_unit_price
+from .utils import profit_margin, safe_float
+
+_RULE = re.compile(r"^(?P<pattern>.+?)\s*=\s*(?P<value>[+-]?\d+(?:[.,]\d+)?)\s*(?P<pct>%)?$")
+
+
+def parse_rule(text: str):
+    """'pattern=+8%' -> (pattern, 8.0, True); 'pattern=12.90' -> (pattern, 12.9, False)."""
+    m = _RULE.match(text.strip())
+    if m is None:
+        raise ValueError(f"Ungültige Regel: '{text.strip()}' (erwartet z.B. '*sahne*=+8%' oder 'Rum=12,90')")
+    value = safe_float(m.group("value"))
+    pct = m.group("pct") is not None
+    if not pct and value < 0:
+        raise ValueError(f"Negativer Preis in Regel: '{text.strip()}'")
+    return m.group("pattern").strip(), value, pct
+
+
+def parse_rules(lines):
+    """Rules from text lines; empty lines and '#' comments are skipped."""
+    return [parse_rule(line) for line in lines if line.strip() and not line.strip().startswith("#")]
+
+
+def scenario_pack_prices(ingredients, rules):
+    """({ing_id: new pack price} of the changed ingredients, [ingredients matched per rule]).
+
+    `ingredients` are list_ingredients() rows. Percent rules compound; a fixed
+    price replaces whatever earlier rules computed.
+    """
+    compiled = [(pattern.casefold(), value, pct) for pattern, value, pct in rules]
+    matched = [0] * len(rules)
+    changed = {}
+    for ing_id, name, _unit, _pack_qty, pack_price in ingredients:
+        key = name.casefold()
+        price = pack_price
+        hit = False
+        for i, (pattern, value, pct) in enumerate(compiled):
+            if fnmatchcase(key, pattern):
+                price = price * (1.0 + value / 100.0) if pct else value
+                matched[i] += 1
+                hit = True
+        if hit and price != pack_price:
+            changed[ing_id] = price
+    return changed, matched
+
+
+def simulate(db, rules):
+    """(rows, matched) for a scenario; runs on the DB worker or any DB.
+
+    rows: (pid, name, sale_price, cost, new_cost, profit, new_profit, margin, new_margin)
+    for every product, by name. matched: ingredients matched per rule.
+    """
+    ingredients = db.list_ingredients()
+    changed, matched = scenario_pack_prices(ingredients, rules)
+
+    engine = db.cost_engine
+    if engine is not None:
+        matrix, unit_price = engine.matrix(), engine.unit_prices()
+    else:
+        matrix, unit_price = CostMatrix.from_db(db), unit_prices_from_db(db)
+    new_unit_price = dict(unit_price)
+    for ing_id, _name, unit, pack_qty, _pack_price in ingredients:
+        if ing_id in changed:
+            new_unit_price[ing_id] = pack_unit_price(pack_qty, changed[ing_id], unit)
+
+    costs = matrix.costs(unit_price)
+    new_costs = matrix.costs(new_unit_price)
+
+    rows = []
+    for pid, name, sale_price in db.list_products():
+        cost = costs.get(pid, 0.0)
+        new_cost = new_costs.get(pid, 0.0)
+        profit, margin = profit_margin(cost, sale_price)
+        new_profit, new_margin = profit_margin(new_cost, sale_price)
+        rows.append((pid, name, sale_price, cost, new_cost, profit, new_profit, margin, new_margin))
+    rows.sort(key=lambda r: (r[1] or "").lower())
+    return rows, matched
+
+
+def is_affected(row, eps: float = 1e-9) -> bool:
+    return abs(row[4] - row[3]) > eps
+
+
+def summary(rows) -> dict:
+    """Totals over the affected rows: count, cost delta, profit delta, average margin delta (points)."""
+    affected = [r for r in rows if is_affected(r)]
+    margin_deltas = [r[8] - r[7] for r in affected if r[7] is not None]
+    return {
+        "products": len(rows),
+        "affected": len(affected),
+        "cost_delta": sum(r[4] - r[3] for r in affected),
+        "profit_delta": sum(r[6] - r[5] for r in affected if r[5] is not None),
+        "margin_delta_avg": (sum(margin_deltas) / len(margin_deltas)) if margin_deltas else 0.0,
+    }
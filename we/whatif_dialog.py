@@ -0,0 +1,145 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+from .config import BG, FG, FIELD
+from .ui_helpers import VirtualTreeview
+from .utils import money
+from .whatif import is_affected, parse_rules, simulate, summary
+
+COLUMNS = (
+    ("name", "Produkt", 240, "w"),
+    ("cost", "Kosten", 90, "e"),
+    ("new_cost", "Kosten neu", 90, "e"),
+    ("cost_delta", "Δ Kosten", 90, "e"),
+    ("margin", "Marge (%)", 80, "e"),
+    ("new_margin", "Marge neu", 80, "e"),
+    ("margin_delta", "Δ Pkt", 70, "e"),
+)
+
+# column -> sort key on a simulate() row; None margins sort lowest
+_SORT_KEYS = {
+    "name": lambda r: (r[1] or "").lower(),
+    "cost": lambda r: r[3],
+    "new_cost": lambda r: r[4],
+    "cost_delta": lambda r: r[4] - r[3],
+    "margin": lambda r: float("-inf") if r[7] is None else r[7],
+    "new_margin": lambda r: float("-inf") if r[8] is None else r[8],
+    "margin_delta": lambda r: float("-inf") if r[7] is None else r[8] - r[7],
+}
+
+
+class WhatIfDialog:
+    """Was-wäre-wenn: costs and margins under hypothetical ingredient prices (nothing is saved)."""
+
+    def __init__(self, app, db):
+        self.app = app
+        self.db = db  # DBWorker
+        self._rows = []
+        self._seq = 0
+        self._sort_col = "margin_delta"
+        self._sort_desc = False  # biggest margin loss first
+
+        self.win = tk.Toplevel(app, bg=BG)
+        self.win.title("Was-wäre-wenn")
+        self.win.geometry("900x560")
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        top = ttk.Frame(self.win, padding=(10, 10, 10, 0))
+        top.pack(fill="x")
+        ttk.Label(top, text="Preisänderungen, eine pro Zeile (z.B. *sahne*=+8%  ·  *=+3%  ·  Rum=12,90):").pack(
+            anchor="w"
+        )
+        self.rules_text = tk.Text(
+            top, height=5, bg=FIELD, fg=FG, insertbackground=FG, relief="flat", highlightthickness=0, undo=True
+        )
+        self.rules_text.pack(fill="x", pady=(4, 6))
+        self.rules_text.bind("<Control-Return>", lambda _e: (self.compute(), "break")[1])
+
+        bar = ttk.Frame(top)
+        bar.pack(fill="x")
+        ttk.Button(bar, text="Berechnen", command=self.compute).pack(side="left")
+        self.only_affected = tk.BooleanVar(value=True)
+        ttk.Checkbutton(bar, text="nur betroffene Produkte", variable=self.only_affected, command=self._render).pack(
+            side="left", padx=(10, 0)
+        )
+        self.status = ttk.Label(bar, text="")
+        self.status.pack(side="right")
+
+        body = ttk.Frame(self.win, padding=10)
+        body.pack(fill="both", expand=True)
+        self.tree = VirtualTreeview(body, columns=[c[0] for c in COLUMNS], show="headings", selectmode="browse")
+        for col, text, width, anchor in COLUMNS:
+            self.tree.heading(col, text=text, command=lambda c=col: self._sort_by(c))
+            self.tree.column(col, width=width, anchor=anchor)
+        self.tree.pack(side="left", fill="both", expand=True)
+        sb = ttk.Scrollbar(body, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscroll=sb.set)
+        sb.pack(side="right", fill="y")
+
+        self.rules_text.focus_set()
+
+    def compute(self):
+        try:
+            rules = parse_rules(self.rules_text.get("1.0", "end").splitlines())
+        except ValueError as e:
+            messagebox.showerror("Fehler", str(e), parent=self.win)
+            return
+        if not rules:
+            self.status.config(text="Keine Regeln angegeben.")
+            return
+
+        self._seq += 1
+        seq = self._seq
+        self.status.config(text="Berechne …")
+
+        def _done(result):
+            if seq != self._seq or not self.win.winfo_exists():
+                return  # newer computation on its way, or window closed
+            rows, matched = result
+            self._rows = rows
+            self._render()
+            s = summary(rows)
+            text = (
+                f"{s['affected']} von {s['products']} Produkten betroffen · Kosten {s['cost_delta']:+.2f} € · "
+                f"Marge Ø {s['margin_delta_avg']:+.1f} Pkt."
+            )
+            unmatched = [pattern for (pattern, _v, _p), n in zip(rules, matched) if not n]
+            if unmatched:
+                text += " · ohne Treffer: " + ", ".join(unmatched)
+            self.status.config(text=text)
+
+        self.db.submit(lambda db: simulate(db, rules), on_done=_done)
+
+    def _sort_by(self, col: str):
+        if self._sort_col == col:
+            self._sort_desc = not self._sort_desc
+        else:
+            self._sort_col = col
+            self._sort_desc = False
+        self._render()
+
+    def _render(self):
+        rows = [r for r in self._rows if is_affected(r)] if self.only_affected.get() else self._rows
+        rows = sorted(rows, key=_SORT_KEYS[self._sort_col], reverse=self._sort_desc)
+        self.tree.set_rows(rows, values_of=_values)
+
+    def close(self):
+        self.win.destroy()
+        self.app.whatif_dialog = None
+
+
+def _values(row):
+    _pid, name, _sale_price, cost, new_cost, _profit, _new_profit, margin, new_margin = row
+    margin_txt = f"{margin:.1f} %" if margin is not None else "–"
+    new_margin_txt = f"{new_margin:.1f} %" if new_margin is not None else "–"
+    delta_txt = f"{new_margin - margin:+.1f}" if margin is not None else "–"
+    return (name, money(cost), money(new_cost), f"{new_cost - cost:+.2f} €", margin_txt, new_margin_txt, delta_txt)
+
+
+def open_dialog(app, db):
+    """Open the dialog, or raise it if it is already open."""
+    if getattr(app, "whatif_dialog", None) is not None:
+        app.whatif_dialog.win.lift()
+        app.whatif_dialog.rules_text.focus_set()
+    else:
+        app.whatif_dialog = WhatIfDialog(app, db)